@@ -68,6 +68,134 @@ ROOT_URLCONF = 'backend.urls'
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+# Paginated lists cache their exact total counts for this many seconds (see pulse/count_utils.py)
+COUNT_CACHE_TTL = 30
+
+# Question views are buffered in memory and written to the database every this many seconds
+VIEW_COUNT_FLUSH_INTERVAL = 5
+
+# Each process logs the counters of its services (result cache hit rates, inference circuits and latencies) every
+# this many seconds, at INFO level on the services.stats_service logger (see services/stats_service.py)
+STATS_LOG_INTERVAL = 300
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'services.stats_service': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# 'sync' checks new answers and comments before saving them, 'async' saves them as pending and checks them
+# in a pool of MODERATION_WORKERS background threads (see services/moderation_service.py)
+MODERATION_MODE = 'sync'
+MODERATION_WORKERS = 4
+
+# Side effects of domain events (e.g. notifying the asker of a new answer) are recorded in the DomainEvents outbox
+# in the same transaction as the change, and applied in batches of BATCH_SIZE by a background thread of the web
+# process (see services/outbox_service.py), after each commit that recorded events and every POLL_INTERVAL seconds
+# for retries. They run in the web processes because notifications are pushed and unread counts invalidated with
+# per-process backends (NOTIFICATION_PUSH, NOTIFICATION_COUNT_CACHE). With IN_PROCESS False nothing applies them
+# (tests call OutboxService.process_batch). Failed events are retried after RETRY_DELAY seconds (doubled after each
+# attempt), MAX_ATTEMPTS times.
+OUTBOX = {
+    'IN_PROCESS': True,
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 10,
+    'POLL_INTERVAL': 30,
+}
+
+# Calls to the Hugging Face Inference API (see services/inference_client.py): each call times out after TIMEOUT
+# seconds, failed calls (connection errors, 429/5xx) are retried up to RETRIES times (jittered backoff up to BACKOFF
+# seconds, doubling each time). At most MAX_CONCURRENCY
+# calls per model run at once per process, waiting at most QUEUE_TIMEOUT seconds for a slot. After BREAKER_FAILURES
+# consecutive failures calls to the model fail right away for BREAKER_RESET seconds.
+INFERENCE_CLIENT = {
+    'TIMEOUT': 30,
+    'RETRIES': 2,
+    'BACKOFF': 0.5,
+    'MAX_CONCURRENCY': 8,
+    'QUEUE_TIMEOUT': 5,
+    'BREAKER_FAILURES': 5,
+    'BREAKER_RESET': 30,
+}
+
+# Code reviews of files longer than CODE_REVIEW_WINDOW_LINES are split into windows of that many lines (overlapping
+# by CODE_REVIEW_WINDOW_OVERLAP lines), reviewed concurrently by up to CODE_REVIEW_MAX_WORKERS requests per review
+CODE_REVIEW_WINDOW_LINES = 200
+CODE_REVIEW_WINDOW_OVERLAP = 20
+CODE_REVIEW_MAX_WORKERS = 4
+
+# Code review suggestions are cached by a hash of the model, prompt version, project, file name and content (and
+# per window of large files, by its lines, first line and the file's line count, so an edit only re-reviews the
+# windows that changed). Windows start at fixed line offsets: inserting or deleting a line shifts every later window,
+# so only edits that keep the line count reuse the other windows. Same keys as MODERATION_CACHE below
+CODE_REVIEW_CACHE = {
+    'BACKEND': 'local',
+    'TTL': 60 * 60 * 24,
+    'MAX_ENTRIES': 2000,
+    'CACHE_ALIAS': 'default',
+}
+
+# Text moderation backend (see services/moderation_backends.py). BACKEND is 'huggingface' (Inference API) or
+# 'transformers' (local CPU model, MODEL can be a path). Concurrent texts are sent in batches of up to BATCH_SIZE,
+# waiting at most BATCH_WAIT_MS for a batch to fill. LEXICON_PATH (a file with one word per line) enables the
+# prefilter that skips the model for text containing none of the words.
+MODERATION_BACKEND = {
+    'BACKEND': 'huggingface',
+    'MODEL': 'unitary/toxic-bert',
+    'BATCH_SIZE': 16,
+    'BATCH_WAIT_MS': 10,
+    'LEXICON_PATH': None,
+}
+
+# Content moderation results are cached by content hash (see services/result_cache.py).
+# BACKEND is 'local' (per process, LRU bounded to MAX_ENTRIES) or 'shared' (the CACHE_ALIAS Django cache).
+MODERATION_CACHE = {
+    'BACKEND': 'local',
+    'TTL': 60 * 60 * 24,
+    'MAX_ENTRIES': 10000,
+    'CACHE_ALIAS': 'default',
+}
+
+# Unread notification counts are cached per user in front of the NotificationCounter table, and invalidated when
+# the count changes. 'local' entries are only invalidated in the process that changed the count: with several
+# processes serving requests, the others serve the old count for up to TTL seconds. Use the 'shared' backend on a
+# cache shared by all processes (CACHES has none configured, the default alias is a per-process memory cache).
+NOTIFICATION_COUNT_CACHE = {
+    'BACKEND': 'local',
+    'TTL': 30,
+    'MAX_ENTRIES': 10000,
+    'CACHE_ALIAS': 'default',
+}
+
+# New notifications and unread counts are pushed to the users' open streams (see services/notification_push.py).
+# BACKEND 'local' fans out to the streams of the same process. A stream is closed (the client reconnects) when more
+# than MAX_QUEUE events are waiting for it, and sends a keep-alive comment after KEEPALIVE_SECONDS without events.
+NOTIFICATION_PUSH = {
+    'BACKEND': 'local',
+    'MAX_QUEUE': 100,
+    'KEEPALIVE_SECONDS': 15,
+}
+
+# Uploaded avatars and profile images (see pulse/image_utils.py). Uploads larger than IMAGE_MAX_UPLOAD_BYTES or
+# IMAGE_MAX_PIXELS are rejected before being decoded. The NSFW check gets a copy downsampled to IMAGE_MODERATION_SIZE
+# pixels, and square variants are stored at each of IMAGE_VARIANT_SIZES in each of IMAGE_VARIANT_FORMATS (the
+# largest size in the first format is the main image URL).
+IMAGE_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MODERATION_SIZE = 384
+IMAGE_VARIANT_SIZES = {
+    'small': 64,
+    'medium': 256,
+    'large': 512,
+}
+IMAGE_VARIANT_FORMATS = ['webp', 'jpeg']
+
 # Internationalization (https://docs.djangoproject.com/en/5.0/topics/i18n/)
 LANGUAGE_CODE = 'en-us'
 
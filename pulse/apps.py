@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PulseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pulse'
+
+    def ready(self):
+        # Register the signal receivers
+        from . import signals
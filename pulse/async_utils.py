@@ -0,0 +1,43 @@
+from functools import wraps
+from django.http import Http404, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.request import Request
+
+# Async views, for the endpoints that mostly wait on I/O (inference, storage): under ASGI the worker serves
+# other requests while they wait. DRF's api_view only supports sync views, async_api_view is its async counterpart.
+# The ORM, serializers and transactions are sync, async views call them through asgiref's sync_to_async.
+
+DEFAULT_PARSERS = [JSONParser, FormParser, MultiPartParser]
+
+
+def async_api_view(http_method_names, parsers=None):
+    """
+    Decorator for async views, the async counterpart of DRF's api_view (and parser_classes).
+
+    Other methods are answered with 405. The view gets a DRF Request, with the body parsed by the given
+    parsers (request.data, request.FILES, request.query_params). Http404 (e.g. from aget_object_or_404)
+    and malformed bodies are answered with JSON errors, like DRF does.
+    """
+    parsers = parsers or DEFAULT_PARSERS
+
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in http_method_names:
+                return JsonResponse(
+                    {"detail": f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED
+                )
+            try:
+                return await view(Request(request, parsers=[parser() for parser in parsers]), *args, **kwargs)
+            except Http404:
+                return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+            except (ParseError, UnsupportedMediaType) as e:
+                return JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+
+        return wrapper
+
+    return decorator
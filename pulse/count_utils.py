@@ -0,0 +1,74 @@
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import QuerySet
+
+# How the total count of a paginated list is computed:
+#   estimate: planner estimate (pg_class.reltuples for a whole table, EXPLAIN for a filtered queryset)
+#   cached:   exact COUNT(*), cached for COUNT_CACHE_TTL seconds per filter signature
+#   exact:    exact COUNT(*) on every request (only when explicitly asked for)
+COUNT_MODES = ('estimate', 'cached', 'exact')
+
+
+def get_count(queryset: QuerySet, mode: str, signature: dict) -> int:
+    """
+    Count the rows of a queryset using the given count mode.
+
+    Args:
+        queryset (QuerySet): The filtered queryset being paginated.
+        mode (str): One of COUNT_MODES.
+        signature (dict): The filters applied to the queryset, used as the cache key for cached counts.
+
+    Returns:
+        int: The (possibly estimated) number of rows.
+    """
+    if mode == 'exact':
+        return queryset.count()
+    if mode == 'cached':
+        return get_cached_count(queryset, signature)
+    return estimate_count(queryset)
+
+
+def get_cached_count(queryset: QuerySet, signature: dict) -> int:
+    """
+    Get the exact count of a queryset, cached for a short time per filter signature.
+    """
+    digest = hashlib.sha1(json.dumps(signature, sort_keys=True, default=str).encode()).hexdigest()
+    key = f"count:{queryset.model._meta.db_table}:{digest}"
+
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.COUNT_CACHE_TTL)
+    return count
+
+
+def estimate_count(queryset: QuerySet) -> int:
+    """
+    Estimate the count of a queryset from the planner's statistics instead of running COUNT(*).
+
+    An unfiltered queryset reads pg_class.reltuples for its table, a filtered one uses the row estimate
+    of its EXPLAIN plan. Falls back to an exact count if the table has never been analyzed.
+    """
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [connection.ops.quote_name(queryset.model._meta.db_table)]
+            )
+            row = cursor.fetchone()
+            estimate = row[0] if row else -1
+        else:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = int(plan[0]['Plan']['Plan Rows'])
+
+    # reltuples is -1 for tables that have never been vacuumed/analyzed
+    if estimate < 0:
+        return queryset.count()
+    return estimate
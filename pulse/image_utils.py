@@ -0,0 +1,129 @@
+import asyncio
+from io import BytesIO
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+from .supabase_utils import get_async_supabase_client, public_url
+
+# Uploaded avatars and profile images are decoded once, with a bounded size, then:
+# - a copy downsampled to IMAGE_MODERATION_SIZE is sent to the NSFW check (the model works on small images anyway),
+# - square variants at each of IMAGE_VARIANT_SIZES are encoded in each of IMAGE_VARIANT_FORMATS and stored,
+#   so pages showing a user or a hive load a thumbnail instead of the original upload.
+
+# Content type and Pillow save options of each variant format
+FORMATS = {
+    'webp': ('image/webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('image/jpeg', {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+class InvalidImage(Exception):
+    """Raised for uploads that are not an image, or too large to be decoded."""
+
+
+def process_image(image_file) -> tuple:
+    """
+    Decode an uploaded image and prepare its moderation copy and variants (CPU bound, async views run it in a thread).
+
+    Args:
+        image_file: The uploaded file (or any binary file object)
+
+    Returns:
+        tuple: The moderation copy as JPEG bytes, and the variants as {size: {format: bytes}}
+
+    Raises:
+        InvalidImage: If the file is not an image, or is larger than IMAGE_MAX_UPLOAD_BYTES or IMAGE_MAX_PIXELS
+    """
+    size = getattr(image_file, 'size', None)
+    if size is not None and size > settings.IMAGE_MAX_UPLOAD_BYTES:
+        raise InvalidImage(f"Images must be at most {settings.IMAGE_MAX_UPLOAD_BYTES // (1024 * 1024)} MB.")
+
+    try:
+        # Only reads the header, the pixels are decoded below once the dimensions are checked
+        image = Image.open(image_file)
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        raise InvalidImage("The file is not a valid image.") from e
+
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise InvalidImage("The image dimensions are too large.")
+
+    # JPEGs can be decoded directly at a reduced scale, as long as it stays larger than what we need
+    largest = max(max(settings.IMAGE_VARIANT_SIZES.values()), settings.IMAGE_MODERATION_SIZE)
+    image.draft('RGB', (largest, largest))
+
+    try:
+        image = ImageOps.exif_transpose(image)  # decodes, and applies the camera orientation
+    except (OSError, SyntaxError, ValueError) as e:
+        raise InvalidImage("The file is not a valid image.") from e
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    moderation_image = flatten(image)
+    moderation_image.thumbnail((settings.IMAGE_MODERATION_SIZE, settings.IMAGE_MODERATION_SIZE), Image.Resampling.LANCZOS)
+
+    # Each size is resized from the previous (larger) one, the first one is cropped to a square from the upload
+    variants = {}
+    source = image
+    for name, pixels in sorted(settings.IMAGE_VARIANT_SIZES.items(), key=lambda item: -item[1]):
+        source = ImageOps.fit(source, (pixels, pixels), Image.Resampling.LANCZOS)
+        variants[name] = {
+            image_format: encode(source, image_format) for image_format in settings.IMAGE_VARIANT_FORMATS
+        }
+
+    return encode(moderation_image, 'jpeg'), variants
+
+
+def flatten(image: Image.Image) -> Image.Image:
+    """Drop the transparency of an image, over a white background."""
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def encode(image: Image.Image, image_format: str) -> bytes:
+    output = BytesIO()
+    if image_format == 'jpeg':
+        image = flatten(image)
+    image.save(output, **FORMATS[image_format][1])
+    return output.getvalue()
+
+
+async def aupload_variants(bucket_name: str, path_prefix: str, variants: dict) -> dict:
+    """
+    Upload the variants of an image to a storage bucket, concurrently, at <path_prefix>-<size>.<format>.
+
+    Returns:
+        dict: The public URLs of the variants, as {size: {format: URL}}
+
+    Raises:
+        Exception: If an upload failed
+    """
+    supabase = await get_async_supabase_client()
+    uploads = []
+    urls = {}
+    for name, encoded in variants.items():
+        for image_format, content in encoded.items():
+            path = f"{path_prefix}-{name}.{image_format}"
+            uploads.append(supabase.storage.from_(bucket_name).upload(
+                path=path,
+                file=content,
+                file_options={"content-type": FORMATS[image_format][0], "upsert": "true"},
+            ))
+            urls.setdefault(name, {})[image_format] = public_url(bucket_name, path)
+
+    await asyncio.gather(*uploads)
+    return urls
+
+
+def main_image_url(urls: dict) -> str:
+    """The URL of the largest variant, in the first of IMAGE_VARIANT_FORMATS."""
+    largest = max(settings.IMAGE_VARIANT_SIZES, key=settings.IMAGE_VARIANT_SIZES.get)
+    return urls[largest][settings.IMAGE_VARIANT_FORMATS[0]]
+
+
+def thumbnail_url(variants: dict, fallback: str | None, size: str = 'small') -> str | None:
+    """The URL of a variant of an image (in the first of IMAGE_VARIANT_FORMATS), or fallback for images uploaded before variants existed."""
+    urls = (variants or {}).get(size) or {}
+    return urls.get(settings.IMAGE_VARIANT_FORMATS[0], fallback)
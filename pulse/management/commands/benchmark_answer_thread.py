@@ -0,0 +1,67 @@
+import time
+from statistics import mean
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from pulse.models import Answers, Questions, Votes
+from pulse.serializers import AnswerSerializer
+from services.answer_thread_service import AnswerThreadService
+from services.viewer_state_service import ViewerStateService
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the number of queries and the latency of serializing a question's answer thread "
+        "(the work done by getAnswersByQuestionIdWithUser), batched vs. per-answer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('question_id', help='ID of the question whose answers are serialized')
+        parser.add_argument('--user-id', help='ID of the viewing user (defaults to the question asker)')
+        parser.add_argument('--iterations', type=int, default=10, help='Number of timed runs per strategy')
+
+    def handle(self, *args, **options):
+        question = Questions.objects.filter(question_id=options['question_id']).first()
+        if question is None:
+            raise CommandError(f"Question {options['question_id']} does not exist")
+
+        user_id = options['user_id'] or question.asker_id
+        answer_count = Answers.objects.filter(question=question).count()
+        self.stdout.write(f"Question {question.question_id} has {answer_count} answers")
+
+        for name, strategy in (('per-answer', self.serialize_per_answer), ('batched', self.serialize_batched)):
+            queries, timings = self.run(strategy, question.question_id, user_id, options['iterations'])
+            self.stdout.write(
+                f"{name:>10}: {queries} queries, "
+                f"mean {mean(timings) * 1000:.1f} ms, min {min(timings) * 1000:.1f} ms"
+            )
+
+    def run(self, strategy, question_id, user_id, iterations):
+        """Run a strategy once to count queries, then time it over the given number of iterations."""
+        with CaptureQueriesContext(connection) as context:
+            strategy(question_id, user_id)
+        queries = len(context.captured_queries)
+
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            strategy(question_id, user_id)
+            timings.append(time.perf_counter() - start)
+
+        return queries, timings
+
+    @staticmethod
+    def serialize_per_answer(question_id, user_id):
+        """The original implementation: badges and votes are looked up for every answer."""
+        serialized_answers = AnswerSerializer(Answers.objects.filter(question=question_id), many=True).data
+        for answer in serialized_answers:
+            user_vote = Votes.objects.filter(user_id=user_id, answer_id=answer['answer_id']).first()
+            answer['curr_user_upvoted'] = user_vote.vote_type == 'upvote' if user_vote else False
+            answer['curr_user_downvoted'] = user_vote.vote_type == 'downvote' if user_vote else False
+        return serialized_answers
+
+    @staticmethod
+    def serialize_batched(question_id, user_id):
+        """The batched implementation used by getAnswersByQuestionIdWithUser."""
+        serialized_answers = AnswerThreadService.serialize_thread(question_id)
+        return ViewerStateService.overlay_votes(serialized_answers, user_id)
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from statistics import mean
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from services import ai_model_service
+from services.inference_client import AsyncManagedInferenceClient
+
+
+class StubInferenceHandler(BaseHTTPRequestHandler):
+    """
+    A local OpenAI-compatible /v1/chat/completions endpoint that streams a code review: it waits
+    first_token_delay plus prefill_delay per line of code in the prompt, then streams a suggestions JSON
+    (one suggestion per 40 lines reviewed, at most 5) in small chunks, token_delay apart.
+    """
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        prompt = body['messages'][-1]['content']
+        line_numbers = [int(number) for number in re.findall(r'^\s*(\d+): ', prompt, re.MULTILINE)]
+
+        server = self.server
+        time.sleep(server.first_token_delay + len(line_numbers) * server.prefill_delay)
+
+        suggestions = [
+            {"line_number": line_number, "suggestion": f"Consider refactoring line {line_number}."}
+            for line_number in line_numbers[::40][:5]
+        ]
+        text = json.dumps({"suggestions": suggestions})
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        for start in range(0, len(text), 4):
+            chunk = {
+                "id": "stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get('model', 'stub'),
+                "system_fingerprint": "stub",
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": text[start:start + 4]}, "logprobs": None, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(server.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, format, *args):
+        pass  # keep the benchmark output readable
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the end-to-end latency of agenerate_code_review (as used by the code review views) by file size "
+        "against a local stub inference server, with the whole file in one prompt vs. split into windows reviewed concurrently."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,500,1000,2000,5000', help='Comma separated file sizes, in lines')
+        parser.add_argument('--iterations', type=int, default=3, help='Number of timed runs per size and strategy')
+        parser.add_argument('--window-lines', type=int, default=200, help='Lines per window when chunking')
+        parser.add_argument('--window-overlap', type=int, default=20, help='Lines shared by consecutive windows')
+        parser.add_argument('--max-workers', type=int, default=4, help='Concurrent window reviews')
+        parser.add_argument('--first-token-ms', type=float, default=200, help='Stub latency before the first token')
+        parser.add_argument('--prefill-ms-per-line', type=float, default=2, help='Stub latency per line of code in the prompt')
+        parser.add_argument('--token-ms', type=float, default=2, help='Stub latency between streamed chunks')
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubInferenceHandler)
+        server.daemon_threads = True
+        server.first_token_delay = options['first_token_ms'] / 1000
+        server.prefill_delay = options['prefill_ms_per_line'] / 1000
+        server.token_delay = options['token_ms'] / 1000
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        original_client = ai_model_service.async_client
+        ai_model_service.async_client = AsyncManagedInferenceClient(base_url=f"http://127.0.0.1:{server.server_port}")
+        try:
+            strategies = {
+                'single prompt': {'CODE_REVIEW_WINDOW_LINES': 10 ** 9},
+                'windowed': {
+                    'CODE_REVIEW_WINDOW_LINES': options['window_lines'],
+                    'CODE_REVIEW_WINDOW_OVERLAP': options['window_overlap'],
+                    'CODE_REVIEW_MAX_WORKERS': options['max_workers'],
+                },
+            }
+            self.stdout.write(f"{'lines':>8} {'strategy':>14} {'mean ms':>10} {'min ms':>10} {'suggestions':>12}")
+            for size in [int(size) for size in options['sizes'].split(',')]:
+                file_content = "\n".join(f"value_{i} = compute({i})  # line {i + 1}" for i in range(size))
+                for name, overrides in strategies.items():
+                    with override_settings(**overrides):
+                        timings, suggestions = self.run(file_content, options['iterations'])
+                    self.stdout.write(
+                        f"{size:>8} {name:>14} {mean(timings) * 1000:>10.1f} {min(timings) * 1000:>10.1f} {len(suggestions):>12}"
+                    )
+        finally:
+            ai_model_service.async_client = original_client
+            server.shutdown()
+
+    @staticmethod
+    def run(file_content, iterations):
+        """Time agenerate_code_review over the given number of iterations (without the review cache)."""
+        timings = []
+        for _ in range(iterations):
+            ai_model_service.code_review_cache().clear()
+            start = time.perf_counter()
+            suggestions = asyncio.run(
+                ai_model_service.agenerate_code_review("Benchmark", "A generated file", "benchmark.py", file_content)
+            )
+            timings.append(time.perf_counter() - start)
+        return timings, suggestions
@@ -0,0 +1,148 @@
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+from statistics import quantiles
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+import requests
+import uvicorn
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+from pulse.management.commands.benchmark_code_review import StubInferenceHandler
+from services import ai_model_service
+from services.inference_client import AsyncManagedInferenceClient, ManagedInferenceClient
+
+
+class PooledWSGIServer(WSGIServer):
+    """A WSGI server handling requests with a fixed number of threads, each serving one request at a time (like gunicorn's sync workers)."""
+
+    request_queue_size = 1024
+
+    def __init__(self, server_address, handler_class, workers: int):
+        super().__init__(server_address, handler_class)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_in_pool, request, client_address)
+
+    def process_request_in_pool(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass  # keep the load test output readable
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the codeReview endpoint against a local stub inference server, served by WSGI (a fixed pool of "
+        "worker threads) and by ASGI (uvicorn, one event loop), and compare their throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Number of requests per concurrency level')
+        parser.add_argument('--concurrency', default='10,50,100', help='Comma separated numbers of concurrent clients')
+        parser.add_argument('--wsgi-workers', type=int, default=4, help='Worker threads of the WSGI server')
+        parser.add_argument('--lines', type=int, default=50, help='Lines of the reviewed file')
+        parser.add_argument('--first-token-ms', type=float, default=500, help='Stub latency before the first token')
+        parser.add_argument('--prefill-ms-per-line', type=float, default=1, help='Stub latency per line of code in the prompt')
+        parser.add_argument('--token-ms', type=float, default=1, help='Stub latency between streamed chunks')
+
+    def handle(self, *args, **options):
+        stub = ThreadingHTTPServer(('127.0.0.1', 0), StubInferenceHandler)
+        stub.daemon_threads = True
+        stub.request_queue_size = 1024
+        stub.first_token_delay = options['first_token_ms'] / 1000
+        stub.prefill_delay = options['prefill_ms_per_line'] / 1000
+        stub.token_delay = options['token_ms'] / 1000
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        stub_url = f"http://127.0.0.1:{stub.server_port}"
+        original_clients = ai_model_service.client, ai_model_service.async_client
+        # Let every request reach the stub, the servers are what is measured here
+        with override_settings(INFERENCE_CLIENT={**settings.INFERENCE_CLIENT, 'MAX_CONCURRENCY': max(levels)}):
+            ai_model_service.client = ManagedInferenceClient(base_url=stub_url)
+            ai_model_service.async_client = AsyncManagedInferenceClient(base_url=stub_url)
+        try:
+            self.stdout.write(f"{'server':>6} {'clients':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, '127.0.0.1']):
+                for name, start_server in [('wsgi', self.start_wsgi), ('asgi', self.start_asgi)]:
+                    url, stop_server = start_server(options)
+                    try:
+                        self.send(url, -1, 1, options['lines'])  # warm up
+                        for level in levels:
+                            throughput, p50, p95, errors = self.run(url, options['requests'], level, options['lines'])
+                            self.stdout.write(f"{name:>6} {level:>8} {throughput:>8.1f} {p50 * 1000:>9.1f} {p95 * 1000:>9.1f} {errors:>7}")
+                    finally:
+                        stop_server()
+        finally:
+            ai_model_service.client, ai_model_service.async_client = original_clients
+            stub.shutdown()
+
+    @staticmethod
+    def start_wsgi(options):
+        server = PooledWSGIServer(('127.0.0.1', 0), QuietWSGIRequestHandler, workers=options['wsgi_workers'])
+        server.set_app(get_wsgi_application())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        def stop():
+            server.shutdown()
+            server.pool.shutdown(wait=False, cancel_futures=True)
+
+        return f"http://127.0.0.1:{server.server_port}", stop
+
+    @staticmethod
+    def start_asgi(options):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        server = uvicorn.Server(uvicorn.Config(get_asgi_application(), lifespan='off', log_level='warning', backlog=1024))
+        thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+
+        def stop():
+            server.should_exit = True
+            thread.join()
+
+        return f"http://127.0.0.1:{sock.getsockname()[1]}", stop
+
+    def run(self, url, total, concurrency, lines):
+        """Send total requests from concurrency clients, return the throughput, p50 and p95 latencies and error count."""
+        ai_model_service.code_review_cache().clear()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda i: self.send(url, i, concurrency, lines), range(total)))
+        elapsed = time.perf_counter() - start
+
+        latencies = [latency for latency, ok in results]
+        percentiles = quantiles(latencies, n=20) if len(latencies) > 1 else latencies * 19
+        return total / elapsed, percentiles[9], percentiles[18], sum(1 for latency, ok in results if not ok)
+
+    @staticmethod
+    def send(url, i, concurrency, lines):
+        # A different file for every request, so the reviews are not served from the cache
+        file_content = "\n".join(f"value_{n} = compute({n})  # request {i} at {concurrency}" for n in range(lines))
+        start = time.perf_counter()
+        try:
+            response = requests.post(f"{url}/projects/codeReview/", timeout=120, json={
+                "project_title": "Load test",
+                "project_description": "A generated file",
+                "file_name": "load_test.py",
+                "file_content": file_content,
+            })
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
@@ -0,0 +1,37 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from pulse.models import Answers, Comments
+from services.moderation_service import ModerationService
+
+
+class Command(BaseCommand):
+    help = "Moderate the answers and comments still pending moderation (e.g. after a restart or a moderation backend failure)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=60, help='Only content pending for at least this many seconds (skips content the workers are on)')
+        parser.add_argument('--limit', type=int, default=500, help='Maximum number of answers and of comments moderated')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['older_than'])
+
+        for model in (Answers, Comments):
+            pending = list(
+                model.objects.filter(moderation_status='pending_moderation', created_at__lte=cutoff)
+                .order_by('created_at')
+                .values_list('pk', flat=True)[:options['limit']]
+            )
+            results = {'approved': 0, 'rejected': 0, 'failed': 0}
+            for pk in pending:
+                try:
+                    status = ModerationService.moderate(model, pk)
+                except Exception as e:
+                    self.stderr.write(f"{model._meta.db_table} {pk}: {e}")
+                    results['failed'] += 1
+                    continue
+                if status:
+                    results[status] += 1
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{model._meta.db_table}: {results['approved']} approved, {results['rejected']} rejected, {results['failed']} failed"
+            ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from pulse.models import Hives, Questions
+from pulse.search_utils import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Recompute the search documents (search_vector, tag_names) of all questions and hives, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=['questions', 'hives', 'all'], default='all', help='Which rows to reindex')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of rows updated per statement')
+
+    def handle(self, *args, **options):
+        models = {
+            'questions': [Questions],
+            'hives': [Hives],
+            'all': [Questions, Hives],
+        }[options['model']]
+
+        for model in models:
+            indexed = 0
+            for indexed in rebuild_index(model, options['chunk_size']):
+                self.stdout.write(f"{model._meta.db_table}: indexed {indexed} rows")
+            self.stdout.write(self.style.SUCCESS(f"{model._meta.db_table}: done ({indexed} rows)"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from pulse.reputation_utils import rebuild_tag_reputation
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-user per-tag reputation rollup (score_sum, answer_count) from the answers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='user_ids', help='Only rebuild this user (can be repeated)')
+
+    def handle(self, *args, **options):
+        rows = rebuild_tag_reputation(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f"UserTagReputation: done ({rows} rows)"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from services.notification_service import NotificationService
+
+
+class Command(BaseCommand):
+    help = "Recompute the unread notification counters from the notifications and fix the ones that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='user_ids', help='Only reconcile this user (can be repeated)')
+
+    def handle(self, *args, **options):
+        corrected = NotificationService.reconcile_unread_counts(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f"NotificationCounter: done ({corrected} counters corrected)"))
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.3 on 2026-10-18 17:58
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pulse', '0041_rename_code_context_line_number_questions_code_context_line_number_start_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questions',
+            name='tag_names',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddIndex(
+            model_name='questions',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_names'], name='tag_names_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        # Backfill tag_names and the weighted search_vector for existing questions
+        migrations.RunSQL(
+            sql="""
+                UPDATE "Questions" AS q
+                SET tag_names = t.tag_names,
+                    search_vector =
+                        setweight(to_tsvector('english', unaccent(coalesce(q.title, ''))), 'A') ||
+                        setweight(to_tsvector('english', unaccent(coalesce(q.description, ''))), 'B') ||
+                        setweight(to_tsvector('english', unaccent(t.tag_names)), 'C')
+                FROM (
+                    SELECT qt.questions_id AS question_id, string_agg(tg.name, ' ' ORDER BY tg.name) AS tag_names
+                    FROM "Questions_tags" AS qt
+                    JOIN "Tags" AS tg ON tg.tag_id = qt.tags_id
+                    GROUP BY qt.questions_id
+                    UNION ALL
+                    SELECT q2.question_id, ''
+                    FROM "Questions" AS q2
+                    WHERE NOT EXISTS (SELECT 1 FROM "Questions_tags" AS qt2 WHERE qt2.questions_id = q2.question_id)
+                ) AS t
+                WHERE q.question_id = t.question_id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
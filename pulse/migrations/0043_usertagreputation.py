@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pulse', '0042_questions_tag_names_questions_tag_names_trgm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTagReputation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score_sum', models.BigIntegerField(default=0)),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pulse.tags')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pulse.users')),
+            ],
+            options={
+                'db_table': 'UserTagReputation',
+                'constraints': [models.UniqueConstraint(fields=('user', 'tag'), name='unique_user_tag')],
+            },
+        ),
+        # Backfill the counters from the scores of the existing answers
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO "UserTagReputation" (user_id, tag_id, score_sum)
+                SELECT a.expert_id, qt.tags_id, SUM(a.score)
+                FROM "Answers" AS a
+                JOIN "Questions_tags" AS qt ON qt.questions_id = a.question_id
+                WHERE a.expert_id IS NOT NULL
+                GROUP BY a.expert_id, qt.tags_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
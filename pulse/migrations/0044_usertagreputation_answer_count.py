@@ -0,0 +1,34 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pulse', '0043_usertagreputation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertagreputation',
+            name='answer_count',
+            field=models.IntegerField(default=0),
+        ),
+        # Backfill the answer counts of the existing rows
+        migrations.RunSQL(
+            sql="""
+                UPDATE "UserTagReputation" AS r
+                SET answer_count = c.answer_count
+                FROM (
+                    SELECT a.expert_id, qt.tags_id, COUNT(*) AS answer_count
+                    FROM "Answers" AS a
+                    JOIN "Questions_tags" AS qt ON qt.questions_id = a.question_id
+                    WHERE a.expert_id IS NOT NULL
+                    GROUP BY a.expert_id, qt.tags_id
+                ) AS c
+                WHERE r.user_id = c.expert_id AND r.tag_id = c.tags_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
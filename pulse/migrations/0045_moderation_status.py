@@ -0,0 +1,36 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pulse', '0044_usertagreputation_answer_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answers',
+            name='moderation_status',
+            field=models.CharField(choices=[('pending_moderation', 'Pending Moderation'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='approved', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='comments',
+            name='moderation_status',
+            field=models.CharField(choices=[('pending_moderation', 'Pending Moderation'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='approved', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='notifications',
+            name='notification_type',
+            field=models.CharField(choices=[('question_answered', 'New Answer'), ('answer_commented', 'New Comment'), ('question_upvoted', 'Answer Accepted'), ('answer_accepted', 'Mention'), ('mention', 'Vote Received'), ('hive_accepted', 'Hive Accepted'), ('hive_rejected', 'Hive Rejected'), ('content_rejected', 'Content Rejected')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='answers',
+            index=models.Index(condition=models.Q(('moderation_status', 'pending_moderation')), fields=['created_at'], name='answers_pending_moderation'),
+        ),
+        migrations.AddIndex(
+            model_name='comments',
+            index=models.Index(condition=models.Q(('moderation_status', 'pending_moderation')), fields=['created_at'], name='comments_pending_moderation'),
+        ),
+    ]
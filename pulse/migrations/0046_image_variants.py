@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pulse', '0045_moderation_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hives',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='users',
+            name='profile_image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pulse', '0046_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to='pulse.users')),
+                ('unread_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'NotificationCounter',
+            },
+        ),
+        # Backfill the counters of the users who have unread notifications
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO "NotificationCounter" (user_id, unread_count)
+                SELECT recipient_id, COUNT(*)
+                FROM "Notifications"
+                WHERE NOT read
+                GROUP BY recipient_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,5 +1,6 @@
 import uuid
-from django.db import models, connection
+from django.db import models
+from django.utils import timezone
 from django.contrib.postgres.search import SearchVectorField, SearchVector
 from django.contrib.postgres.indexes import GinIndex
 
@@ -13,6 +14,14 @@ from django.contrib.postgres.indexes import GinIndex
 #    python manage.py makemigrations
 #    python manage.py migrate
 
+# Moderation states of user content: with MODERATION_MODE = 'async' new answers and comments are saved as
+# pending and checked in the background (see services/moderation_service.py), rejected content is hidden
+MODERATION_STATUSES = [
+    ('pending_moderation', 'Pending Moderation'),
+    ('approved', 'Approved'),
+    ('rejected', 'Rejected'),
+]
+
 class Answers(models.Model):
     answer_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     expert = models.ForeignKey('Users', on_delete=models.SET_NULL, blank=True, null=True)  # don't delete answer if user is removed (just make anon)
@@ -20,9 +29,14 @@ class Answers(models.Model):
     score = models.BigIntegerField(default=0)
     response = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    moderation_status = models.CharField(max_length=20, choices=MODERATION_STATUSES, default='approved')
 
     class Meta:
         db_table = 'Answers'
+        indexes = [
+            # Content still waiting for moderation (see the moderate_pending command)
+            models.Index(fields=['created_at'], condition=models.Q(moderation_status='pending_moderation'), name='answers_pending_moderation'),
+        ]
         
 class Votes(models.Model):
     # Vote choices for vote type
@@ -48,10 +62,12 @@ class Hives(models.Model):
     description = models.TextField()
     member_count = models.BigIntegerField(default=0)
     avatar_url = models.URLField(blank=True, null=True)
+    avatar_variants = models.JSONField(default=dict, blank=True)  # {size: {format: URL}} of the resized avatars, see pulse/image_utils.py
     tags = models.ManyToManyField('Tags', related_name='hives', blank=True)
     approved = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Maintained from title, description and tags by pulse/signals.py
     search_vector = SearchVectorField(null=True, blank=True)
 
     # Add search functionality once that is complete
@@ -59,32 +75,7 @@ class Hives(models.Model):
         db_table = 'Hives'
         indexes = [
             GinIndex(fields=['search_vector']),  # GIN index
-        ]  
-    
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.update_search_vector()
-
-    def update_search_vector(self):
-        """
-        Update the search_vector field based on title, description, and tags.
-        """
-        # Aggregate tag names into a single string
-        tag_names = " ".join(self.tags.values_list('name', flat=True))
-        
-        # Combine title, description, and tag names
-        combined_text = f"{self.title} {self.description} {tag_names}"
-
-        # Update the search_vector using PostgreSQL's to_tsvector function
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                UPDATE "Hives"
-                SET search_vector = to_tsvector('english', %s)
-                WHERE hive_id = %s
-                """,
-                [combined_text, str(self.hive_id)]
-            )
+        ]
 
 class Badge(models.Model):
     badge_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -144,7 +135,11 @@ class Questions(models.Model):
     is_answered = models.BooleanField(default=False)
     view_count = models.BigIntegerField(default=0)
 
+    # Precomputed search document: weighted search_vector (title A, description B, tags C) and the tag names
+    # (for trigram similarity), so searches don't need to join and aggregate the tags of every candidate row.
+    # Both are maintained by pulse/signals.py whenever a question or its tags change.
     search_vector = SearchVectorField(null=True, blank=True)
+    tag_names = models.TextField(blank=True, default='')
 
     class Meta:
         db_table = 'Questions'
@@ -152,33 +147,9 @@ class Questions(models.Model):
             GinIndex(fields=['search_vector']),
             GinIndex(fields=['title'], name='title_trgm', opclasses=['gin_trgm_ops']),
             GinIndex(fields=['description'], name='description_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['tag_names'], name='tag_names_trgm', opclasses=['gin_trgm_ops']),
         ]
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.update_search_vector()
-
-    def update_search_vector(self):
-        """
-        Update the search_vector field based on title, description, and tags.
-        """
-        # Aggregate tag names into a single string
-        tag_names = " ".join(self.tags.values_list('name', flat=True))
-        
-        # Combine title, description, and tag names
-        combined_text = f"{self.title} {self.description} {tag_names}"
-
-        # Update the search_vector using PostgreSQL's to_tsvector function
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                UPDATE "Questions"
-                SET search_vector = to_tsvector('english', unaccent(%s))
-                WHERE question_id = %s
-                """,
-                [combined_text, str(self.question_id)]
-            )
-
 
 class Tags(models.Model):
     tag_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -198,6 +169,7 @@ class Users(models.Model):
     username = models.TextField(unique=True)
     reputation = models.BigIntegerField()
     profile_image_url = models.URLField(null=True, blank=True)  # URL to image in Supabase
+    profile_image_variants = models.JSONField(default=dict, blank=True)  # {size: {format: URL}}, see pulse/image_utils.py
     reputation = models.BigIntegerField(default=0)
 
     class Meta:
@@ -237,6 +209,21 @@ class UserBadgeProgress(models.Model):
         unique_together = ("user", "badge")
 
 
+class UserTagReputation(models.Model):
+    # Running totals of a user's answers to questions with a given tag (used for tag badges), kept up to
+    # date on votes, answer creation/deletion and question re-tagging instead of scanning the user's answers
+    user = models.ForeignKey("Users", on_delete=models.CASCADE)
+    tag = models.ForeignKey("Tags", on_delete=models.CASCADE)
+    score_sum = models.BigIntegerField(default=0)
+    answer_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "UserTagReputation"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'tag'], name='unique_user_tag')
+        ]
+
+
 class UserBadge(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey("Users", on_delete=models.CASCADE)
@@ -269,9 +256,14 @@ class Comments(models.Model):
     answer = models.ForeignKey('Answers', on_delete=models.CASCADE, blank=True, null=True)          # should delete comment if answer is deleted
     response = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    moderation_status = models.CharField(max_length=20, choices=MODERATION_STATUSES, default='approved')
 
     class Meta:
         db_table = 'Comments'
+        indexes = [
+            # Content still waiting for moderation (see the moderate_pending command)
+            models.Index(fields=['created_at'], condition=models.Q(moderation_status='pending_moderation'), name='comments_pending_moderation'),
+        ]
 
 class HiveMembers(models.Model):
     hive = models.ForeignKey('Hives', on_delete=models.CASCADE)  # delete user from hive if hive is deleted
@@ -295,6 +287,7 @@ class Notifications(models.Model):
         ('mention', 'Vote Received'),
         ('hive_accepted', 'Hive Accepted'),
         ('hive_rejected', 'Hive Rejected'),
+        ('content_rejected', 'Content Rejected'),
     ]
 
     notification_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -319,4 +312,38 @@ class Notifications(models.Model):
         indexes = [
             models.Index(fields=['recipient', '-created_at']),
             models.Index(fields=['recipient', 'read'])
-        ]
\ No newline at end of file
+        ]
+
+
+class NotificationCounter(models.Model):
+    # Number of unread notifications of a user, adjusted in the same transaction as the notifications are
+    # created, marked read/unread or deleted (see NotificationService), so the unread badge is a primary key read
+    user = models.OneToOneField('Users', on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'NotificationCounter'
+
+
+class DomainEvent(models.Model):
+    # Outbox of events whose side effects (e.g. notifications) are applied by a background worker: written in the
+    # same transaction as the change, deleted once handled (see services/outbox_service.py)
+    EVENT_STATUSES = [
+        ('pending', 'Pending'),
+        ('failed', 'Failed'),  # gave up after OUTBOX['MAX_ATTEMPTS'], kept for inspection
+    ]
+
+    event_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=EVENT_STATUSES, default='pending')
+    attempts = models.IntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)  # not retried before this time
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'DomainEvents'
+        indexes = [
+            models.Index(fields=['available_at'], condition=models.Q(status='pending'), name='domain_events_pending'),
+        ]
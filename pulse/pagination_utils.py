@@ -0,0 +1,113 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from uuid import UUID
+from django.core.exceptions import ValidationError
+from django.db.models import Field, Q, QuerySet
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor can't be decoded."""
+
+
+def encode_cursor(values: list) -> str:
+    """
+    Encode the sort values of the last row of a page into an opaque cursor.
+
+    Datetimes are kept at full (microsecond) precision so the next page starts exactly after the row.
+    """
+    def to_json(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, UUID):
+            return str(value)
+        return value
+
+    payload = json.dumps([to_json(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, fields: list[Field]) -> list:
+    """
+    Decode a cursor created by encode_cursor, converting and validating each value with the field it sorts by
+    (a tampered cursor raises InvalidCursor here, instead of failing in the query).
+
+    Args:
+        cursor (str): The opaque cursor sent by the client.
+        fields (list): Model fields (or annotation output fields) of the sort values, in order.
+
+    Returns:
+        list: The sort values of the last row of the previous page.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor("Invalid cursor")
+
+    try:
+        values = [field.clean(value, None) for field, value in zip(fields, values)]
+    except (ValidationError, TypeError, ValueError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+    if any(value is None for value in values):
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def keyset_filter(fields: list, values: list) -> Q:
+    """
+    Build the filter for rows that come after the given values when sorting by fields (all descending).
+
+    e.g. fields (created_at, question_id) gives:
+        created_at < v1 OR (created_at = v1 AND question_id < v2)
+    """
+    condition = Q()
+    preceding_equal = Q()
+    for field, value in zip(fields, values):
+        condition |= preceding_equal & Q(**{f'{field}__lt': value})
+        preceding_equal &= Q(**{field: value})
+    return condition
+
+
+def paginate_by_cursor(queryset: QuerySet, fields: list, cursor: str | None, page_size: int) -> tuple[list, str | None]:
+    """
+    Get one page of a queryset using keyset (cursor) pagination.
+
+    Unlike Paginator, this never runs a COUNT(*) and never scans skipped rows with OFFSET, so every
+    page costs the same no matter how deep it is. The last field should be unique (e.g. the primary key)
+    so that rows with equal sort values are neither skipped nor repeated, and float annotations should be
+    double precision (not real) so their values round-trip exactly through the cursor.
+
+    Args:
+        queryset (QuerySet): The filtered queryset to paginate.
+        fields (list): Fields (or annotations) to sort by, all in descending order.
+        cursor (str | None): Cursor returned with the previous page, or None for the first page.
+        page_size (int): Number of rows per page.
+
+    Returns:
+        tuple: The rows of the page, and the cursor for the next page (None if this is the last page).
+    """
+    queryset = queryset.order_by(*[f'-{field}' for field in fields])
+    if cursor:
+        sort_fields = [cursor_field(queryset, field) for field in fields]
+        queryset = queryset.filter(keyset_filter(fields, decode_cursor(cursor, sort_fields)))
+
+    # Fetch one extra row to know whether there is a next page
+    rows = list(queryset[:page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    next_cursor = encode_cursor([getattr(rows[-1], field) for field in fields])
+    return rows, next_cursor
+
+
+def cursor_field(queryset: QuerySet, name: str) -> Field:
+    """The model field, or the output field of the annotation, called name in a queryset."""
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    return queryset.model._meta.get_field(name)
@@ -0,0 +1,79 @@
+from typing import Iterable
+from django.db import connection, transaction
+from .models import UserTagReputation
+
+# The UserTagReputation rollup (score_sum, answer_count per user and tag) is adjusted with one set-based
+# upsert when answers are created or deleted and when questions are re-tagged (see pulse/signals.py).
+# Votes update score_sum directly, in the same statement as the answer's score (see VoteService).
+
+
+def _as_array(ids: Iterable | None) -> list | None:
+    return None if ids is None else [str(id) for id in ids]
+
+
+def adjust_tag_reputation(
+    sign: int,
+    answer_ids: Iterable | None = None,
+    question_ids: Iterable | None = None,
+    tag_ids: Iterable | None = None,
+    user_ids: Iterable | None = None,
+) -> None:
+    """
+    Add (sign=1) or subtract (sign=-1) the scores and counts of answers to the rollup of their expert,
+    for each tag of their question. A filter left as None matches everything.
+
+    Subtracting must happen before the answers or question tags are removed, adding after they are saved.
+
+    Args:
+        sign: 1 to add the answers, -1 to subtract them
+        answer_ids: Only these answers
+        question_ids: Only the answers to these questions
+        tag_ids: Only these tags of the questions
+        user_ids: Only the answers of these experts
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO "UserTagReputation" AS r (user_id, tag_id, score_sum, answer_count)
+            SELECT a.expert_id, qt.tags_id, %(sign)s * SUM(a.score), %(sign)s * COUNT(*)
+            FROM "Answers" AS a
+            JOIN "Questions_tags" AS qt ON qt.questions_id = a.question_id
+            WHERE a.expert_id IS NOT NULL
+              AND (%(answer_ids)s::uuid[] IS NULL OR a.answer_id = ANY(%(answer_ids)s::uuid[]))
+              AND (%(question_ids)s::uuid[] IS NULL OR a.question_id = ANY(%(question_ids)s::uuid[]))
+              AND (%(tag_ids)s::uuid[] IS NULL OR qt.tags_id = ANY(%(tag_ids)s::uuid[]))
+              AND (%(user_ids)s::uuid[] IS NULL OR a.expert_id = ANY(%(user_ids)s::uuid[]))
+            GROUP BY a.expert_id, qt.tags_id
+            ON CONFLICT (user_id, tag_id) DO UPDATE
+            SET score_sum = r.score_sum + EXCLUDED.score_sum,
+                answer_count = r.answer_count + EXCLUDED.answer_count
+            """,
+            {
+                "sign": sign,
+                "answer_ids": _as_array(answer_ids),
+                "question_ids": _as_array(question_ids),
+                "tag_ids": _as_array(tag_ids),
+                "user_ids": _as_array(user_ids),
+            }
+        )
+
+
+def rebuild_tag_reputation(user_ids: Iterable | None = None) -> int:
+    """
+    Recompute the rollup from the answers, for the given users (None for every user).
+
+    Returns:
+        int: Number of rollup rows after the rebuild
+    """
+    user_ids = _as_array(user_ids)
+    rows = UserTagReputation.objects.all()
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+
+    with transaction.atomic():
+        # Block votes and answers from updating the rollup while it is recomputed (reads still go through)
+        with connection.cursor() as cursor:
+            cursor.execute('LOCK TABLE "UserTagReputation" IN EXCLUSIVE MODE')
+        rows.delete()
+        adjust_tag_reputation(1, user_ids=user_ids)
+        return rows.count()
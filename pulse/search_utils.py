@@ -0,0 +1,130 @@
+import threading
+from typing import Iterable
+from django.db import connection, transaction
+from .models import Hives, Questions
+
+# Search documents (search_vector, and tag_names for questions) are recomputed with one set-based UPDATE
+# for a whole list of rows. Saves and tag changes only queue the affected ids, and the queue is indexed
+# once when the transaction commits (see pulse/signals.py).
+
+
+def _tag_names_subquery(model) -> str:
+    """SQL that aggregates the tag names of the rows whose ids are in %s (an array), one row per id."""
+    through = model.tags.through._meta
+    table = model._meta.db_table
+    pk = model._meta.pk.column
+    owner_column = through.get_field(model._meta.model_name).column
+    tag_column = through.get_field('tags').column
+
+    return f"""
+        SELECT m.{pk} AS id, coalesce(string_agg(tg.name, ' ' ORDER BY tg.name), '') AS tag_names
+        FROM "{table}" AS m
+        LEFT JOIN "{through.db_table}" AS mt ON mt.{owner_column} = m.{pk}
+        LEFT JOIN "Tags" AS tg ON tg.tag_id = mt.{tag_column}
+        WHERE m.{pk} = ANY(%s::uuid[])
+        GROUP BY m.{pk}
+    """
+
+
+def index_questions(question_ids: Iterable) -> None:
+    """Recompute tag_names and the weighted search_vector (title A, description B, tags C) of the given questions."""
+    question_ids = [str(question_id) for question_id in question_ids]
+    if not question_ids:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE "Questions" AS q
+            SET tag_names = t.tag_names,
+                search_vector =
+                    setweight(to_tsvector('english', unaccent(coalesce(q.title, ''))), 'A') ||
+                    setweight(to_tsvector('english', unaccent(coalesce(q.description, ''))), 'B') ||
+                    setweight(to_tsvector('english', unaccent(t.tag_names)), 'C')
+            FROM ({_tag_names_subquery(Questions)}) AS t
+            WHERE q.question_id = t.id
+            """,
+            [question_ids]
+        )
+
+
+def index_hives(hive_ids: Iterable) -> None:
+    """Recompute the search_vector of the given hives from their title, description and tags."""
+    hive_ids = [str(hive_id) for hive_id in hive_ids]
+    if not hive_ids:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE "Hives" AS h
+            SET search_vector = to_tsvector('english', h.title || ' ' || h.description || ' ' || t.tag_names)
+            FROM ({_tag_names_subquery(Hives)}) AS t
+            WHERE h.hive_id = t.id
+            """,
+            [hive_ids]
+        )
+
+
+INDEXERS = {
+    Questions: index_questions,
+    Hives: index_hives,
+}
+
+# Ids waiting to be indexed when the current transaction commits (connections are per thread, so is the queue)
+_queue = threading.local()
+
+
+def schedule_index(model, ids: Iterable) -> None:
+    """
+    Queue rows to have their search document recomputed when the current transaction commits.
+
+    All rows queued during a transaction are indexed together, with one UPDATE per model.
+    Outside of a transaction (autocommit) they are indexed right away.
+    """
+    pending = getattr(_queue, 'pending', None)
+    if pending is None:
+        pending = _queue.pending = {}
+    pending.setdefault(model, set()).update(ids)
+
+    # Every call registers the flush, the first one to run indexes everything queued so far and the
+    # others find the queue empty (this stays correct when a savepoint with a registered flush rolls back)
+    transaction.on_commit(flush_index_queue)
+
+
+def flush_index_queue() -> None:
+    """Index every row queued by schedule_index."""
+    pending = getattr(_queue, 'pending', None)
+    if not pending:
+        return
+    _queue.pending = {}
+
+    for model, ids in pending.items():
+        INDEXERS[model](ids)
+
+
+def rebuild_index(model, chunk_size: int = 1000) -> Iterable[int]:
+    """
+    Recompute the search documents of every row of a model, one set-based UPDATE per chunk of rows.
+
+    Yields:
+        int: Number of rows indexed so far, after each chunk
+    """
+    pk_name = model._meta.pk.name
+    indexed = 0
+    last_id = None
+
+    while True:
+        ids = model.objects.order_by(pk_name)
+        if last_id is not None:
+            ids = ids.filter(**{f'{pk_name}__gt': last_id})
+        ids = list(ids.values_list(pk_name, flat=True)[:chunk_size])
+        if not ids:
+            return
+
+        with transaction.atomic():
+            INDEXERS[model](ids)
+
+        indexed += len(ids)
+        last_id = ids[-1]
+        yield indexed
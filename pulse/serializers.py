@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from .models import *
+from services.view_counter_service import ViewCounterService
+from .image_utils import thumbnail_url
 
 # NOTE: Each model should have a corresponding serializer to handle validation and
 # conversion of incoming data, as well as serializing outgoing data to be
@@ -9,6 +11,7 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = Users
         fields = '__all__'
+        read_only_fields = ['profile_image_variants']
         
     def to_representation(self, instance):
         # Modify the reputation value to be at least 0
@@ -54,6 +57,14 @@ class UserBadgeSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_achieved(self, obj):
+        # Use the preloaded tiers/progress if the caller batched them (see AnswerThreadService)
+        if 'first_tier_thresholds' in self.context:
+            threshold = self.context['first_tier_thresholds'].get(obj.badge_id)
+            if threshold is None:
+                return False  # If no tiers exist, the badge can't be achieved
+            progress_value = self.context['badge_progress'].get((obj.user_id, obj.badge_id))
+            return progress_value is not None and progress_value >= threshold
+
         # Retrieve the first tier of the badge
         first_tier = obj.badge.tiers.order_by('reputation_threshold').first()
 
@@ -76,6 +87,13 @@ class UserBadgeProgressSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class UserTagReputationSerializer(serializers.ModelSerializer):
+    tag_name = serializers.CharField(source='tag.name', read_only=True)
+    class Meta:
+        model = UserTagReputation
+        fields = ['tag', 'tag_name', 'score_sum', 'answer_count']
+
+
 class AnswerSerializer(serializers.ModelSerializer):
     # Include expert info
     expert_info = UserSerializer(source='expert', read_only=True)
@@ -85,8 +103,14 @@ class AnswerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Answers
         fields = '__all__'
+        read_only_fields = ['moderation_status']
 
     def get_expert_badges(self, obj):
+        # Use the preloaded badges if the caller batched them (see AnswerThreadService)
+        if 'expert_badges' in self.context:
+            badges = self.context['expert_badges'].get(obj.answer_id, [])
+            return UserBadgeSerializer(badges, many=True, context=self.context).data
+
         user = obj.expert
         if user:
             # Fetch global badges
@@ -116,7 +140,8 @@ class CommentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Comments
-        fields = '__all__' 
+        fields = '__all__'
+        read_only_fields = ['moderation_status'] 
         
 class ProjectSerializer(serializers.ModelSerializer):
    # This allows us to get the user info of the owner as a dictionary, based on the owner_id (for GET requests)
@@ -133,6 +158,7 @@ class HiveSerializer(serializers.ModelSerializer):
     class Meta:
         model = Hives
         fields = '__all__'
+        read_only_fields = ['avatar_variants']
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
@@ -150,6 +176,15 @@ class QuestionSerializer(serializers.ModelSerializer):
         model = Questions
         fields = '__all__'
 
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+
+        # Include the views that are buffered but not yet written to the database
+        if 'view_count' in representation:
+            representation['view_count'] += ViewCounterService.get_pending(instance.question_id)
+
+        return representation
+
 class VoteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Votes
@@ -186,4 +221,42 @@ class NotificationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Notifications
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class NotificationSummarySerializer(serializers.ModelSerializer):
+    """
+    Compact version of NotificationSerializer for the inbox: the ids of the related entities and only what is
+    displayed for them. Expects the queryset to select_related('question', 'hive', 'actor'), see NOTIFICATION_SUMMARY_FIELDS.
+    """
+    question_title = serializers.CharField(source='question.title', read_only=True, default=None)
+    hive_title = serializers.SerializerMethodField()
+    actor_username = serializers.CharField(source='actor.username', read_only=True, default=None)
+    actor_avatar = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Notifications
+        fields = [
+            'notification_id', 'notification_type', 'message', 'read', 'created_at',
+            'question', 'answer', 'comment', 'hive', 'actor',
+            'question_title', 'hive_title', 'actor_username', 'actor_avatar',
+        ]
+
+    def get_hive_title(self, instance):
+        # hive_title is stored for notifications about hive requests, which may not have a hive anymore
+        if instance.hive_title:
+            return instance.hive_title
+        return instance.hive.title if instance.hive else None
+
+    def get_actor_avatar(self, instance):
+        if instance.actor is None:
+            return None
+        return thumbnail_url(instance.actor.profile_image_variants, instance.actor.profile_image_url)
+
+
+# Columns loaded for NotificationSummarySerializer (with select_related('question', 'hive', 'actor'))
+NOTIFICATION_SUMMARY_FIELDS = [
+    'notification_id', 'notification_type', 'message', 'read', 'created_at', 'hive_title',
+    'question', 'answer', 'comment', 'hive', 'actor',
+    'question__title', 'hive__title',
+    'actor__username', 'actor__profile_image_url', 'actor__profile_image_variants',
+]
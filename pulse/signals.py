@@ -0,0 +1,114 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .models import Answers, Badge, BadgeTier, Comments, Hives, Questions, Tags
+from .reputation_utils import adjust_tag_reputation
+from .search_utils import schedule_index
+from services.badge_service import BadgeService
+from services.notification_service import NotificationService
+
+# Keep the search documents of questions and hives up to date. The indexing itself runs once per
+# transaction (on commit), after the serializer has set the M2M tags, see pulse/search_utils.py.
+
+
+@receiver(post_save, sender=Questions)
+@receiver(post_save, sender=Hives)
+def index_on_save(sender, instance, **kwargs):
+    """Reindex a question or hive when it is saved (title/description may have changed)."""
+    schedule_index(sender, [instance.pk])
+
+
+@receiver(post_save, sender=Tags)
+def index_on_tag_rename(sender, instance, created, **kwargs):
+    """Reindex the questions and hives that use a tag when the tag is updated."""
+    if created:
+        return
+    schedule_index(Questions, instance.questions.values_list('pk', flat=True))
+    schedule_index(Hives, instance.hives.values_list('pk', flat=True))
+
+
+def index_on_tags_changed(model):
+    """Build the m2m_changed receiver that reindexes a model's rows when their tags change."""
+    def receiver(sender, instance, action, reverse, pk_set, **kwargs):
+        if not reverse:
+            # question.tags.add(...)/remove(...)/set(...)/clear()
+            if action in ('post_add', 'post_remove', 'post_clear'):
+                schedule_index(model, [instance.pk])
+        elif action in ('post_add', 'post_remove'):
+            # tag.questions.add(...)/remove(...)
+            schedule_index(model, pk_set)
+        elif action == 'pre_clear':
+            # tag.questions.clear(): the affected rows are only known before the clear
+            schedule_index(model, getattr(instance, model.tags.field.related_query_name()).values_list('pk', flat=True))
+
+    return receiver
+
+
+index_questions_on_tags_changed = index_on_tags_changed(Questions)
+index_hives_on_tags_changed = index_on_tags_changed(Hives)
+m2m_changed.connect(index_questions_on_tags_changed, sender=Questions.tags.through)
+m2m_changed.connect(index_hives_on_tags_changed, sender=Hives.tags.through)
+
+
+@receiver([post_save, post_delete], sender=Badge)
+@receiver([post_save, post_delete], sender=BadgeTier)
+def reload_badges(sender, **kwargs):
+    """Clear this process' badge/tier cache when a badge or tier changes (other processes reload it after its TTL)."""
+    BadgeService.invalidate()
+
+
+# Keep the per-user per-tag reputation rollup up to date (votes update it themselves, see VoteService)
+
+
+@receiver(post_save, sender=Answers)
+def count_new_answer(sender, instance, created, **kwargs):
+    """Add a new answer to its expert's rollup for each tag of the question."""
+    if created:
+        adjust_tag_reputation(1, answer_ids=[instance.pk])
+
+
+@receiver(pre_delete, sender=Answers)
+def uncount_deleted_answer(sender, instance, **kwargs):
+    """Remove a deleted answer from its expert's rollup (before the answer row is gone)."""
+    adjust_tag_reputation(-1, answer_ids=[instance.pk])
+
+
+@receiver(m2m_changed, sender=Questions.tags.through)
+def retag_answers(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Move the answers of re-tagged questions between tag rollups. Removed tags are subtracted before the
+    removal (only the tags the question really had are matched), added tags after the insert.
+    """
+    sign = {'pre_remove': -1, 'pre_clear': -1, 'post_add': 1}.get(action)
+    if sign is None or (action != 'pre_clear' and not pk_set):
+        return
+
+    if not reverse:
+        # question.tags.add(...)/remove(...)/set(...)/clear()
+        adjust_tag_reputation(sign, question_ids=[instance.pk], tag_ids=pk_set)
+    else:
+        # tag.questions.add(...)/remove(...)/clear()
+        adjust_tag_reputation(sign, question_ids=pk_set, tag_ids=[instance.pk])
+
+
+# Keep the unread notification counters up to date (creating, marking and deleting notifications adjust them in
+# NotificationService). Notifications have no delete receivers, so they are deleted by cascade in one DELETE: the
+# counts are adjusted per deleted object they are about, with one statement each. Deleting a user needs nothing,
+# their NotificationCounter row goes with their notifications (and the questions, answers... they wrote send
+# these signals too).
+
+# Notifications field referencing each model
+NOTIFICATION_FIELDS = {
+    Questions: 'question',
+    Answers: 'answer',
+    Comments: 'comment',
+    Hives: 'hive',
+}
+
+
+@receiver(pre_delete, sender=Questions)
+@receiver(pre_delete, sender=Answers)
+@receiver(pre_delete, sender=Comments)
+@receiver(pre_delete, sender=Hives)
+def uncount_deleted_notifications(sender, instance, **kwargs):
+    """Subtract the unread notifications about a deleted object from their recipients' counts (before the cascade)."""
+    NotificationService.uncount_notifications_of(NOTIFICATION_FIELDS[sender], instance.pk)
@@ -0,0 +1,24 @@
+import json
+from typing import AsyncIterable, Iterable
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+# Server-sent events (text/event-stream) responses, for endpoints that forward results as they are generated.
+# Each event is written as "event: <name>" and "data: <json>" lines followed by a blank line.
+
+
+def sse_event(event: str, data) -> str:
+    """Format one server-sent event with a JSON payload (UUIDs and datetimes encoded like JsonResponse does)."""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+# A comment line, ignored by EventSource, sent on idle streams so proxies don't close the connection
+SSE_KEEPALIVE = ": keep-alive\n\n"
+
+
+def sse_response(events: Iterable[str] | AsyncIterable[str]) -> StreamingHttpResponse:
+    """Stream formatted events to the client (from an async generator in async views), each one flushed as soon as it is produced."""
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let a reverse proxy (nginx) buffer the stream
+    return response
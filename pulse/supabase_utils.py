@@ -1,45 +1,72 @@
+import asyncio
+import threading
+import weakref
 from django.conf import settings
-from supabase import create_client, Client
+from supabase import acreate_client, AsyncClient
 
+# Clients created on first use, one per event loop (their connections can't be shared between loops), and the
+# buckets known to exist, so uploads don't check the bucket list every time
+_async_clients = weakref.WeakKeyDictionary()
+_existing_buckets: set = set()
+_lock = threading.Lock()
 
-def get_supabase_client() -> Client:
-    url: str = settings.SUPABASE_URL
-    key: str = settings.SUPABASE_ANON_KEY
-    return create_client(url, key)
 
+async def get_async_supabase_client() -> AsyncClient:
+    """
+    Get the Supabase client of the running event loop (storage calls are awaited).
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        url: str = settings.SUPABASE_URL
+        key: str = settings.SUPABASE_ANON_KEY
+        client = _async_clients.setdefault(loop, await acreate_client(url, key))
+    return client
+
+
+def public_url(bucket_name, path):
+    """
+    The URL of a file in a public bucket.
+    """
+    return f"{settings.SUPABASE_URL}/storage/v1/object/public/{bucket_name}/{path}"
 
-def create_bucket_if_not_exists(bucket_name):
+
+def forget_bucket(bucket_name):
+    """
+    Forget that the specified bucket exists (e.g. an upload to it failed), the next upload checks it again.
+    """
+    with _lock:
+        _existing_buckets.discard(bucket_name)
+
+
+async def acreate_bucket_if_not_exists(bucket_name):
     """
     Checks if the specified bucket exists and creates it if it doesn't.
+    Only checked once per process, until forget_bucket is called.
     """
-    supabase = get_supabase_client()
+    if bucket_name in _existing_buckets:
+        return True
+
+    supabase = await get_async_supabase_client()
 
     # Check if the bucket exists
-    buckets = supabase.storage.list_buckets()
-
-    # Check if the response is successful and get the list of buckets
-    if isinstance(buckets, list):
-
-        # Get all bucket names
-        bucket_names = [bucket.name for bucket in buckets]
-
-        # Check if the specified bucket already exists
-        if bucket_name in bucket_names:
-            print(f"Bucket '{bucket_name}' already exists.")
-        else:
-            # Create the bucket since it doesn't exist
-            try:
-                response = supabase.storage.create_bucket(bucket_name)
-                if "error" in response:
-                    print(f"Error creating bucket: {response['error']}")
-                    return False
-                else:
-                    print(f"Bucket '{bucket_name}' created successfully.")
-                return True
-            except Exception as e:
-                print("Error creating bucket: ", e)
-                return False
-    else:
+    buckets = await supabase.storage.list_buckets()
+    if not isinstance(buckets, list):
         print(f"Unexpected response format: {buckets}")
+        return True
+
+    if bucket_name not in [bucket.name for bucket in buckets]:
+        # Create the bucket since it doesn't exist
+        try:
+            response = await supabase.storage.create_bucket(bucket_name)
+            if "error" in response:
+                print(f"Error creating bucket: {response['error']}")
+                return False
+            print(f"Bucket '{bucket_name}' created successfully.")
+        except Exception as e:
+            print("Error creating bucket: ", e)
+            return False
 
-    return True
\ No newline at end of file
+    with _lock:
+        _existing_buckets.add(bucket_name)
+    return True
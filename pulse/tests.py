@@ -1,3 +1,605 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+from django.db import connection
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from .models import Answers, Comments, DomainEvent, HiveMembers, Hives, NotificationCounter, Notifications, Questions, Users, Votes
+from .pagination_utils import InvalidCursor, decode_cursor, encode_cursor, keyset_filter, paginate_by_cursor
+from services.ai_model_service import SuggestionStreamParser, new_window_suggestions, split_into_windows
+from services.moderation_backends import MicroBatcher, ModerationBackend
+from services.notification_service import NotificationService
+from services.outbox_service import OutboxService
+from services.result_cache import MISS, LocalBackend
+from services.stats_service import StatsService
+from services.vote_service import VoteService
 
-# Create your tests here.
+
+def create_user(username: str) -> Users:
+    """Create a user, along with the Supabase auth.users row it references."""
+    user_id = uuid.uuid4()
+    with connection.cursor() as cursor:
+        # auth.users is managed by Supabase, so it doesn't exist in a fresh test database
+        cursor.execute('CREATE SCHEMA IF NOT EXISTS auth')
+        cursor.execute('CREATE TABLE IF NOT EXISTS auth.users (id uuid PRIMARY KEY)')
+        cursor.execute('INSERT INTO auth.users (id) VALUES (%s)', [str(user_id)])
+    return Users.objects.create(user_id=user_id, username=username)
+
+
+class VoteServiceTests(TestCase):
+    def setUp(self):
+        self.asker = create_user('asker')
+        self.expert = create_user('expert')
+        self.voter = create_user('voter')
+        self.hive = Hives.objects.create(title='hive', description='hive', approved=True)
+        HiveMembers.objects.create(hive=self.hive, user=self.expert)
+        self.question = Questions.objects.create(asker=self.asker, related_hive=self.hive, title='title', description='description')
+        self.answer = Answers.objects.create(expert=self.expert, question=self.question, response='response')
+
+    def test_upvote_toggle_and_switch(self):
+        result = VoteService.cast_vote(self.voter.pk, self.answer.pk, 'upvote')
+        self.assertEqual(result, {"message": "Upvote successful", "new_score": 1})
+
+        result = VoteService.cast_vote(self.voter.pk, self.answer.pk, 'downvote')
+        self.assertEqual(result, {"message": "Vote switched to downvote", "new_score": -1})
+
+        result = VoteService.cast_vote(self.voter.pk, self.answer.pk, 'downvote')
+        self.assertEqual(result, {"message": "Downvote removed", "new_score": 0})
+        self.assertFalse(Votes.objects.filter(user=self.voter, answer=self.answer).exists())
+
+    def test_hive_reputation_follows_score(self):
+        VoteService.cast_vote(self.voter.pk, self.answer.pk, 'upvote')
+        VoteService.cast_vote(self.asker.pk, self.answer.pk, 'upvote')
+        VoteService.cast_vote(self.asker.pk, self.answer.pk, 'downvote')
+
+        member = HiveMembers.objects.get(hive=self.hive, user=self.expert)
+        self.assertEqual(member.hive_reputation, 0)
+        self.answer.refresh_from_db()
+        self.assertEqual(self.answer.score, 0)
+
+    def test_missing_answer(self):
+        with self.assertRaises(Answers.DoesNotExist):
+            VoteService.cast_vote(self.voter.pk, uuid.uuid4(), 'upvote')
+
+    def test_query_count(self):
+        with CaptureQueriesContext(connection) as context:
+            VoteService.cast_vote(self.voter.pk, self.answer.pk, 'upvote')
+        # Savepoint + lock + vote read + vote write + score/reputation update + release
+        self.assertLessEqual(len(context.captured_queries), 6)
+
+
+class VoteServiceConcurrencyTests(TransactionTestCase):
+    """Votes are applied from several threads at once (each thread has its own database connection)."""
+
+    def setUp(self):
+        self.expert = create_user('expert')
+        self.hive = Hives.objects.create(title='hive', description='hive', approved=True)
+        HiveMembers.objects.create(hive=self.hive, user=self.expert)
+        self.question = Questions.objects.create(asker=self.expert, related_hive=self.hive, title='title', description='description')
+        self.answer = Answers.objects.create(expert=self.expert, question=self.question, response='response')
+
+    def run_concurrently(self, calls, workers=8):
+        def run(call):
+            try:
+                return VoteService.cast_vote(*call)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(run, calls))
+
+    def assert_consistent(self):
+        """The answer's score and the expert's hive reputation match the votes that were recorded."""
+        votes = list(Votes.objects.filter(answer=self.answer).values_list('vote_type', flat=True))
+        expected_score = votes.count('upvote') - votes.count('downvote')
+
+        self.answer.refresh_from_db()
+        member = HiveMembers.objects.get(hive=self.hive, user=self.expert)
+        self.assertEqual(self.answer.score, expected_score)
+        self.assertEqual(member.hive_reputation, expected_score)
+        return expected_score
+
+    def test_concurrent_upvotes_are_not_lost(self):
+        voters = [create_user(f'voter{i}') for i in range(20)]
+        self.run_concurrently([(voter.pk, self.answer.pk, 'upvote') for voter in voters])
+
+        self.assertEqual(self.assert_consistent(), 20)
+
+    def test_concurrent_mixed_votes_by_the_same_users(self):
+        voters = [create_user(f'voter{i}') for i in range(5)]
+        calls = [
+            (voter.pk, self.answer.pk, vote_type)
+            for voter in voters
+            for vote_type in ('upvote', 'downvote', 'upvote', 'upvote', 'downvote')
+        ]
+        results = self.run_concurrently(calls)
+
+        final_score = self.assert_consistent()
+        # Votes on the same answer are applied one at a time, so one of them returned the final score
+        self.assertIn(final_score, [result['new_score'] for result in results])
+
+
+def unread_counts_match(test):
+    """Assert that every user's NotificationCounter equals the COUNT(*) of their unread notifications."""
+    counters = dict(NotificationCounter.objects.values_list('user_id', 'unread_count'))
+    for user_id in Users.objects.values_list('user_id', flat=True):
+        unread = Notifications.objects.filter(recipient_id=user_id, read=False).count()
+        test.assertEqual(counters.get(user_id, 0), unread, f"unread count of user {user_id}")
+
+
+class NotificationCounterTests(TransactionTestCase):
+    """The unread counters are adjusted by every change to the notifications (some of them from several threads)."""
+
+    def setUp(self):
+        self.asker = create_user('asker')
+        self.expert = create_user('expert')
+        self.question = Questions.objects.create(asker=self.asker, title='title', description='description')
+        self.answer = Answers.objects.create(expert=self.expert, question=self.question, response='response')
+        self.comment = Comments.objects.create(expert=self.asker, answer=self.answer, response='comment')
+
+    def notify(self, recipient, count, **related):
+        return [NotificationService.create_notification(recipient, 'mention', **related) for _ in range(count)]
+
+    def test_create_mark_and_delete(self):
+        notifications = self.notify(self.asker, 4)
+        unread_counts_match(self)
+        self.assertEqual(NotificationService.get_unread_count(self.asker.pk), 4)
+
+        # Marking twice only changes the count once
+        for _ in range(2):
+            NotificationService.mark_as_read(self.asker.pk, notifications[0].pk)
+        unread_counts_match(self)
+        NotificationService.mark_as_unread(self.asker.pk, notifications[0].pk)
+        NotificationService.mark_as_read(self.asker.pk, notifications[1].pk)
+        unread_counts_match(self)
+
+        # Another user can't mark or delete them
+        NotificationService.mark_as_read(self.expert.pk, notifications[2].pk)
+        self.assertFalse(NotificationService.delete(self.expert.pk, notifications[2].pk))
+        unread_counts_match(self)
+
+        # Deleting a read and an unread notification
+        self.assertTrue(NotificationService.delete(self.asker.pk, notifications[1].pk))
+        self.assertTrue(NotificationService.delete(self.asker.pk, notifications[2].pk))
+        unread_counts_match(self)
+        self.assertEqual(NotificationService.get_unread_count(self.asker.pk), 2)
+
+    def test_cascade_delete(self):
+        # Notifications about several of the deleted objects are only subtracted once
+        self.notify(self.asker, 3, question=self.question, answer=self.answer)
+        self.notify(self.expert, 2, answer=self.answer, comment=self.comment)
+        self.notify(self.expert, 1, comment=self.comment)
+        kept = self.notify(self.expert, 1)
+        NotificationService.mark_as_read(self.expert.pk, kept[0].pk)
+        self.notify(self.expert, 2)
+
+        with CaptureQueriesContext(connection) as context:
+            self.question.delete()
+        # One statement per deleted object, not one per notification
+        self.assertLess(len(context.captured_queries), 20)
+        unread_counts_match(self)
+        self.assertEqual(NotificationService.get_unread_count(self.expert.pk), 2)
+
+        expert_id = self.expert.pk
+        self.expert.delete()
+        unread_counts_match(self)
+        self.assertFalse(NotificationCounter.objects.filter(user_id=expert_id).exists())
+
+    def test_concurrent_marks(self):
+        notifications = self.notify(self.asker, 10)
+
+        def run(call):
+            try:
+                return call[0](self.asker.pk, call[1].pk)
+            finally:
+                connection.close()
+
+        calls = [
+            (method, notification)
+            for notification in notifications
+            for method in (NotificationService.mark_as_read, NotificationService.mark_as_unread, NotificationService.mark_as_read)
+        ]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(run, calls))
+
+        unread_counts_match(self)
+
+    def test_reconcile_corrects_drift(self):
+        self.notify(self.asker, 3)
+        self.notify(self.expert, 2)
+        NotificationCounter.objects.filter(user=self.asker).update(unread_count=42)
+        NotificationCounter.objects.filter(user=self.expert).delete()
+        # Created without the service, so without adjusting the count
+        Notifications.objects.create(recipient=self.asker, notification_type='mention', message='mention')
+
+        self.assertEqual(NotificationService.reconcile_unread_counts([self.asker.pk]), 1)
+        self.assertEqual(NotificationCounter.objects.get(user=self.asker).unread_count, 4)
+        self.assertEqual(NotificationService.reconcile_unread_counts(), 1)
+        unread_counts_match(self)
+        self.assertEqual(NotificationService.reconcile_unread_counts(), 0)
+        self.assertEqual(NotificationService.get_unread_count(self.asker.pk), 4)
+
+
+class NotificationBulkTests(TransactionTestCase):
+    """The bulk notification operations keep the unread counters in sync, also when run concurrently."""
+
+    def setUp(self):
+        self.users = [create_user(f'user{i}') for i in range(6)]
+
+    def test_create_notifications_bulk(self):
+        recipients = self.users + [self.users[0].pk, str(self.users[1].pk).upper(), None]
+        notifications = NotificationService.create_notifications_bulk(recipients, 'mention')
+
+        # Duplicates (users, IDs in any case) and None are skipped
+        self.assertEqual(len(notifications), len(self.users))
+        unread_counts_match(self)
+        NotificationService.create_notifications_bulk([user.pk for user in self.users[:3]], 'mention')
+        unread_counts_match(self)
+        self.assertEqual(NotificationService.get_unread_count(self.users[0].pk), 2)
+
+    def test_mark_many_and_delete_many(self):
+        user = self.users[0]
+        notifications = [NotificationService.create_notification(user, 'mention') for _ in range(5)]
+        other = NotificationService.create_notification(self.users[1], 'mention')
+        ids = [notification.pk for notification in notifications]
+
+        # Only the ones that change are counted, notifications of other users are ignored
+        self.assertEqual(NotificationService.mark_many_as_read(user.pk, ids[:3] + [other.pk]), 3)
+        self.assertEqual(NotificationService.mark_many_as_read(user.pk, ids[:3]), 0)
+        unread_counts_match(self)
+        self.assertEqual(NotificationService.mark_many_as_unread(user.pk, ids[:2]), 2)
+        unread_counts_match(self)
+        self.assertEqual(NotificationService.mark_many_as_read(user.pk), 4)
+        self.assertEqual(NotificationService.get_unread_count(user.pk), 0)
+        NotificationService.mark_many_as_unread(user.pk, ids[:2])
+
+        self.assertEqual(NotificationService.delete_many(user.pk, ids[1:3] + [other.pk]), 2)
+        unread_counts_match(self)
+        self.assertEqual(NotificationService.delete_many(user.pk), 3)
+        unread_counts_match(self)
+        self.assertEqual(NotificationService.get_unread_count(self.users[1].pk), 1)
+
+    def test_concurrent_bulk_creations(self):
+        # Overlapping recipients, in different orders: the counter rows are locked in the same order (no deadlock)
+        recipient_lists = [self.users, self.users[::-1], self.users[2:] + self.users[:2]] * 4
+
+        def run(recipients):
+            try:
+                return NotificationService.create_notifications_bulk(recipients, 'mention')
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(run, recipient_lists))
+
+        unread_counts_match(self)
+        self.assertEqual(NotificationService.get_unread_count(self.users[0].pk), len(recipient_lists))
+
+
+@override_settings(OUTBOX={'IN_PROCESS': False, 'BATCH_SIZE': 5, 'MAX_ATTEMPTS': 3, 'RETRY_DELAY': 10})
+class OutboxServiceTests(TransactionTestCase):
+    """Events are claimed by several workers at once (each thread has its own database connection)."""
+
+    def setUp(self):
+        self.asker = create_user('asker')
+        self.expert = create_user('expert')
+        self.question = Questions.objects.create(asker=self.asker, title='title', description='description')
+
+    def record_answers(self, count):
+        for i in range(count):
+            answer = Answers.objects.create(expert=self.expert, question=self.question, response=f'response {i}')
+            OutboxService.record('answer_created', {'answer_id': str(answer.pk)})
+
+    def test_concurrent_workers_handle_each_event_once(self):
+        self.record_answers(23)
+
+        def run(_):
+            try:
+                return OutboxService.drain()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            processed = sum(executor.map(run, range(4)))
+
+        self.assertEqual(processed, 23)
+        self.assertFalse(DomainEvent.objects.exists())
+        self.assertEqual(Notifications.objects.filter(recipient=self.asker).count(), 23)
+        unread_counts_match(self)
+
+    def test_failed_handler_rolls_back_to_its_savepoint(self):
+        self.record_answers(2)
+
+        def notify_then_fail(payload):
+            NotificationService.create_notification(self.asker, 'mention')
+            raise RuntimeError('handler failed')
+
+        handle = OutboxService._handle_answer_created
+        calls = []
+
+        def fail_first(payload):
+            calls.append(payload)
+            return notify_then_fail(payload) if len(calls) == 1 else handle(payload)
+
+        with mock.patch.object(OutboxService, '_handle_answer_created', side_effect=fail_first):
+            result = OutboxService.process_batch()
+
+        self.assertEqual(result, {'claimed': 2, 'processed': 1, 'failed': 1})
+        # Only the other event's notification is kept, the failed event stays for a retry
+        self.assertEqual(Notifications.objects.count(), 1)
+        self.assertEqual(Notifications.objects.get().notification_type, 'question_answered')
+        unread_counts_match(self)
+        event = DomainEvent.objects.get()
+        self.assertEqual((event.status, event.attempts, event.last_error), ('pending', 1, 'handler failed'))
+
+    def test_backoff_and_max_attempts(self):
+        self.record_answers(1)
+        event = DomainEvent.objects.get()
+
+        with mock.patch.object(OutboxService, '_handle_answer_created', side_effect=RuntimeError('handler failed')):
+            for attempt, delay in [(1, 10), (2, 20)]:
+                before = timezone.now()
+                self.assertEqual(OutboxService.process_batch()['failed'], 1)
+                event.refresh_from_db()
+                self.assertEqual((event.status, event.attempts), ('pending', attempt))
+                self.assertGreaterEqual(event.available_at, before + timedelta(seconds=delay))
+
+                # Not due yet
+                self.assertEqual(OutboxService.process_batch()['claimed'], 0)
+                DomainEvent.objects.update(available_at=timezone.now())
+
+            OutboxService.process_batch()
+
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('failed', 3))
+        # Failed events are never claimed again
+        self.assertEqual(OutboxService.process_batch()['claimed'], 0)
+
+
+class BlockingBackend(ModerationBackend):
+    """A moderation backend whose batches wait for release to be set."""
+
+    model = 'blocking'
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.batches = []
+
+    def classify_batch(self, texts: list) -> list:
+        self.batches.append(texts)
+        self.release.wait(5)
+        return [[{"label": "ok", "score": 1.0}] for _ in texts]
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_cancelled_caller_does_not_stop_the_worker(self):
+        backend = BlockingBackend()
+        batcher = MicroBatcher(backend, max_batch_size=4, max_wait_ms=50, timeout=0.05)
+
+        async def classify():
+            return await batcher.aclassify('text')
+
+        # The first text times out while its batch is being collected, then the batch completes
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(classify())
+        backend.release.set()
+
+        batcher.timeout = 5
+        self.assertEqual(batcher.classify('other text'), [{"label": "ok", "score": 1.0}])
+        self.assertEqual(asyncio.run(classify()), [{"label": "ok", "score": 1.0}])
+        self.assertTrue(batcher._worker.is_alive())
+
+    def test_dead_worker_is_restarted(self):
+        backend = BlockingBackend()
+        backend.release.set()
+        batcher = MicroBatcher(backend, max_batch_size=4, max_wait_ms=1)
+        batcher._worker = threading.Thread(target=lambda: None)
+        batcher._worker.start()
+        batcher._worker.join()
+
+        self.assertEqual(batcher.classify('text'), [{"label": "ok", "score": 1.0}])
+
+
+def raw_cursor(values) -> str:
+    """A cursor with arbitrary (e.g. tampered) values."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+class CursorTests(SimpleTestCase):
+    def setUp(self):
+        self.fields = [Questions._meta.get_field('created_at'), Questions._meta.get_field('question_id')]
+
+    def test_round_trip(self):
+        created_at = timezone.now()
+        question_id = uuid.uuid4()
+        cursor = encode_cursor([created_at, question_id])
+
+        # Microseconds are kept, so the next page starts exactly after the row
+        self.assertEqual(decode_cursor(cursor, self.fields), [created_at, question_id])
+        self.assertEqual(decode_cursor(encode_cursor([12, question_id]), [Questions._meta.get_field('view_count'), self.fields[1]]), [12, question_id])
+
+    def test_tampered_cursors(self):
+        cursors = [
+            'not base64!',
+            raw_cursor({'created_at': 1}),
+            raw_cursor([timezone.now().isoformat()]),
+            raw_cursor([timezone.now().isoformat(), 'not-a-uuid']),
+            raw_cursor(['yesterday', str(uuid.uuid4())]),
+            raw_cursor([None, str(uuid.uuid4())]),
+            raw_cursor([[1], str(uuid.uuid4())]),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                decode_cursor(cursor, self.fields)
+
+    def test_keyset_filter(self):
+        condition = keyset_filter(['created_at', 'question_id'], [1, 2])
+        self.assertEqual(condition, Q(created_at__lt=1) | Q(created_at=1, question_id__lt=2))
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        asker = create_user('asker')
+        self.questions = [
+            Questions.objects.create(asker=asker, title=f'title {i}', description='description') for i in range(5)
+        ]
+
+    def test_pages_cover_every_row_once(self):
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = paginate_by_cursor(Questions.objects.all(), ['created_at', 'question_id'], cursor, 2)
+            seen += [question.pk for question in page]
+            if cursor is None:
+                break
+        self.assertCountEqual(seen, [question.pk for question in self.questions])
+
+    def test_invalid_parameters_are_rejected(self):
+        for query in [
+            'pagination=cursor&page_size=0',
+            'pagination=cursor&page_size=-1',
+            'pagination=cursor&page_size=ten',
+            f'pagination=cursor&cursor={raw_cursor(["2024-01-01T00:00:00+00:00", "not-a-uuid"])}',
+            f'pagination=cursor&sort_by=Trending&cursor={raw_cursor(["many", str(uuid.uuid4())])}',
+        ]:
+            with self.subTest(query=query):
+                response = self.client.get(f'/questions/getAll/?{query}')
+                self.assertEqual(response.status_code, 400)
+
+
+class LocalBackendTests(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        backend = LocalBackend('test', ttl=60, max_entries=2)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        self.assertEqual(backend.get('a'), 1)  # b is now the least recently used
+
+        backend.set('c', 3)
+        self.assertIs(backend.get('b'), MISS)
+        self.assertEqual((backend.get('a'), backend.get('c'), len(backend)), (1, 3, 2))
+
+        # Setting an existing key doesn't evict anything
+        backend.set('a', 4)
+        self.assertEqual((backend.get('a'), backend.get('c')), (4, 3))
+
+    def test_entries_expire_after_ttl(self):
+        backend = LocalBackend('test', ttl=10, max_entries=10)
+        with mock.patch('services.result_cache.time.monotonic', return_value=100.0) as monotonic:
+            backend.set('a', None)  # a cached None is a hit, not a miss
+            monotonic.return_value = 110.0
+            self.assertIsNone(backend.get('a'))
+
+            monotonic.return_value = 110.5
+            self.assertIs(backend.get('a'), MISS)
+            self.assertEqual(len(backend), 0)
+
+
+class StatsServiceTests(SimpleTestCase):
+    @override_settings(STATS_LOG_INTERVAL=0.01)
+    def test_reporter_logs_periodically(self):
+        with mock.patch.object(StatsService, '_reporter', None), \
+                mock.patch.object(StatsService, 'collect', return_value={"result_caches": []}), \
+                self.assertLogs('services.stats_service', 'INFO') as logs:
+            StatsService.start()
+            reporter = StatsService._reporter
+            StatsService.start()  # already started
+            self.assertIs(StatsService._reporter, reporter)
+            for _ in range(100):
+                if logs.output:
+                    break
+                threading.Event().wait(0.01)
+
+        self.assertIn('Service stats: {"result_caches": []}', logs.output[0])
+
+
+class CodeReviewWindowTests(SimpleTestCase):
+    def test_file_shorter_than_a_window_is_one_window(self):
+        lines = ["a", "b", "c"]
+        self.assertEqual(split_into_windows(lines, window_size=4, overlap=1), [(1, lines)])
+        self.assertEqual(split_into_windows(lines, window_size=3, overlap=1), [(1, lines)])
+        self.assertEqual(split_into_windows([], window_size=3, overlap=1), [(1, [])])
+
+    def test_windows_overlap_and_cover_the_file(self):
+        lines = [str(number) for number in range(1, 11)]
+        self.assertEqual(split_into_windows(lines, window_size=4, overlap=1), [
+            (1, ["1", "2", "3", "4"]),
+            (4, ["4", "5", "6", "7"]),
+            (7, ["7", "8", "9", "10"]),
+        ])
+
+        # The last window is shorter when the file doesn't end on a window boundary
+        lines.append("11")
+        windows = split_into_windows(lines, window_size=4, overlap=1)
+        self.assertEqual([first_line for first_line, _ in windows], [1, 4, 7, 10])
+        self.assertEqual(windows[-1], (10, ["10", "11"]))
+
+    def test_overlap_not_smaller_than_window_moves_by_one_line(self):
+        windows = split_into_windows(["1", "2", "3", "4"], window_size=2, overlap=2)
+        self.assertEqual(windows, [(1, ["1", "2"]), (2, ["2", "3"]), (3, ["3", "4"])])
+
+    def test_new_window_suggestions_drops_duplicates_and_other_lines(self):
+        suggested_lines = {4}  # suggested on by the previous window (lines 1-4)
+        suggestions = [
+            {"line_number": 4, "suggestion": "already suggested in the overlap"},
+            {"line_number": 5, "suggestion": "kept"},
+            {"line_number": 5, "suggestion": "same line"},
+            {"line_number": "6", "suggestion": "kept, numeric string"},
+            {"line_number": 8, "suggestion": "outside of the window"},
+            {"line_number": "x", "suggestion": "not a line"},
+            {"suggestion": "no line"},
+        ]
+
+        kept = list(new_window_suggestions(suggestions, 4, 7, suggested_lines))
+        self.assertEqual([suggestion["suggestion"] for suggestion in kept], ["kept", "kept, numeric string"])
+        self.assertEqual(suggested_lines, {4, 5, 6})
+
+        # The next window (lines 7-10) still gets line 8
+        kept = list(new_window_suggestions([{"line_number": 6}, {"line_number": 8}], 7, 10, suggested_lines))
+        self.assertEqual(kept, [{"line_number": 8}])
+
+
+class SuggestionStreamParserTests(SimpleTestCase):
+    RESPONSE = json.dumps({"suggestions": [
+        {"line_number": 1, "suggestion": 'Use "{" and "}" in strings', "code": "x = [1, {2: 3}]"},
+        {"line_number": 2, "suggestion": 'Escape \\ and \" quotes', "code": "print('\\\"')"},
+    ]})
+
+    def feed_all(self, parser, chunks):
+        return [suggestion for chunk in chunks for suggestion in parser.feed(chunk)]
+
+    def test_suggestions_split_across_chunks(self):
+        expected = json.loads(self.RESPONSE)["suggestions"]
+        # Every chunk size splits objects, strings and escape sequences somewhere
+        for size in (1, 2, 3, 7, len(self.RESPONSE)):
+            with self.subTest(size=size):
+                parser = SuggestionStreamParser()
+                chunks = [self.RESPONSE[i:i + size] for i in range(0, len(self.RESPONSE), size)]
+                self.assertEqual(self.feed_all(parser, chunks), expected)
+                self.assertEqual(parser.errors, [])
+
+    def test_suggestion_returned_when_its_closing_brace_arrives(self):
+        parser = SuggestionStreamParser()
+        self.assertEqual(parser.feed('{"suggestions": [{"line_number": 1, "suggestion": "a \\'), [])
+        self.assertEqual(parser.feed('"}"'), [])  # an escaped quote, the brace is still in the string
+        self.assertEqual(parser.feed('}, {"line'), [{"line_number": 1, "suggestion": 'a "}'}])
+        self.assertEqual(parser.feed('_number": 2}]}'), [{"line_number": 2}])
+
+    def test_stream_ending_inside_a_suggestion(self):
+        parser = SuggestionStreamParser()
+        suggestions = self.feed_all(parser, ['{"suggestions": [{"line_number": 1}, ', '{"line_number": 2, "sugg'])
+        self.assertEqual(suggestions, [{"line_number": 1}])
+        self.assertEqual(parser.errors, [])
+
+    def test_invalid_suggestion_is_skipped(self):
+        parser = SuggestionStreamParser()
+        suggestions = parser.feed('{"suggestions": [{"line_number": 1,}, {"line_number": 2}]}')
+        self.assertEqual(suggestions, [{"line_number": 2}])
+        self.assertEqual(len(parser.errors), 1)
+        self.assertIsInstance(parser.errors[0], json.JSONDecodeError)
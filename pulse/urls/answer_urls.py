@@ -12,4 +12,5 @@ urlpatterns = [
     # GET Requests
     path('getAnswersByQuestionId/<str:question_id>/', answer_views.getAnswersByQuestionId, name='getAnswersByQuestionId'),
     path('getAnswersByQuestionIdWithUser/<str:question_id>/<str:user_id>/', answer_views.getAnswersByQuestionIdWithUser, name='getAnswersByQuestionIdWithUser'),
+    path('streamAiAnswer/<str:question_id>/', answer_views.streamAiAnswer, name='streamAiAnswer'),
 ]
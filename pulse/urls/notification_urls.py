@@ -4,8 +4,13 @@ from ..views import notification_views
 urlpatterns = [
     path('getByUserId/<str:user_id>/', notification_views.getNotificationsByUserId, name='getNotificationsByUserId'),
     path('getUnreadCountByUserId/<str:user_id>/', notification_views.getUnreadNotificationsCountByUserId, name='getUnreadNotificationsCountByUserId'),
+    path('stream/<str:user_id>/', notification_views.streamNotifications, name='streamNotifications'),
 
     path('markAsRead/<str:user_id>/<str:notification_id>', notification_views.markAsRead, name='markAsReadByUserId'),
     path('markAsUnread/<str:user_id>/<str:notification_id>', notification_views.markAsUnread, name='markAsUnreadByUserId'),
     path('delete/<str:user_id>/<str:notification_id>', notification_views.deleteNotification, name='deleteNotification'),
+
+    path('markAllAsRead/<str:user_id>', notification_views.markAllAsRead, name='markAllAsReadByUserId'),
+    path('markManyAsUnread/<str:user_id>', notification_views.markManyAsUnread, name='markManyAsUnreadByUserId'),
+    path('deleteMany/<str:user_id>', notification_views.deleteManyNotifications, name='deleteManyNotifications'),
 ]
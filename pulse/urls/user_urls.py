@@ -12,6 +12,7 @@ urlpatterns = [
     path('getById/<str:user_id>/', user_views.getUserById, name='getUserById'),
     path('getByUsername/<str:username>/', user_views.getUserByUsername, name='getUserByUsername'),
     path('getUserRoleById/<str:user_id>/', user_views.getUserRoleById, name='getUserRoleById'),
+    path('getTagReputationById/<str:user_id>/', user_views.getTagReputationById, name='getTagReputationById'),
     path('userExists/<str:user_id>/', user_views.userExists, name='getUserById'),
     
     # PUT Requests
@@ -1,9 +1,12 @@
 from rest_framework.decorators import api_view
 from django.http import JsonResponse, HttpRequest
-from ..models import Badge, UserBadge, UserBadgeProgress, Answers
+from ..models import Badge, UserBadge, UserBadgeProgress
 from ..serializers import BadgeSerializer, UserBadgeSerializer, UserBadgeProgressSerializer
 from rest_framework import status
-from django.db import connection
+from services.badge_service import BadgeService
+import logging
+
+logger = logging.getLogger(__name__)
 
 @api_view(["GET"])
 def getAllBadges(request: HttpRequest) -> JsonResponse:
@@ -55,91 +58,19 @@ def getUserBadgeProgress(request: HttpRequest, user_id: str) -> JsonResponse:
     serializer = UserBadgeProgressSerializer(progress, many=True)
     return JsonResponse(serializer.data, safe=False, status=status.HTTP_200_OK)
 
-def updateProgressAndAwardBadges(user):
+def updateProgressAndAwardBadges(user, tag_ids=None, include_global=True):
     """
     Updates the progress for badges and ensures progress aligns with reputation and tier thresholds.
+
+    Only the badges of the given tags (all tag badges if tag_ids is None) and, if include_global,
+    the global badges are evaluated, see BadgeService.
     """
     try:
-        from django.db.models import Sum
-        from django.utils import timezone
-        import logging
-
-        logger = logging.getLogger(__name__)
-
-        # Fetch all badges with related tiers and associated tags
-        badges = Badge.objects.all().prefetch_related('tiers', 'associated_tag')
-
-        for badge in badges:
-            # Determine user's relevant reputation
-            if badge.is_global:
-                reputation = user.reputation
-            else:
-                if badge.associated_tag:
-                    tag_reputation = (
-                        Answers.objects.filter(
-                            expert=user,
-                            question__tags=badge.associated_tag
-                        )
-                        .aggregate(total_score=Sum("score"))
-                        .get("total_score") or 0
-                    )
-                    reputation = tag_reputation
-                else:
-                    logger.warning(f"Badge '{badge.name}' has no associated tag and is not global.")
-                    continue
-
-            # Fetch qualifying tiers
-            qualifying_tiers = badge.tiers.filter(
-                reputation_threshold__lte=reputation
-            ).order_by('-tier_level')
-            highest_tier = qualifying_tiers.first()
-
-            # Fetch the next tier (if any)
-            next_tier = badge.tiers.filter(
-                reputation_threshold__gt=reputation
-            ).order_by('reputation_threshold').first()
-
-            # Award first tier or update existing badge
-            user_badge, created = UserBadge.objects.get_or_create(
-                user=user,
-                badge=badge,
-                defaults={
-                    'badge_tier': highest_tier,
-                    'earned_at': timezone.now(),
-                }
-            )
-            if not created and highest_tier:
-                if not user_badge.badge_tier or highest_tier.tier_level > user_badge.badge_tier.tier_level:
-                    user_badge.badge_tier = highest_tier
-                    user_badge.earned_at = timezone.now()
-                    user_badge.save()
-
-            # Calculate the new progress target
-            new_progress_target = (
-                next_tier.reputation_threshold if next_tier else 
-                (highest_tier.reputation_threshold if highest_tier else 0)
-            )
-
-            # Keep the progress_target if it would decrease
-            progress, progress_created = UserBadgeProgress.objects.get_or_create(
-                user=user,
-                badge=badge,
-                defaults={
-                    'progress_value': reputation,
-                    'progress_target': new_progress_target,
-                }
-            )
-            if not progress_created:
-                progress.progress_value = max(reputation, user_badge.badge_tier.reputation_threshold if user_badge.badge_tier else 0)
-                # Only update progress_target if it increases
-                if new_progress_target > (progress.progress_target or 0):
-                    progress.progress_target = new_progress_target
-                progress.save()
-
-                logger.info(
-                    f"Updated progress for badge '{badge.name}' for user '{user.username}'."
-                )
-
+        BadgeService.evaluate(
+            user.user_id,
+            tag_ids=tag_ids,
+            global_reputation=user.reputation if include_global else None,
+        )
     except Exception as e:
         logger.error(f"Error in updateProgressAndAwardBadges for user {user.username}: {e}")
         raise
@@ -1,17 +1,20 @@
+from asgiref.sync import sync_to_async
 from rest_framework.decorators import api_view
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse, HttpRequest
 from django.views.decorators.http import require_http_methods
 from rest_framework import status
-from services.ai_model_service import check_content
+from services.ai_model_service import acheck_content
+from ..async_utils import async_api_view
 from ..models import Comments
 from ..serializers import CommentSerializer
+from services.moderation_service import ModerationService
 
 
-@api_view(["POST"])
-def createComment(request: HttpRequest) -> JsonResponse:
+@async_api_view(["POST"])
+async def createComment(request: HttpRequest) -> JsonResponse:
     """
-    Create a comment for the given question
+    Create a comment for the given question (async view, see createAnswer)
 
     Args:
         request (HttpRequest): The incoming HTTP request containing the data.
@@ -20,14 +23,18 @@ def createComment(request: HttpRequest) -> JsonResponse:
         JsonResponse: A response with comment's data if successful, or invalidation errors if unsuccessful
     """
     serializer = CommentSerializer(data=request.data)  # Use request.data for DRF (djang-rest-framework) compatibility
-    if serializer.is_valid():
-        # Content moderation
-        response_text = request.data['response']
-        if check_content(response_text):
-            return JsonResponse({"error": "Toxic content detected in your comment."}, status=status.HTTP_200_OK)
-        comment = serializer.save()  # Save the new comment
-        serialized_comment = CommentSerializer(comment)  # Serialize the saved comment
-        return JsonResponse(serialized_comment.data, status=status.HTTP_201_CREATED)  # Return the serialized data
+    if await sync_to_async(serializer.is_valid)():
+        if ModerationService.is_async():
+            # Save the comment right away, it is moderated in the background
+            comment = await sync_to_async(ModerationService.save_pending)(serializer)
+        else:
+            # Content moderation
+            response_text = request.data['response']
+            if await acheck_content(response_text):
+                return JsonResponse({"error": "Toxic content detected in your comment."}, status=status.HTTP_200_OK)
+            comment = await sync_to_async(serializer.save)()  # Save the new comment
+        serialized_comment = await sync_to_async(lambda: CommentSerializer(comment).data)()  # Serialize the saved comment
+        return JsonResponse(serialized_comment, status=status.HTTP_201_CREATED)  # Return the serialized data
 
     return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -44,7 +51,7 @@ def getCommentsByAnswerId(request: HttpRequest, answer_id: str) -> JsonResponse:
         JsonResponse: A response with list of comments
     """
     # Retrieve all comments for the given answer_id
-    comments = Comments.objects.filter(answer=answer_id)
+    comments = Comments.objects.filter(answer=answer_id).exclude(moderation_status='rejected')  # Rejected comments are hidden
     
     # Serialize the list of comments, setting many=True to indicate multiple objects
     serializer = CommentSerializer(comments, many=True)
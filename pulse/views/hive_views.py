@@ -1,8 +1,10 @@
-from rest_framework.decorators import api_view, parser_classes
+from asgiref.sync import sync_to_async
+from rest_framework.decorators import api_view
 from django.shortcuts import get_object_or_404, get_list_or_404
 from django.http import JsonResponse, HttpRequest
 from django.http import JsonResponse
 from rest_framework import status
+from django.db import transaction
 from django.conf import settings
 from ..models import Hives, HiveMembers, Users, UserRoles
 from ..serializers import HiveSerializer, HiveMemberSerializer
@@ -10,10 +12,14 @@ from django.contrib.postgres.search import SearchQuery, SearchRank
 from django.core.paginator import Paginator, EmptyPage
 from django.db.models import Count, Q
 from uuid import UUID
+from math import ceil
 from services.notification_service import NotificationService
 from rest_framework.parsers import MultiPartParser
-from ..supabase_utils import get_supabase_client, create_bucket_if_not_exists
-from services.ai_model_service import check_img_content, check_content
+from ..supabase_utils import acreate_bucket_if_not_exists, forget_bucket
+from ..image_utils import InvalidImage, aupload_variants, main_image_url, process_image
+from ..async_utils import async_api_view
+from ..count_utils import get_count, COUNT_MODES
+from services.ai_model_service import acheck_img_content, acheck_content
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import throttle_classes
@@ -26,12 +32,11 @@ from django.views.decorators.http import require_GET
 
 '''POST Requests'''
 
-@api_view(["POST"])
-@parser_classes([MultiPartParser])  # To handle file uploads
-def createHiveRequest(request: HttpRequest) -> JsonResponse:
+@async_api_view(["POST"], parsers=[MultiPartParser])  # To handle file uploads
+async def createHiveRequest(request: HttpRequest) -> JsonResponse:
     """
     Create a hive request using the HiveSerializer to validate
-    and save the incoming data.
+    and save the incoming data (async view, the worker serves other requests during moderation and the upload).
 
     Args:
         request (HttpRequest): The incoming HTTP request containing the data.
@@ -42,49 +47,50 @@ def createHiveRequest(request: HttpRequest) -> JsonResponse:
     """
     # Deserialize and validate the data
     serializer = HiveSerializer(data=request.data)
-    if not serializer.is_valid():
+    if not await sync_to_async(serializer.is_valid)():
         return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     # Text Content moderation
     title = request.data['title']
     description = request.data['description']
-    if check_content(title + description):
+    if await acheck_content(title + description):
         return JsonResponse({"error": "Toxic content detected in your hive."}, status=status.HTTP_200_OK)
     
-    # Save the valid data as a new Hive instance
-    hive = serializer.save()
-    
-    # Handle the optional image upload
+    # Decode and moderate the optional image before saving, so an invalid or inappropriate upload doesn't leave a
+    # hive behind
     avatar_file = request.FILES.get('avatar')
     if avatar_file:
-        # Image Content moderation
-        image_content = avatar_file.read()
-        if check_img_content(image_content):
+        try:
+            moderation_image, variants = await sync_to_async(process_image, thread_sensitive=False)(avatar_file)
+        except InvalidImage as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Image Content moderation (on the downsampled copy)
+        if await acheck_img_content(moderation_image):
             return JsonResponse({"error": "Innapropriate content detected in your image."}, status=status.HTTP_200_OK)
-        # Get Supabase client
-        supabase = get_supabase_client()
 
+    # Save the valid data as a new Hive instance (with its tags, indexed once on commit)
+    hive = await sync_to_async(transaction.atomic(serializer.save))()
+    
+    # Handle the optional image upload
+    if avatar_file:
         # Create bucket if it does not exist
-        if not create_bucket_if_not_exists('hive-avatars'):
+        if not await acreate_bucket_if_not_exists('hive-avatars'):
             return JsonResponse({'error': 'Could not ensure bucket exists.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # Set the upload path in Supabase Storage
-        upload_path = f"{hive.hive_id}/avatar"
-
-        # Upload the image file to Supabase Storage
-        response = supabase.storage.from_("hive-avatars").upload(
-            path=upload_path,
-            file=image_content,
-            file_options={"content-type": avatar_file.content_type, "upsert": "true"}
-        )
-
-        if response.path:
-            # Store the image URL in the hive's data
-            hive.avatar_url = f"{settings.SUPABASE_URL}/storage/v1/object/public/hive-avatars/{upload_path}"
-            hive.save()
-        else:
+        # Upload the thumbnails to Supabase Storage, at <hive_id>/avatar-<size>.<format>
+        try:
+            urls = await aupload_variants('hive-avatars', f"{hive.hive_id}/avatar", variants)
+        except Exception as e:
+            print(f"Error uploading hive avatar: {e}")
+            forget_bucket('hive-avatars')  # Check the bucket again on the next upload
             return JsonResponse({"error": "Failed to upload hive avatar"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        # Store the image URLs in the hive's data
+        hive.avatar_url = main_image_url(urls)
+        hive.avatar_variants = urls
+        await hive.asave(update_fields=['avatar_url', 'avatar_variants'])
+
     return JsonResponse(
         {"hive_id": hive.hive_id, "title": hive.title},
         status=status.HTTP_201_CREATED
@@ -217,6 +223,9 @@ def removeHiveMember(request: HttpRequest) -> JsonResponse:
 def getAllHives(request: HttpRequest) -> JsonResponse:
     """
     Retrieve hives from the database with pagination, optional tag filtering, and search functionality.
+
+    The total counts are estimated for the unfiltered list and cached for a short time for filtered lists.
+    Pass count=exact (or count=estimate/cached) to choose how they are computed.
     """
     # Get query parameters
     page_number = int(request.GET.get('page', 1))
@@ -254,20 +263,31 @@ def getAllHives(request: HttpRequest) -> JsonResponse:
     # Remove duplicates
     hives = hives.distinct()
 
-    # Pagination
-    paginator = Paginator(hives, page_size)
-    try:
-        page_obj = paginator.page(page_number)
-    except EmptyPage:
-        page_obj = []
+    # Total count: estimated for the unfiltered list, cached per filter signature otherwise (exact only if asked for)
+    is_filtered = bool(search_query or selected_tags)
+    count_mode = request.GET.get('count', 'cached' if is_filtered else 'estimate')
+    if count_mode not in COUNT_MODES:
+        return JsonResponse({'error': 'Invalid count option'}, status=status.HTTP_400_BAD_REQUEST)
+    if page_number < 1 or page_size < 1:
+        return JsonResponse({'error': 'Invalid page or page_size parameter'}, status=status.HTTP_400_BAD_REQUEST)
+
+    total_hives = get_count(hives, count_mode, {
+        'tags': sorted(str(tag_id) for tag_id in selected_tags),
+        'search': search_query,
+    })
+
+    # Pagination (slice directly, since an estimated count can't be used to validate the page number)
+    offset = (page_number - 1) * page_size
+    page = hives[offset:offset + page_size]
 
-    serializer = HiveSerializer(page_obj.object_list, many=True)
+    serializer = HiveSerializer(page, many=True)
     
     response_data = {
         'hives': serializer.data,
-        'totalHives': paginator.count,
-        'totalPages': paginator.num_pages,
+        'totalHives': total_hives,
+        'totalPages': max(1, ceil(total_hives / page_size)),
         'currentPage': page_number,
+        'countType': count_mode,
     }
     return JsonResponse(response_data, status=status.HTTP_200_OK)
 
@@ -1,10 +1,23 @@
+import asyncio
+from asgiref.sync import sync_to_async
 from rest_framework.decorators import api_view
+from django.conf import settings
 from django.http import JsonResponse, HttpRequest
 from ..models import Notifications
 from rest_framework import status
-from ..serializers import NotificationSerializer
+from ..serializers import NotificationSerializer, NotificationSummarySerializer, NOTIFICATION_SUMMARY_FIELDS
+from ..pagination_utils import paginate_by_cursor, InvalidCursor
 from uuid import UUID
 from services.notification_service import NotificationService
+from services.notification_push import get_fanout, Subscription
+from ..async_utils import async_api_view
+from ..streaming_utils import SSE_KEEPALIVE, sse_event, sse_response
+
+# Largest page of the paginated inbox
+MAX_INBOX_PAGE_SIZE = 100
+
+# Most notification IDs accepted by one bulk request
+MAX_BULK_IDS = 1000
 
 
 @api_view(["GET"])
@@ -13,6 +26,10 @@ def getNotificationsByUserId(request: HttpRequest, user_id: int) -> JsonResponse
     Retrieve all Notifications associated with a specific user_id
     from the database and serialize them to JSON format.
 
+    Pass pagination=cursor to get the inbox one page at a time (page_size, at most MAX_INBOX_PAGE_SIZE) instead:
+    the response then contains the notifications as compact summaries (ids, titles, actor username/avatar),
+    and nextCursor (send it back as ?cursor=... to get the next page).
+
     Args:
         request (HttpRequest): The incoming HTTP request.
         user_id (int): The ID of the user whose Notifications are to be retrieved.
@@ -23,6 +40,31 @@ def getNotificationsByUserId(request: HttpRequest, user_id: int) -> JsonResponse
     notifications = Notifications.objects.filter(recipient_id=user_id).order_by(
         "-created_at"
     )  # Retrieve Notifications for the specified user
+
+    # Cursor pagination (opt-in): one query per page, walking the (recipient, -created_at) index
+    if request.GET.get('pagination') == 'cursor':
+        try:
+            page_size = min(int(request.GET.get('page_size', 20)), MAX_INBOX_PAGE_SIZE)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid page size'}, status=status.HTTP_400_BAD_REQUEST)
+        if page_size < 1:
+            return JsonResponse({'error': 'Invalid page size'}, status=status.HTTP_400_BAD_REQUEST)
+
+        notifications = notifications.select_related('question', 'hive', 'actor').only(*NOTIFICATION_SUMMARY_FIELDS)
+        try:
+            page, next_cursor = paginate_by_cursor(
+                notifications, ['created_at', 'notification_id'], request.GET.get('cursor'), page_size
+            )
+        except InvalidCursor:
+            return JsonResponse({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = NotificationSummarySerializer(page, many=True)
+        return JsonResponse({
+            'notifications': serializer.data,
+            'nextCursor': next_cursor,
+            'hasMore': next_cursor is not None,
+        }, status=status.HTTP_200_OK)
+
     serializer = NotificationSerializer(
         notifications, many=True
     )  # Serialize the queryset to JSON
@@ -41,10 +83,38 @@ def getUnreadNotificationsCountByUserId(request: HttpRequest, user_id: int) -> J
     Returns:
         JsonResponse: A response containing the number of Notifications for a user.
     """
-    count = Notifications.objects.filter(recipient_id=user_id, read=False).count()
+    count = NotificationService.get_unread_count(user_id)  # maintained counter, no COUNT(*) over the notifications
     return JsonResponse({"count": count}, safe=False, status=status.HTTP_200_OK)
 
 
+@async_api_view(["GET"])
+async def streamNotifications(request: HttpRequest, user_id: str) -> JsonResponse:
+    """
+    Push a user's notifications as server-sent events, instead of polling the count and list endpoints (async view,
+    an open stream doesn't hold a worker).
+
+    Events:
+        - unread_count: {"count": ...}, when the stream opens and whenever the count changes
+        - notification: a new notification, in the format of the paginated inbox (see NotificationSummarySerializer)
+
+    Args:
+        request (HttpRequest): The incoming HTTP request.
+        user_id (str): The ID of the user whose notifications are streamed.
+
+    Returns:
+        StreamingHttpResponse: The text/event-stream response, open until the client disconnects.
+    """
+    try:
+        user_id = UUID(user_id) # TODO: we should really add middleware at some point and use a JWT to get access to the current user in the BACKEND
+    except ValueError:
+        return JsonResponse(
+            {"error": "Invalid user ID format"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return sse_response(notification_events(user_id))
+
+
 @api_view(["PATCH"])
 def markAsRead(request: HttpRequest, user_id: str, notification_id: str) -> JsonResponse:
     """
@@ -149,4 +219,130 @@ def deleteNotification(request: HttpRequest, user_id: str, notification_id: str)
         return JsonResponse(
             {"error": "Notification not found or unauthorized"}, 
             status=status.HTTP_404_NOT_FOUND
-        )
\ No newline at end of file
+        )
+
+
+
+@api_view(["PATCH"])
+def markAllAsRead(request: HttpRequest, user_id: str) -> JsonResponse:
+    """
+    Mark all of a user's notifications as read, or only the ones listed in the body, in a single query.
+
+    Args:
+        request (HttpRequest): The incoming HTTP request, optionally with {"notification_ids": [...]}
+        user_id (str): The ID of the recipient
+
+    Returns:
+        JsonResponse: The number of notifications that were marked as read
+    """
+    try:
+        user_id = UUID(user_id) # TODO: we should really add middleware at some point and use a JWT to get access to the current user in the BACKEND
+        notification_ids = parse_notification_ids(request, required=False)
+    except (ValueError, TypeError):
+        return JsonResponse(
+            {"error": f"Invalid notification/user ID format (at most {MAX_BULK_IDS} notification IDs)"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    updated = NotificationService.mark_many_as_read(user_id, notification_ids)
+    return JsonResponse(
+        {"message": "Notifications marked as read", "updated": updated},
+        status=status.HTTP_200_OK
+    )
+
+
+@api_view(["PATCH"])
+def markManyAsUnread(request: HttpRequest, user_id: str) -> JsonResponse:
+    """
+    Mark the notifications listed in the body as unread, in a single query.
+
+    Args:
+        request (HttpRequest): The incoming HTTP request, with {"notification_ids": [...]}
+        user_id (str): The ID of the recipient
+
+    Returns:
+        JsonResponse: The number of notifications that were marked as unread
+    """
+    try:
+        user_id = UUID(user_id) # TODO: we should really add middleware at some point and use a JWT to get access to the current user in the BACKEND
+        notification_ids = parse_notification_ids(request, required=True)
+    except (ValueError, TypeError):
+        return JsonResponse(
+            {"error": f"Invalid notification/user ID format (1 to {MAX_BULK_IDS} notification IDs)"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    updated = NotificationService.mark_many_as_unread(user_id, notification_ids)
+    return JsonResponse(
+        {"message": "Notifications marked as unread", "updated": updated},
+        status=status.HTTP_200_OK
+    )
+
+
+@api_view(["DELETE"])
+def deleteManyNotifications(request: HttpRequest, user_id: str) -> JsonResponse:
+    """
+    Delete the notifications listed in the body, or all of the user's notifications with {"all": true},
+    in a single query.
+
+    Args:
+        request (HttpRequest): The incoming HTTP request, with {"notification_ids": [...]} or {"all": true}
+        user_id (str): The ID of the recipient
+
+    Returns:
+        JsonResponse: The number of notifications deleted
+    """
+    delete_all = request.data.get('all') is True
+    try:
+        user_id = UUID(user_id) # TODO: we should really add middleware at some point and use a JWT to get access to the current user in the BACKEND
+        notification_ids = None if delete_all else parse_notification_ids(request, required=True)
+    except (ValueError, TypeError):
+        return JsonResponse(
+            {"error": f"Invalid notification/user ID format (1 to {MAX_BULK_IDS} notification IDs, or all: true)"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    deleted = NotificationService.delete_many(user_id, notification_ids)
+    return JsonResponse(
+        {"message": "Notifications deleted successfully", "deleted": deleted},
+        status=status.HTTP_200_OK
+    )
+
+
+'''----- HELPER FUNCTIONS -----'''
+
+def parse_notification_ids(request, required: bool) -> list | None:
+    """
+    Get the notification IDs of a bulk request body (None if absent and not required).
+
+    Raises:
+        ValueError: If the IDs are missing (when required), not a list of UUIDs, or more than MAX_BULK_IDS
+    """
+    notification_ids = request.data.get('notification_ids')
+    if notification_ids is None and not required:
+        return None
+    if not isinstance(notification_ids, list) or not notification_ids or len(notification_ids) > MAX_BULK_IDS:
+        raise ValueError("Invalid notification IDs")
+    return [UUID(str(notification_id)) for notification_id in notification_ids]
+
+async def notification_events(user_id: UUID):
+    """Generate the server-sent events of a user's notification stream."""
+    fanout = get_fanout()
+    keepalive = settings.NOTIFICATION_PUSH.get('KEEPALIVE_SECONDS', 15)
+    # Subscribe before reading the count, so no change is missed in between
+    subscription = fanout.subscribe(user_id)
+    try:
+        count = await sync_to_async(NotificationService.get_unread_count)(user_id)
+        yield sse_event("unread_count", {"count": count})
+        while True:
+            try:
+                message = await subscription.get(keepalive)
+            except asyncio.TimeoutError:
+                yield SSE_KEEPALIVE
+                continue
+            if message is Subscription.CLOSE:
+                return
+            event, data = message
+            yield sse_event(event, data)
+    finally:
+        fanout.unsubscribe(subscription)
@@ -4,7 +4,9 @@ from django.http import JsonResponse, HttpRequest
 from rest_framework import status
 from ..models import Projects
 from ..serializers import ProjectSerializer
-from services.ai_model_service import generate_code_review
+from services.ai_model_service import agenerate_code_review, astream_code_review
+from ..async_utils import async_api_view
+from ..streaming_utils import sse_event, sse_response
 
 @api_view(["POST"])
 def createProject(request: HttpRequest) -> JsonResponse:
@@ -27,10 +29,11 @@ def createProject(request: HttpRequest) -> JsonResponse:
         )
     return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(["POST"])
-def codeReview(request: HttpRequest) -> JsonResponse:
+@async_api_view(["POST"])
+async def codeReview(request: HttpRequest) -> JsonResponse:
     """
     Perform a code review on the provided code file and return suggestions.
+    Async view: under ASGI the worker serves other requests while the model generates the review.
 
     Args:
         request (HttpRequest): The incoming HTTP request containing the code details.
@@ -41,6 +44,11 @@ def codeReview(request: HttpRequest) -> JsonResponse:
         - file_name (str): Name of the file to review.
         - file_content (str): Content of the file to review.
 
+    Query Parameters:
+        - stream (str): 'sse' to stream the review as server-sent events while it is generated: 'token' events
+          with each chunk of the model's response, a 'suggestion' event for each suggestion as soon as it is
+          complete, then 'done' with all the suggestions (or 'error').
+
     Returns:
         JsonResponse: Suggestions for code improvements or an error message.
     """
@@ -58,8 +66,11 @@ def codeReview(request: HttpRequest) -> JsonResponse:
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        if request.query_params.get('stream') == 'sse':
+            return sse_response(code_review_events(project_title, project_description, file_name, file_content))
+
         # Call the AI model for code review
-        suggestions = generate_code_review(project_title, project_description, file_name, file_content)
+        suggestions = await agenerate_code_review(project_title, project_description, file_name, file_content)
 
         # Return suggestions
         if suggestions:
@@ -126,4 +137,21 @@ def getProjectById(request: HttpRequest, project_id: str) -> JsonResponse:
     """
     project = get_object_or_404(Projects, project_id=project_id)
     serializer = ProjectSerializer(project)
-    return JsonResponse(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+    return JsonResponse(serializer.data, status=status.HTTP_200_OK)
+
+
+'''----- HELPER FUNCTIONS -----'''
+
+async def code_review_events(project_title, project_description, file_name, file_content):
+    """Generate the server-sent events of a streamed code review."""
+    suggestions = []
+    try:
+        async for event, value in astream_code_review(project_title, project_description, file_name, file_content):
+            if event == "token":
+                yield sse_event("token", {"text": value})
+            else:
+                suggestions.append(value)
+                yield sse_event("suggestion", value)
+        yield sse_event("done", {"suggestions": suggestions})
+    except Exception as e:
+        yield sse_event("error", {"error": str(e)})
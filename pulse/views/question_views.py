@@ -1,28 +1,34 @@
+from asgiref.sync import sync_to_async
 from rest_framework.decorators import api_view
-from django.shortcuts import get_object_or_404
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from django.http import JsonResponse, HttpRequest
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.views.decorators.http import require_GET
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
-from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
 from rest_framework import status
-from services.ai_model_service import check_content
+from django.db import transaction
+from services.ai_model_service import acheck_content
+from services.view_counter_service import ViewCounterService
 from pulse.models import Questions
 from ..serializers import QuestionSerializer
+from ..async_utils import async_api_view
+from ..pagination_utils import paginate_by_cursor, InvalidCursor
+from ..count_utils import get_count, COUNT_MODES
 from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
 from rest_framework.decorators import throttle_classes
 from django.core.paginator import Paginator, EmptyPage
-from django.db.models import Count, Q, F
-from django.db.models.functions import Greatest
-from django.contrib.postgres.aggregates import StringAgg
+from django.db.models import Count, Q, F, FloatField
+from django.db.models.functions import Cast, Greatest
 from uuid import UUID
+from math import ceil
 
-@api_view(["POST"])
-def createQuestion(request: HttpRequest) -> JsonResponse:
+@async_api_view(["POST"])
+async def createQuestion(request: HttpRequest) -> JsonResponse:
     """
     Create a question using the QuestionSerializer to validate
-    and save the incoming data.
+    and save the incoming data (async view, the worker serves other requests during content moderation).
 
     Args:
         request (HttpRequest): The incoming HTTP request containing the data.
@@ -34,13 +40,14 @@ def createQuestion(request: HttpRequest) -> JsonResponse:
     serializer = QuestionSerializer(
         data=request.data
     )  # Deserialize and validate the data
-    if serializer.is_valid():
+    if await sync_to_async(serializer.is_valid)():
         # Content moderation
         title_text = request.data['title']
         description_text = request.data['description']
-        if check_content(title_text + description_text):
+        if await acheck_content(title_text + description_text):
             return JsonResponse({"error": "Toxic content detected in your question."}, status=status.HTTP_200_OK)
-        question = serializer.save()  # Save the valid data as a new Question instance
+        # Save the valid data as a new Question instance (with its tags, indexed once on commit)
+        question = await sync_to_async(transaction.atomic(serializer.save))()
         return JsonResponse(
             {"question_id": question.question_id}, status=status.HTTP_201_CREATED
         )
@@ -52,10 +59,21 @@ def getAllQuestions(request: HttpRequest) -> JsonResponse:
     """
     Retrieve questions from the database with pagination, optional tag filtering, and search functionality.
     Supports sorting by views, recency, or unanswered questions first.
+
+    Pass pagination=cursor to use cursor pagination instead of page numbers: the response then contains
+    nextCursor (send it back as ?cursor=... to get the next page) instead of the total counts.
+
+    The total counts are estimated for the unfiltered feed and cached for a short time for filtered feeds.
+    Pass count=exact (or count=estimate/cached) to choose how they are computed.
     """
     # Get query parameters
-    page_number = int(request.GET.get('page', 1))
-    page_size = int(request.GET.get('page_size', 20))
+    try:
+        page_number = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', 20))
+        if page_number < 1 or page_size < 1:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'Invalid page or page_size parameter'}, status=status.HTTP_400_BAD_REQUEST)
     selected_tags = request.GET.getlist('tags')  # Expecting UUIDs like ?tags=uuid1&tags=uuid2
     search_query = request.GET.get('search', '').strip()
     related_hive_id = request.GET.get('related_hive_id', None)  # Optional hive filter
@@ -108,19 +126,45 @@ def getAllQuestions(request: HttpRequest) -> JsonResponse:
     # Remove duplicates
     questions = questions.distinct()
 
-    # Pagination
-    paginator = Paginator(questions, page_size)
-    try:
-        page_obj = paginator.page(page_number)
-    except EmptyPage:
-        page_obj = []
-
-    serializer = QuestionSerializer(page_obj.object_list, many=True)
+    # Cursor pagination (opt-in): skips the count and the OFFSET scan, so deep pages are as fast as the first one
+    if request.GET.get('pagination') == 'cursor':
+        cursor_fields = ['view_count', 'question_id'] if sort_by == 'Trending' else ['created_at', 'question_id']
+        try:
+            page, next_cursor = paginate_by_cursor(questions, cursor_fields, request.GET.get('cursor'), page_size)
+        except InvalidCursor:
+            return JsonResponse({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = QuestionSerializer(page, many=True)
+        return JsonResponse({
+            'questions': serializer.data,
+            'nextCursor': next_cursor,
+            'hasMore': next_cursor is not None,
+        }, status=status.HTTP_200_OK)
+
+    # Total count: estimated for the unfiltered feed, cached per filter signature otherwise (exact only if asked for)
+    is_filtered = bool(related_hive_id or search_query or selected_tags or sort_by == 'unanswered')
+    count_mode = request.GET.get('count', 'cached' if is_filtered else 'estimate')
+    if count_mode not in COUNT_MODES:
+        return JsonResponse({'error': 'Invalid count option'}, status=status.HTTP_400_BAD_REQUEST)
+
+    total_questions = get_count(questions, count_mode, {
+        'related_hive_id': related_hive_id,
+        'tags': sorted(str(tag_id) for tag_id in selected_tags),
+        'search': search_query,
+        'unanswered': sort_by == 'unanswered',
+    })
+
+    # Pagination (slice directly, since an estimated count can't be used to validate the page number)
+    offset = (page_number - 1) * page_size
+    page = questions[offset:offset + page_size]
+
+    serializer = QuestionSerializer(page, many=True)
     response_data = {
         'questions': serializer.data,
-        'totalQuestions': paginator.count,
-        'totalPages': paginator.num_pages,
+        'totalQuestions': total_questions,
+        'totalPages': max(1, ceil(total_questions / page_size)),
         'currentPage': page_number,
+        'countType': count_mode,
     }
     return JsonResponse(response_data, status=status.HTTP_200_OK)
 
@@ -165,11 +209,8 @@ def getQuestionById(request: HttpRequest, question_id: str) -> JsonResponse:
     # Get the question or return 404
     question = get_object_or_404(Questions, question_id=question_id)
 
-    # increase view count
-    Questions.objects.filter(question_id=question_id).update(view_count=F('view_count') + 1)
-
-    # refresh the question instance to reflect the updated view count
-    question.refresh_from_db()
+    # increase view count (buffered and written in batches, the serializer adds the pending views)
+    ViewCounterService.record_view(question.question_id)
 
     # Serialize the single instance to JSON
     serializer = QuestionSerializer(question)
@@ -189,6 +230,10 @@ class BurstAnonRateThrottle(AnonRateThrottle):
 @csrf_exempt 
 @throttle_classes([BurstUserRateThrottle, BurstAnonRateThrottle])
 def searchQuestions(request):
+    """
+    Search questions by text and/or tags, sorted by relevance.
+    Pass pagination=cursor (and then ?cursor=nextCursor) to use cursor pagination instead of page numbers.
+    """
     # Get query parameters
     query = request.GET.get('q', '').strip()
     tags = request.GET.getlist('tags')  # Expecting tag IDs as strings
@@ -208,28 +253,24 @@ def searchQuestions(request):
 
     # Handle search query
     if query:
-        # Define the search vector with weights
-        search_vector = (
-            SearchVector('title', weight='A') +
-            SearchVector('description', weight='B') +
-            SearchVector('tags__name', weight='C')
-        )
         search_query = SearchQuery(query, search_type="websearch")
         
-        # Annotate with full-text search rank and trigram similarities
+        # Annotate with full-text search rank and trigram similarities, using the precomputed
+        # weighted search_vector (title A, description B, tags C) and tag_names columns
+        # (rank/total_similarity are cast to double precision so cursor values round-trip exactly)
         questions = questions.annotate(
-            rank=SearchRank(search_vector, search_query),
+            rank=Cast(SearchRank(F('search_vector'), search_query), FloatField()),
             similarity_title=TrigramSimilarity('title', query),
             similarity_description=TrigramSimilarity('description', query),
+            similarity_tags=TrigramSimilarity('tag_names', query),
         ).annotate(
-            tag_names=StringAgg('tags__name', delimiter=' ', distinct=True)
-        ).annotate(
-            similarity_tags=TrigramSimilarity('tag_names', query)
-        ).annotate(
-            total_similarity=Greatest(
-                F('similarity_title'),
-                F('similarity_description'),
-                F('similarity_tags')
+            total_similarity=Cast(
+                Greatest(
+                    F('similarity_title'),
+                    F('similarity_description'),
+                    F('similarity_tags')
+                ),
+                FloatField()
             )
         )
 
@@ -252,8 +293,14 @@ def searchQuestions(request):
         
         combined_filters &= tag_filters
 
-    # Apply the combined AND filters
-    questions = questions.filter(combined_filters).distinct().order_by('-rank', '-total_similarity', '-created_at')
+    # Sort by relevance when searching by text, otherwise by recency (question_id breaks ties)
+    ordering_fields = ['rank', 'total_similarity', 'created_at', 'question_id'] if query else ['created_at', 'question_id']
+
+    # Apply the combined AND filters (the tag filters join the tags, so remove duplicates)
+    questions = questions.filter(combined_filters)
+    if tags:
+        questions = questions.distinct()
+    questions = questions.order_by(*[f'-{field}' for field in ordering_fields])
 
     # Implement Pagination
     try:
@@ -264,6 +311,20 @@ def searchQuestions(request):
     except ValueError:
         return JsonResponse({'error': 'Invalid page or page_size parameter'}, status=status.HTTP_400_BAD_REQUEST)
 
+    # Cursor pagination (opt-in): skips the count and the OFFSET scan, so deep pages are as fast as the first one
+    if request.GET.get('pagination') == 'cursor':
+        try:
+            page, next_cursor = paginate_by_cursor(questions, ordering_fields, request.GET.get('cursor'), page_size)
+        except InvalidCursor:
+            return JsonResponse({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = QuestionSerializer(page, many=True)
+        return JsonResponse({
+            'questions': serializer.data,
+            'nextCursor': next_cursor,
+            'hasMore': next_cursor is not None,
+        }, status=status.HTTP_200_OK)
+
     paginator = Paginator(questions, page_size)
     try:
         paginated_questions = paginator.page(page_number)
@@ -307,10 +368,10 @@ def changeMark(request: HttpRequest, question_id: str) -> JsonResponse:
     # Return validation errors if any
     return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(["PUT"])
-def updateQuestion(request: HttpRequest, question_id: str) -> JsonResponse:
+@async_api_view(["PUT"])
+async def updateQuestion(request: HttpRequest, question_id: str) -> JsonResponse:
     """
-    Update an existing question.
+    Update an existing question (async view, see createQuestion).
 
     Args:
         request (HttpRequest): The incoming HTTP request containing the data.
@@ -321,7 +382,7 @@ def updateQuestion(request: HttpRequest, question_id: str) -> JsonResponse:
         or validation errors if the data is invalid.
     """
     # Fetch the question from the database
-    question = get_object_or_404(Questions, question_id=question_id)
+    question = await aget_object_or_404(Questions, question_id=question_id)
 
     # Check if the asker in the request matches the question's asker
     if request.data.get("asker") != str(question.asker_id):
@@ -333,13 +394,14 @@ def updateQuestion(request: HttpRequest, question_id: str) -> JsonResponse:
     # Check for content moderation (toxic content)
     title_text = request.data.get("title", "")
     description_text = request.data.get("description", "")
-    if check_content(title_text + description_text):
+    if await acheck_content(title_text + description_text):
         return JsonResponse({"error": "Toxic content detected in your question."}, status=status.HTTP_200_OK)
 
     # Update the question using the serializer
     serializer = QuestionSerializer(instance=question, data=request.data, partial=True)
-    if serializer.is_valid():
-        serializer.save()
+    if await sync_to_async(serializer.is_valid)():
+        # Save the question and its tags (indexed once on commit)
+        await sync_to_async(transaction.atomic(serializer.save))()
         return JsonResponse(
             {"question_id": question.question_id}, status=status.HTTP_200_OK
         )
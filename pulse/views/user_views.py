@@ -1,13 +1,16 @@
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from rest_framework.decorators import api_view, parser_classes
+from rest_framework.decorators import api_view
 from rest_framework.parsers import MultiPartParser
-from django.shortcuts import get_object_or_404
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from django.http import JsonResponse, HttpRequest
 from rest_framework import status
-from ..supabase_utils import get_supabase_client, create_bucket_if_not_exists
-from services.ai_model_service import check_img_content
-from ..models import Users, UserRoles
-from ..serializers import UserSerializer, UserRolesSerializer
+from ..supabase_utils import acreate_bucket_if_not_exists, forget_bucket
+from ..image_utils import InvalidImage, aupload_variants, main_image_url, process_image
+from ..async_utils import async_api_view
+from services.ai_model_service import acheck_img_content
+from ..models import Users, UserRoles, UserTagReputation
+from ..serializers import UserSerializer, UserRolesSerializer, UserTagReputationSerializer
 from ..views import badge_views
 
 '''POST Operations'''
@@ -53,7 +56,8 @@ def changeReputationByAmount(request: HttpRequest, user_id: str, amount: str) ->
         amount = int(amount)  # Cast amount to int
         user.reputation += amount  # Change the reputation
         user.save()  # Save the updated user object
-        badge_views.updateProgressAndAwardBadges(user)
+        # Tag badges are updated when the user's answers are voted on, only the global badges depend on this
+        badge_views.updateProgressAndAwardBadges(user, tag_ids=[])
         return JsonResponse(
             {"user_id": user.user_id, "new_reputation": user.reputation},
             status=status.HTTP_200_OK
@@ -114,6 +118,28 @@ def getUserRoleById(request: HttpRequest, user_id: str) -> JsonResponse:
     serializer = UserRolesSerializer(user_role)  # Serialize the single instance to JSON
     return JsonResponse(serializer.data, status=status.HTTP_200_OK)
 
+@api_view(["GET"])
+def getTagReputationById(request: HttpRequest, user_id: str) -> JsonResponse:
+    """
+    Retrieve a user's reputation in each tag they answered questions in, highest first.
+
+    Args:
+        request (HttpRequest): The incoming HTTP request.
+        user_id (str): The ID of the user.
+
+    Returns:
+        JsonResponse: A response containing the user's score and answer count per tag.
+    """
+    get_object_or_404(Users, user_id=user_id)  # Return 404 if the user doesn't exist
+    # Read from the maintained rollup instead of aggregating the user's answers
+    tag_reputations = (
+        UserTagReputation.objects.filter(user_id=user_id, answer_count__gt=0)
+        .select_related('tag')
+        .order_by('-score_sum', '-answer_count')
+    )
+    serializer = UserTagReputationSerializer(tag_reputations, many=True)
+    return JsonResponse(serializer.data, safe=False, status=status.HTTP_200_OK)
+
 @api_view(["GET"])
 def userExists(request: HttpRequest, user_id: str) -> JsonResponse:
     """
@@ -137,11 +163,10 @@ def userExists(request: HttpRequest, user_id: str) -> JsonResponse:
         
 '''PUT Operations'''
 
-@api_view(["PUT"])
-@parser_classes([MultiPartParser])  # To handle file uploads
-def updateProfileImageById(request: HttpRequest, user_id: str) -> JsonResponse:
+@async_api_view(["PUT"], parsers=[MultiPartParser])  # To handle file uploads
+async def updateProfileImageById(request: HttpRequest, user_id: str) -> JsonResponse:
     """
-    Updates the specified user's profile image
+    Updates the specified user's profile image (async view, the worker serves other requests during moderation and the upload)
 
     Args:
         request (HttpRequest): The incoming HTTP request.
@@ -151,41 +176,39 @@ def updateProfileImageById(request: HttpRequest, user_id: str) -> JsonResponse:
         JsonResponse: A response containing serialized data for the requested user.
     """
 
-    # Get supabase client
-    supabase = get_supabase_client()
-
     # Get the user or return 404
-    user = get_object_or_404(Users, user_id=user_id)  
+    user = await aget_object_or_404(Users, user_id=user_id)  
 
     # Get image file from request
     image_file = request.FILES.get('profile_image')
     if not image_file:
         return JsonResponse({"error": "No image provided"}, status=status.HTTP_400_BAD_REQUEST)
-    image_content = image_file.read()
+
+    # Decode the image once, into a downsampled copy for moderation and the thumbnails to store
+    try:
+        moderation_image, variants = await sync_to_async(process_image, thread_sensitive=False)(image_file)
+    except InvalidImage as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     # Image Content moderation
-    if check_img_content(image_content):
+    if await acheck_img_content(moderation_image):
         return JsonResponse({"error": "Innapropriate content detected in your image."}, status=status.HTTP_200_OK)
 
     # Create bucket if it does not exist
-    if not create_bucket_if_not_exists('profile-images'):
+    if not await acreate_bucket_if_not_exists('profile-images'):
         return JsonResponse({'error': 'Could not ensure bucket exists.'}, status=500)
-    
-    # Set the upload path in Supabase Storage
-    upload_path = f"{user_id}/profile-image"
-
-    # Upload the image file to Supabase Storage, replaces current profile pic if it exists
-    response = supabase.storage.from_("profile-images").upload(
-        file=image_content, 
-        path=upload_path, 
-        file_options={"content-type": image_file.content_type, "upsert": "true"},
-        )
 
-    if response.path:
-        # Store the image URL in the user's profile
-        user.profile_image_url = f"{settings.SUPABASE_URL}/storage/v1/object/public/profile-images/{upload_path}"
-        user.save()
-        serializer = UserSerializer(user)
-        return JsonResponse(serializer.data, status=status.HTTP_200_OK)
-    else:
-        return JsonResponse({"error": "Failed to upload image"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+    # Upload the thumbnails to Supabase Storage at <user_id>/profile-image-<size>.<format>, replaces the current ones
+    try:
+        urls = await aupload_variants('profile-images', f"{user_id}/profile-image", variants)
+    except Exception as e:
+        print(f"Error uploading profile image: {e}")
+        forget_bucket('profile-images')  # Check the bucket again on the next upload
+        return JsonResponse({"error": "Failed to upload image"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    # Store the image URLs in the user's profile
+    user.profile_image_url = main_image_url(urls)
+    user.profile_image_variants = urls
+    await user.asave(update_fields=['profile_image_url', 'profile_image_variants'])
+    serializer = UserSerializer(user)
+    return JsonResponse(await sync_to_async(lambda: serializer.data)(), status=status.HTTP_200_OK)
\ No newline at end of file
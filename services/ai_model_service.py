@@ -1,22 +1,259 @@
 from django.conf import settings
-from huggingface_hub import InferenceClient
+from services.inference_client import AsyncManagedInferenceClient, ManagedInferenceClient
+from services.moderation_backends import get_moderation_backend
+from services.result_cache import MISS, content_key, get_result_cache
+import asyncio
 import json
 
 
-# Initialize the InferenceClient with the API key for the Hugging Face Inference API
-client = InferenceClient(api_key=settings.HUGGINGFACE_TOKEN)
+# Initialize the client of the Hugging Face Inference API with the API key (with timeouts, retries, concurrency
+# limits and circuit breakers per model, see services/inference_client.py)
+client = ManagedInferenceClient(api_key=settings.HUGGINGFACE_TOKEN)
 
+# The same for the async views (the a-prefixed functions below)
+async_client = AsyncManagedInferenceClient(api_key=settings.HUGGINGFACE_TOKEN)
 
-def generate_code_review(project_title, project_description, file_name, file_content):
+# Code review model, and the version of the code review prompt (bump it when the prompt changes, cached reviews
+# made with another version are then ignored)
+CODE_REVIEW_MODEL = "meta-llama/Meta-Llama-3-8B-Instruct"
+CODE_REVIEW_PROMPT_VERSION = 1
+
+# Image moderation model (text moderation goes through the MODERATION_BACKEND, see services/moderation_backends.py)
+NSFW_IMAGE_MODEL = "Falconsai/nsfw_image_detection"
+
+
+class SuggestionStreamParser:
+    """
+    Incrementally parses the streamed {"suggestions": [{...}, ...]} JSON of a code review, returning each
+    suggestion object as soon as its closing brace arrives instead of waiting for the whole response.
+    Suggestions that are not valid JSON are skipped, their errors are kept in errors.
+    """
+
+    def __init__(self):
+        self.depth = 0            # current nesting of {} and []
+        self.in_string = False
+        self.escaped = False
+        self.current = None       # characters of the suggestion object being read (None outside of one)
+        self.errors = []          # JSONDecodeErrors of the suggestions that failed to parse
+
+    def feed(self, text: str) -> list:
+        """
+        Parse the next chunk of the response.
+
+        Returns:
+            list: The suggestions completed by this chunk
+        """
+        suggestions = []
+        for char in text:
+            if self.current is not None:
+                self.current.append(char)
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in '{[':
+                self.depth += 1
+                # Objects directly inside the suggestions array ({ -> [ -> {) are suggestions
+                if char == '{' and self.depth == 3:
+                    self.current = [char]
+            elif char in '}]':
+                if char == '}' and self.depth == 3 and self.current is not None:
+                    try:
+                        suggestions.append(json.loads("".join(self.current)))
+                    except json.JSONDecodeError as e:
+                        print("Failed to parse streamed suggestion")
+                        self.errors.append(e)
+                    self.current = None
+                self.depth -= 1
+        return suggestions
+
+
+def split_into_windows(lines, window_size, overlap):
     '''
-    This function sends a message to the AI model requesting code review suggestions for a given project and file content.
-    The AI model is expected to provide at least 5 meaningful and specific suggestions or improvements for the code.
-    The function returns the suggestions as a list of dictionaries, each containing the line number and suggestion, or an error if it occurs.
+    This function splits the lines of a file into windows of window_size lines, each one overlapping the previous one by
+    overlap lines (so an issue spanning a window boundary is seen whole by one of them).
+    It returns a list of (first line number, lines) tuples, with line numbers starting at 1.
+    '''
+    if len(lines) <= window_size:
+        return [(1, lines)]
+
+    windows = []
+    step = max(window_size - overlap, 1)
+    for start in range(0, len(lines), step):
+        windows.append((start + 1, lines[start:start + window_size]))
+        if start + window_size >= len(lines):
+            break
+    return windows
+
+
+async def astream_code_review(project_title, project_description, file_name, file_content):
+    '''
+    This function requests code review suggestions for a given project and file content.
+    It yields the response as it is generated: ("token", text) for each chunk of the response and ("suggestion", dict)
+    for each suggestion (with its line number) as soon as it is complete.
+    Files longer than CODE_REVIEW_WINDOW_LINES are split into overlapping windows reviewed concurrently (see
+    areview_windows), only their suggestions are yielded.
+    Complete reviews are cached by a hash of the model, prompt version, project, file name and content: a repeat
+    review yields the cached suggestions without calling the model. Reviews without suggestions (e.g. a response that
+    couldn't be parsed) are not cached.
+    '''
+    cache = code_review_cache()
+    key = content_key(CODE_REVIEW_MODEL, CODE_REVIEW_PROMPT_VERSION, project_title, project_description, file_name, file_content)
+    cached = await cache.aget(key)
+    if cached is not MISS:
+        for suggestion in cached:
+            yield "suggestion", suggestion
+        return
+
+    lines = file_content.splitlines()
+    windows = split_into_windows(lines, settings.CODE_REVIEW_WINDOW_LINES, settings.CODE_REVIEW_WINDOW_OVERLAP)
+    suggestions = []
+    errors = []
+    if len(windows) == 1:
+        async for event, value in astream_window_review(project_title, project_description, file_name, 1, lines, len(lines), errors):
+            if event == "suggestion":
+                suggestions.append(value)
+            yield event, value
+    else:
+        async for suggestion in areview_windows(project_title, project_description, file_name, windows, len(lines), errors):
+            suggestions.append(suggestion)
+            yield "suggestion", suggestion
+
+    # Only cache complete reviews (not interrupted by an error or the client disconnecting, no window missing, every
+    # suggestion parsed)
+    if suggestions and not errors:
+        await cache.aset(key, suggestions)
+
+
+def code_review_cache():
+    """The cache of code review suggestions, for whole files and for windows of large files (see CODE_REVIEW_CACHE)."""
+    return get_result_cache('code_review', 'CODE_REVIEW_CACHE')
+
+
+async def areview_windows(project_title, project_description, file_name, windows, total_lines, errors=None):
+    '''
+    This function reviews the windows of a file concurrently, each one by a task of the event loop, with at most
+    CODE_REVIEW_MAX_WORKERS requests at a time.
+    It yields the suggestions of each window as soon as the window is reviewed, dropping suggestions for lines outside of
+    their window and duplicates for a line already suggested on (windows overlap).
+    A window that fails is skipped (its error is added to the errors list if given), unless all of them fail. Errors
+    parsing suggestions of a window are added to the errors list too, its other suggestions are kept.
+    The suggestions of each window are cached by the window's content and position, so after an edit that keeps the
+    line count only the windows that changed are reviewed again (not when it has no suggestions or some failed to
+    parse). Windows start at fixed line offsets, so inserting or deleting lines changes every later window.
+    '''
+    suggested_lines = set()
+    errors = [] if errors is None else errors
+    cache = code_review_cache()
+    semaphore = asyncio.Semaphore(settings.CODE_REVIEW_MAX_WORKERS)
+
+    async def review(first_line, window_lines):
+        key = window_review_key(project_title, project_description, file_name, first_line, window_lines, total_lines)
+        cached = await cache.aget(key)
+        if cached is not MISS:
+            return first_line, window_lines, cached
+
+        parse_errors = []
+        async with semaphore:
+            try:
+                suggestions = [
+                    suggestion async for event, suggestion in
+                    astream_window_review(project_title, project_description, file_name, first_line, window_lines, total_lines, parse_errors)
+                    if event == "suggestion"
+                ]
+            except Exception as e:
+                return first_line, window_lines, e
+        errors.extend(parse_errors)
+        if suggestions and not parse_errors:
+            await cache.aset(key, suggestions)
+        return first_line, window_lines, suggestions
+
+    tasks = [asyncio.ensure_future(review(first_line, window_lines)) for first_line, window_lines in windows]
+    failed = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            first_line, window_lines, suggestions = await next_done
+            last_line = first_line + len(window_lines) - 1
+            if isinstance(suggestions, Exception):
+                print(f"Error reviewing lines {first_line}-{last_line}: {suggestions}")
+                errors.append(suggestions)
+                failed.append(suggestions)
+                continue
+
+            for suggestion in new_window_suggestions(suggestions, first_line, last_line, suggested_lines):
+                yield suggestion
+    finally:
+        # Cancel the remaining windows if the consumer stopped (e.g. the client disconnected)
+        for task in tasks:
+            task.cancel()
+
+    if len(failed) == len(windows):
+        raise failed[0]
+
+
+def window_review_key(project_title, project_description, file_name, first_line, window_lines, total_lines):
+    """The cache key of the suggestions for a window, by everything its prompt is built from (see code_review_request)."""
+    return content_key(
+        CODE_REVIEW_MODEL, CODE_REVIEW_PROMPT_VERSION, project_title, project_description, file_name,
+        "window", first_line, total_lines, *window_lines,
+    )
+
+
+def new_window_suggestions(suggestions, first_line, last_line, suggested_lines):
+    """Yield the suggestions of a window for its own lines, skipping lines in suggested_lines (and adding the others)."""
+    for suggestion in suggestions:
+        try:
+            line_number = int(suggestion.get("line_number"))
+        except (TypeError, ValueError):
+            continue
+        if first_line <= line_number <= last_line and line_number not in suggested_lines:
+            suggested_lines.add(line_number)
+            yield suggestion
+
+
+async def astream_window_review(project_title, project_description, file_name, first_line, lines, total_lines, errors=None):
+    '''
+    This function sends a message to the AI model requesting code review suggestions for lines of a file, starting at line
+    number first_line (the whole file when it starts at 1 and has total_lines lines).
+    It yields ("token", text) for each chunk of the response and ("suggestion", dict) for each complete suggestion.
+    Errors parsing suggestions are added to the errors list if given, once the response is complete.
+    '''
+    stream = await async_client.chat_completion(**code_review_request(project_title, project_description, file_name, first_line, lines, total_lines))
+
+    # Forward the streaming response, parsing the suggestions as they complete
+    parser = SuggestionStreamParser()
+    async for chunk in stream:
+        text = chunk.choices[0].delta.content or ""
+        if not text:
+            continue
+        yield "token", text
+        for suggestion in parser.feed(text):
+            yield "suggestion", suggestion
+
+    if errors is not None:
+        errors.extend(parser.errors)
+
+
+def code_review_request(project_title, project_description, file_name, first_line, lines, total_lines):
+    '''
+    This function builds the arguments of the chat completion requesting code review suggestions for lines of a file
+    (see astream_window_review).
     '''
     # Add line numbers to the file content for clarity for the AI model
     numbered_content = "\n".join(
-        f"{i + 1}: {line}" for i, line in enumerate(file_content.splitlines())
+        f"{first_line + i}: {line}" for i, line in enumerate(lines)
     )
+    last_line = first_line + len(lines) - 1
+    if first_line == 1 and last_line >= total_lines:
+        file_description = "with the following content"
+    else:
+        file_description = f"and has {total_lines} lines, here are lines {first_line} to {last_line}"
     
     # Construct the message for the AI model, requesting code review suggestions
     message_content = f'''
@@ -31,7 +268,7 @@ def generate_code_review(project_title, project_description, file_name, file_con
     Keep the suggestions brief and focused, ideally less than 50 words each. Minimize using special characters that may interfere with JSON parsing.
 
     The project is called {project_title} with a description of: "{project_description}"
-    The file is named {file_name} with the following content:
+    The file is named {file_name} {file_description}:
     {numbered_content}
     END OF FILE
     '''
@@ -58,10 +295,10 @@ def generate_code_review(project_title, project_description, file_name, file_con
         },
     }
 
-    # Call the AI model
+    # Arguments of the call to the AI model
     messages = [{"role": "user", "content": message_content}]
-    stream = client.chat.completions.create(
-        model="meta-llama/Meta-Llama-3-8B-Instruct",  # Use the desired model
+    return dict(
+        model=CODE_REVIEW_MODEL,  # Use the desired model
         messages=messages,  # Pass the message to the model
         max_tokens=4000,  # Increase max tokens for longer responses, should limit to 500 in the response but set to 4000 just in case
         stream=True,  # Stream the response to avoid timeout
@@ -69,28 +306,30 @@ def generate_code_review(project_title, project_description, file_name, file_con
         response_format=response_format,  # Enforce JSON Schema validation
     )
 
-    # Process the streaming response
-    response_text = ""
-    for chunk in stream:
-        # print(response_text)
-        response_text += chunk.choices[0].delta.content
 
-    # Attempt to parse the response as JSON
-    try:
-        suggestions = json.loads(response_text)
-    except json.JSONDecodeError:
-        # If JSON parsing fails, handle the error
-        print("Failed to parse JSON response")
-        suggestions = None
+async def agenerate_code_review(project_title, project_description, file_name, file_content):
+    '''
+    This function requests code review suggestions for a given project and file content (see astream_code_review).
+    The AI model is expected to provide at least 5 meaningful and specific suggestions or improvements for the code.
+    The function returns the suggestions as a list of dictionaries, each containing the line number and suggestion, or an error if it occurs.
+    '''
+    suggestions = [
+        value async for event, value in astream_code_review(project_title, project_description, file_name, file_content)
+        if event == "suggestion"
+    ]
+    # Windows of large files complete in any order
+    return sort_by_line(suggestions)
 
-    return suggestions.get("suggestions", [])
 
+def sort_by_line(suggestions):
+    return sorted(suggestions, key=lambda suggestion: suggestion.get("line_number") if isinstance(suggestion.get("line_number"), int) else 0)
 
-def generate_ai_answer(question_content):
+
+async def astream_ai_answer(question_content):
     '''
-    This function sends a message to the AI model with a question and returns the answer provided by the model.
+    This function sends a message to the AI model with a question and yields the answer as it is generated, chunk by chunk
+    (async, for the async views).
     The AI model is expected to provide a detailed and relevant answer to the question.
-    The function returns the answer as a string or an error if it occurs.
     '''
     # Construct the message for the AI model, requesting an answer to the question
     message_content = f'''
@@ -100,7 +339,7 @@ def generate_ai_answer(question_content):
 
     # Call the AI model
     messages = [{"role": "user", "content": message_content}] 
-    stream = client.chat.completions.create(
+    stream = await async_client.chat_completion(
         model="meta-llama/Meta-Llama-3-8B-Instruct", # Use the desired model
         messages=messages, # Pass the message to the model
         max_tokens=1000, # Increase max tokens for longer responses
@@ -108,17 +347,54 @@ def generate_ai_answer(question_content):
         temperature=0.8, # Lower temperature for more deterministic results
     )
 
-    # Process the streaming response
-    response_text = ""
-    for chunk in stream:
-        response_text += chunk.choices[0].delta.content
+    # Forward the streaming response
+    async for chunk in stream:
+        text = chunk.choices[0].delta.content
+        if text:
+            yield text
+
+
+def moderation_cache():
+    """The cache of moderation classifications, keyed by model and content hash (see MODERATION_CACHE)."""
+    return get_result_cache('moderation', 'MODERATION_CACHE')
+
+
+def classify_content(text: str) -> list:
+    """
+    Sync version of aclassify_content for text, for the moderation worker threads (see services/moderation_service.py).
+    """
+    backend = get_moderation_backend()
+    return moderation_cache().get_or_compute(content_key(backend.model, text), lambda: backend.classify(text))
+
+
+async def aclassify_content(content: str | bytes) -> list:
+    """
+    Classify text (with the moderation backend) or an image (with the NSFW model). Classifications are
+    cached by model and content hash, so resubmitting the same content (unchanged edits, retried posts)
+    doesn't classify it again. Errors are not cached.
+
+    Returns:
+        list: The classifications, as dicts with a label and a score
+    """
+    if isinstance(content, bytes):
+        model = NSFW_IMAGE_MODEL
+
+        async def classify():
+            classifications = await async_client.image_classification(image=content, model=model)
+            return [{"label": c["label"], "score": c["score"]} for c in classifications]
+    else:
+        backend = get_moderation_backend()
+        model = backend.model
+
+        async def classify():
+            return await backend.aclassify(content)
 
-    return response_text
+    return await moderation_cache().aget_or_compute(content_key(model, content), classify)
 
 
-def check_img_content(img_content: bytes, threshold: float = 0.8) -> bool:
+async def acheck_img_content(img_content: bytes, threshold: float = 0.8) -> bool:
     """
-    Checks if the provided text contains NSFW content.
+    Checks if the provided image contains NSFW content.
 
     Args:
         img_content (bytes): The image in bytes to check for NSFW
@@ -128,28 +404,25 @@ def check_img_content(img_content: bytes, threshold: float = 0.8) -> bool:
         bool: True if NSFW is detected, otherwise False.
     """
     try:
-        classifications = client.image_classification(
-            image=img_content,
-            model="Falconsai/nsfw_image_detection",
-        )
+        return is_nsfw(await aclassify_content(img_content), threshold)
+    except Exception as e:
+        print(f"Error during NSFW content check: {e}")
+        return False
 
-        for classification in classifications:
-            label = classification.label.lower()
-            score = classification.score
 
-            if label == "nsfw" and score >= threshold:
-                return True
+def is_nsfw(classifications: list, threshold: float) -> bool:
+    for classification in classifications:
+        label = classification["label"].lower()
+        score = classification["score"]
 
-        # No NSFW content detected above the threshold
-        return False
+        if label == "nsfw" and score >= threshold:
+            return True
 
-    except Exception as e:
-        # Log or handle the exception appropriately
-        print(f"Error during NSFW content check: {e}")
-        return False
+    # No NSFW content detected above the threshold
+    return False
 
 
-def check_content(text, threshold=0.9, restricted_labels=None):
+async def acheck_content(text, threshold=0.9, restricted_labels=None):
     """
     Checks if the provided text contains restricted content.
 
@@ -161,20 +434,34 @@ def check_content(text, threshold=0.9, restricted_labels=None):
     Returns:
       bool: True if restricted content is detected, otherwise False.
     """
-    if restricted_labels is None:
-        restricted_labels = ["toxic", "severe_toxic", "obscene", "threat", "insult", "identity_hate"]
-
     try:
-        classifications = client.text_classification(
-            text=text,
-            model="unitary/toxic-bert",
-        )
-
-        for classification in classifications:
-            if classification['label'] in restricted_labels and classification['score'] >= threshold:
-                return True
-
-        return False  # No restricted content detected
+        return await adetect_restricted_content(text, threshold, restricted_labels)
     except Exception as e:
         print(f"Error during content check: {e}")
         return False
+
+
+def detect_restricted_content(text, threshold=0.9, restricted_labels=None):
+    """
+    Same as acheck_content, but sync (for the moderation worker threads) and errors (e.g. the moderation backend
+    being unavailable) are raised instead of letting the content through.
+    """
+    return is_restricted(classify_content(text), threshold, restricted_labels)
+
+
+async def adetect_restricted_content(text, threshold=0.9, restricted_labels=None):
+    """
+    Async version of detect_restricted_content.
+    """
+    return is_restricted(await aclassify_content(text), threshold, restricted_labels)
+
+
+def is_restricted(classifications, threshold, restricted_labels=None):
+    if restricted_labels is None:
+        restricted_labels = ["toxic", "severe_toxic", "obscene", "threat", "insult", "identity_hate"]
+
+    for classification in classifications:
+        if classification['label'] in restricted_labels and classification['score'] >= threshold:
+            return True
+
+    return False  # No restricted content detected
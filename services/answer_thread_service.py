@@ -0,0 +1,118 @@
+# services/answer_thread_service.py
+from collections import defaultdict
+from typing import Iterable
+from uuid import UUID
+from django.db.models import Q, QuerySet
+from pulse.models import Answers, BadgeTier, Questions, UserBadge, UserBadgeProgress
+from pulse.serializers import AnswerSerializer
+
+
+class AnswerThreadService:
+    """Service class to load and serialize the answers of a question thread.
+
+    Everything the AnswerSerializer needs (experts, their badges, badge tiers and badge
+    progress) is fetched up front in a fixed number of queries, instead of once per answer.
+    """
+
+    @classmethod
+    def get_answers(cls, question_id: str) -> QuerySet:
+        """Get all answers for a question with their expert and question joined in."""
+        return (
+            Answers.objects.filter(question=question_id)
+            .exclude(moderation_status='rejected')  # hidden by content moderation
+            .select_related('expert', 'question')
+        )
+
+    @classmethod
+    def build_badge_context(cls, answers: Iterable[Answers]) -> dict:
+        """
+        Load the badge data for every answer in the thread.
+
+        Args:
+            answers: Answers to load badge data for (should have expert/question joined in)
+
+        Returns:
+            dict: Serializer context with the expert badges per answer, the first tier
+            threshold per badge and the badge progress per (user, badge) pair
+        """
+        answers = list(answers)
+        context = {
+            'expert_badges': {},
+            'first_tier_thresholds': {},
+            'badge_progress': {},
+        }
+
+        expert_ids = {answer.expert_id for answer in answers if answer.expert_id}
+        if not expert_ids:
+            return context
+
+        # Tags of every question in the thread (normally just one question)
+        question_ids = {answer.question_id for answer in answers if answer.question_id}
+        question_tags = defaultdict(set)
+        for question_id, tag_id in Questions.tags.through.objects.filter(
+            questions_id__in=question_ids
+        ).values_list('questions_id', 'tags_id'):
+            question_tags[question_id].add(tag_id)
+        all_tag_ids = set().union(*question_tags.values())
+
+        # Global badges and tag-specific badges (for any tag in the thread) of every expert
+        user_badges = list(
+            UserBadge.objects.filter(user_id__in=expert_ids)
+            .filter(
+                Q(badge__is_global=True) |
+                Q(badge__is_global=False, badge__associated_tag__in=all_tag_ids)
+            )
+            .select_related('badge', 'badge_tier')
+            .order_by('earned_at')
+        )
+
+        global_badges = defaultdict(list)
+        tag_badges = defaultdict(list)
+        for user_badge in user_badges:
+            if user_badge.badge.is_global:
+                global_badges[user_badge.user_id].append(user_badge)
+            else:
+                tag_badges[user_badge.user_id].append(user_badge)
+
+        # Attach the badges that apply to each answer (global ones first, then the ones for its question's tags)
+        for answer in answers:
+            if not answer.expert_id:
+                continue
+            answer_tags = question_tags.get(answer.question_id, set())
+            context['expert_badges'][answer.answer_id] = global_badges[answer.expert_id] + [
+                user_badge for user_badge in tag_badges[answer.expert_id]
+                if user_badge.badge.associated_tag_id in answer_tags
+            ]
+
+        badge_ids = {user_badge.badge_id for user_badge in user_badges}
+        if not badge_ids:
+            return context
+
+        # Lowest tier threshold for each badge (tiers are ordered by threshold, so keep the first one seen)
+        for badge_id, threshold in BadgeTier.objects.filter(badge_id__in=badge_ids).order_by(
+            'badge_id', 'reputation_threshold'
+        ).values_list('badge_id', 'reputation_threshold'):
+            context['first_tier_thresholds'].setdefault(badge_id, threshold)
+
+        # Progress for every (expert, badge) pair
+        for user_id, badge_id, progress_value in UserBadgeProgress.objects.filter(
+            user_id__in=expert_ids, badge_id__in=badge_ids
+        ).values_list('user_id', 'badge_id', 'progress_value'):
+            context['badge_progress'][(user_id, badge_id)] = progress_value
+
+        return context
+
+    @classmethod
+    def serialize_thread(cls, question_id: UUID | str) -> list:
+        """
+        Serialize all answers for a question, including each expert's badges.
+
+        Args:
+            question_id: ID of the question whose answers are serialized
+
+        Returns:
+            list: Serialized answers, in the same shape as AnswerSerializer(many=True)
+        """
+        answers = list(cls.get_answers(question_id))
+        context = cls.build_badge_context(answers)
+        return AnswerSerializer(answers, many=True, context=context).data
@@ -0,0 +1,167 @@
+# services/badge_service.py
+import logging
+import threading
+import time
+from typing import Iterable
+from uuid import UUID
+from django.db import transaction
+from django.utils import timezone
+from pulse.models import Badge, UserBadge, UserBadgeProgress, UserTagReputation
+
+logger = logging.getLogger(__name__)
+
+
+class BadgeService:
+    """Service class to award badge tiers and keep badge progress up to date.
+
+    Only the badges affected by a reputation change are evaluated: the global badges when a user's
+    reputation changes, and the badges of a question's tags when one of the user's answers to it is voted on.
+    Tag reputations are read from the UserTagReputation counters, and badges/tiers are cached in memory,
+    so an evaluation runs a fixed number of queries whatever the number of badges and answers.
+    """
+
+    # Seconds before the badge/tier cache is reloaded (it is also cleared when a badge or tier is saved here)
+    CACHE_TTL = 300
+
+    _cache: dict | None = None
+    _loaded_at = 0.0
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_badges(cls) -> dict:
+        """
+        Get the cached badges and their tiers.
+
+        Returns:
+            dict: 'global' (list of global badges), 'by_tag' ({tag_id: [badges]}) and 'tiers'
+            ({badge_id: [tiers, by increasing reputation threshold]})
+        """
+        with cls._lock:
+            if cls._cache is None or time.monotonic() - cls._loaded_at > cls.CACHE_TTL:
+                cls._cache = cls._load_badges()
+                cls._loaded_at = time.monotonic()
+            return cls._cache
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Clear the badge/tier cache (it is reloaded on the next evaluation)."""
+        with cls._lock:
+            cls._cache = None
+
+    @classmethod
+    def _load_badges(cls) -> dict:
+        badges = {'global': [], 'by_tag': {}, 'tiers': {}}
+        for badge in Badge.objects.prefetch_related('tiers'):
+            if badge.is_global:
+                badges['global'].append(badge)
+            elif badge.associated_tag_id:
+                badges['by_tag'].setdefault(badge.associated_tag_id, []).append(badge)
+            else:
+                logger.warning(f"Badge '{badge.name}' has no associated tag and is not global.")
+                continue
+            badges['tiers'][badge.badge_id] = sorted(badge.tiers.all(), key=lambda tier: tier.reputation_threshold)
+        return badges
+
+    @classmethod
+    def evaluate(
+        cls,
+        user_id: UUID | str,
+        tag_ids: Iterable | None = None,
+        global_reputation: int | None = None,
+    ) -> None:
+        """
+        Award new badge tiers and update the badge progress of a user.
+
+        Tiers are never taken away, and the progress target never decreases.
+
+        Args:
+            user_id: ID of the user
+            tag_ids: IDs of the tags whose badges are evaluated (None for every tag badge)
+            global_reputation: The user's reputation, to evaluate the global badges (None to skip them)
+        """
+        badges = cls.get_badges()
+
+        if tag_ids is None:
+            tag_badges = [badge for tag_badges in badges['by_tag'].values() for badge in tag_badges]
+        else:
+            tag_badges = [badge for tag_id in set(tag_ids) for badge in badges['by_tag'].get(tag_id, [])]
+        global_badges = badges['global'] if global_reputation is not None else []
+        if not tag_badges and not global_badges:
+            return
+
+        reputations = {badge.badge_id: global_reputation for badge in global_badges}
+        if tag_badges:
+            tag_reputations = dict(
+                UserTagReputation.objects
+                .filter(user_id=user_id, tag_id__in={badge.associated_tag_id for badge in tag_badges})
+                .values_list('tag_id', 'score_sum')
+            )
+            for badge in tag_badges:
+                reputations[badge.badge_id] = tag_reputations.get(badge.associated_tag_id, 0)
+
+        with transaction.atomic():
+            # Lock the user's existing rows so concurrent evaluations can't move a tier or target backwards
+            user_badges = {
+                user_badge.badge_id: user_badge
+                for user_badge in UserBadge.objects.select_for_update(of=('self',))
+                .select_related('badge_tier')
+                .filter(user_id=user_id, badge_id__in=reputations)
+            }
+            progresses = {
+                progress.badge_id: progress
+                for progress in UserBadgeProgress.objects.select_for_update()
+                .filter(user_id=user_id, badge_id__in=reputations)
+            }
+
+            now = timezone.now()
+            new_badges, updated_badges, new_progresses, updated_progresses = [], [], [], []
+
+            for badge_id, reputation in reputations.items():
+                tiers = badges['tiers'][badge_id]
+                qualifying_tiers = [tier for tier in tiers if tier.reputation_threshold <= reputation]
+                highest_tier = max(qualifying_tiers, key=lambda tier: tier.tier_level, default=None)
+                next_tier = next((tier for tier in tiers if tier.reputation_threshold > reputation), None)
+
+                # Award the first tier or upgrade the existing badge
+                user_badge = user_badges.get(badge_id)
+                if user_badge is None:
+                    user_badge = UserBadge(user_id=user_id, badge_id=badge_id, badge_tier=highest_tier, earned_at=now)
+                    new_badges.append(user_badge)
+                elif highest_tier and (not user_badge.badge_tier or highest_tier.tier_level > user_badge.badge_tier.tier_level):
+                    user_badge.badge_tier = highest_tier
+                    user_badge.earned_at = now
+                    updated_badges.append(user_badge)
+
+                new_progress_target = (
+                    next_tier.reputation_threshold if next_tier else
+                    (highest_tier.reputation_threshold if highest_tier else 0)
+                )
+
+                progress = progresses.get(badge_id)
+                if progress is None:
+                    new_progresses.append(UserBadgeProgress(
+                        user_id=user_id,
+                        badge_id=badge_id,
+                        progress_value=reputation,
+                        progress_target=new_progress_target,
+                    ))
+                    continue
+
+                progress_value = max(reputation, user_badge.badge_tier.reputation_threshold if user_badge.badge_tier else 0)
+                # Only update progress_target if it increases
+                progress_target = max(new_progress_target, progress.progress_target or 0)
+                if (progress_value, progress_target) != (progress.progress_value, progress.progress_target):
+                    progress.progress_value = progress_value
+                    progress.progress_target = progress_target
+                    progress.last_updated = now
+                    updated_progresses.append(progress)
+
+            # A row created meanwhile by a concurrent evaluation is kept (ignore_conflicts)
+            UserBadge.objects.bulk_create(new_badges, ignore_conflicts=True)
+            UserBadge.objects.bulk_update(updated_badges, ['badge_tier', 'earned_at'])
+            UserBadgeProgress.objects.bulk_create(new_progresses, ignore_conflicts=True)
+            UserBadgeProgress.objects.bulk_update(updated_progresses, ['progress_value', 'progress_target', 'last_updated'])
+
+        for user_badge in new_badges + updated_badges:
+            if user_badge.badge_tier:
+                logger.info(f"Awarded tier '{user_badge.badge_tier.name}' to user {user_id}.")
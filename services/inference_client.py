@@ -0,0 +1,358 @@
+# services/inference_client.py
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, Iterator
+import aiohttp
+import requests
+from django.conf import settings
+from huggingface_hub import AsyncInferenceClient, InferenceClient
+from huggingface_hub.utils import HfHubHTTPError
+from services.stats_service import StatsService
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying (rate limited, or the upstream is temporarily unavailable)
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float('inf'))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a model whose recent calls kept failing."""
+
+
+class ModelBusyError(Exception):
+    """Raised when no slot to call a model frees up within the queue timeout."""
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive failed calls, then lets one trial call through every `reset_timeout` seconds."""
+
+    def __init__(self, failures: int, reset_timeout: float):
+        self.failure_threshold = failures
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_timeout else 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'open':
+                return False
+            if self.state == 'half-open':
+                # Let one trial call through, the next ones wait for its result (or for another reset_timeout)
+                self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class LatencyHistogram:
+    """Counts calls per latency bucket, and errors."""
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            if not ok:
+                self.errors += 1
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self.buckets[i] += 1
+                    break
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "count": self.count,
+                "errors": self.errors,
+                "mean_seconds": self.total / self.count if self.count else 0.0,
+                "buckets": {f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS, self.buckets)},
+            }
+
+
+class ModelState:
+    """Concurrency limit, circuit breaker and latency histogram of one model."""
+
+    def __init__(self, config: dict):
+        self.semaphore = threading.BoundedSemaphore(config['MAX_CONCURRENCY'])
+        self.breaker = CircuitBreaker(config['BREAKER_FAILURES'], config['BREAKER_RESET'])
+        self.histogram = LatencyHistogram()
+
+
+class AsyncModelState(ModelState):
+    """ModelState limiting concurrent calls with asyncio semaphores, one per event loop (they can't be shared between loops)."""
+
+    def __init__(self, config: dict):
+        self.max_concurrency = config['MAX_CONCURRENCY']
+        self.breaker = CircuitBreaker(config['BREAKER_FAILURES'], config['BREAKER_RESET'])
+        self.histogram = LatencyHistogram()
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._semaphores:
+                self._semaphores[loop] = asyncio.BoundedSemaphore(self.max_concurrency)
+            return self._semaphores[loop]
+
+
+class ManagedInferenceClient:
+    """Wraps a huggingface_hub InferenceClient so every call to a model:
+
+    - waits at most QUEUE_TIMEOUT seconds for one of the model's MAX_CONCURRENCY slots (ModelBusyError),
+    - fails right away while the model's circuit breaker is open (CircuitOpenError),
+    - times out after TIMEOUT seconds without a response,
+    - is retried up to RETRIES times with jittered exponential backoff on connection errors and 429/5xx (not on
+      timeouts, the call already took the whole timeout),
+    - is recorded in the model's latency/error histogram.
+
+    Methods are those of InferenceClient (text_classification, image_classification, chat_completion, post, ...),
+    called with a model keyword argument. Streamed calls (stream=True) hold their slot until the stream is consumed,
+    and are only retried before their first chunk. Configured by the INFERENCE_CLIENT setting.
+    """
+
+    client_class = InferenceClient
+    state_class = ModelState
+
+    def __init__(self, **client_kwargs):
+        self.config = settings.INFERENCE_CLIENT
+        self.client = self.client_class(timeout=self.config['TIMEOUT'], **client_kwargs)
+        self._models: dict = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        method = getattr(self.client, name)
+
+        def call(*args, model: str | None = None, **kwargs):
+            if kwargs.get('stream'):
+                return self._stream(model, method, args, kwargs)
+            return self._call(model, method, args, kwargs)
+
+        return call
+
+    def get_model_state(self, model: str | None) -> ModelState:
+        with self._lock:
+            if model not in self._models:
+                self._models[model] = self.state_class(self.config)
+                StatsService.start()
+            return self._models[model]
+
+    def stats(self) -> dict:
+        """Get the circuit state and latency histogram of every model called by this process."""
+        with self._lock:
+            models = dict(self._models)
+        return {
+            model: {"circuit": state.breaker.state, **state.histogram.snapshot()}
+            for model, state in models.items()
+        }
+
+    def _call(self, model, method, args, kwargs) -> Any:
+        state = self.get_model_state(model)
+        for attempt in range(self.config['RETRIES'] + 1):
+            self._acquire(model, state)
+            start = time.monotonic()
+            try:
+                result = method(*args, model=model, **kwargs)
+            except Exception as e:
+                self._record_failure(model, state, start, e)
+                if not self._should_retry(e, attempt):
+                    raise
+                logger.warning(f"Retrying {model} after error: {e}")
+            else:
+                self._record_success(state, start)
+                return result
+            finally:
+                state.semaphore.release()
+            self._backoff(attempt)
+
+    def _stream(self, model, method, args, kwargs) -> Iterator:
+        state = self.get_model_state(model)
+        for attempt in range(self.config['RETRIES'] + 1):
+            self._acquire(model, state)
+            start = time.monotonic()
+            started = False
+            try:
+                for chunk in method(*args, model=model, **kwargs):
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                # The consumer stopped reading, that's not a failure of the model
+                self._record_success(state, start)
+                raise
+            except Exception as e:
+                self._record_failure(model, state, start, e)
+                if started or not self._should_retry(e, attempt):
+                    raise
+                logger.warning(f"Retrying {model} after error: {e}")
+            else:
+                self._record_success(state, start)
+                return
+            finally:
+                state.semaphore.release()
+            self._backoff(attempt)
+
+    def _acquire(self, model, state: ModelState) -> None:
+        if not state.breaker.allow():
+            raise CircuitOpenError(f"Calls to {model} are suspended after repeated failures")
+        if not state.semaphore.acquire(timeout=self.config['QUEUE_TIMEOUT']):
+            raise ModelBusyError(f"Too many concurrent calls to {model}")
+
+    def _record_success(self, state: ModelState, start: float) -> None:
+        state.histogram.observe(time.monotonic() - start, ok=True)
+        state.breaker.record_success()
+
+    def _record_failure(self, model, state: ModelState, start: float, error: Exception) -> None:
+        state.histogram.observe(time.monotonic() - start, ok=False)
+        if not self._is_model_failure(error):
+            return  # e.g. a 400/413/422 caused by the request itself, it says nothing about the model's health
+        state.breaker.record_failure()
+        if state.breaker.state == 'open':
+            logger.error(f"Circuit opened for {model}")
+
+    def _is_model_failure(self, error: Exception) -> bool:
+        """Whether an error counts toward opening the circuit: timeouts, connection errors, 429 and 5xx."""
+        if isinstance(error, (requests.Timeout, TimeoutError, asyncio.TimeoutError)):
+            return True
+        if isinstance(error, (requests.ConnectionError, aiohttp.ClientConnectionError)):
+            return True
+        status = self._status_code(error)
+        return status is not None and (status == 429 or status >= 500)
+
+    def _should_retry(self, error: Exception, attempt: int) -> bool:
+        if attempt >= self.config['RETRIES']:
+            return False
+        if isinstance(error, (requests.Timeout, TimeoutError, asyncio.TimeoutError)):
+            return False  # the call already took the whole timeout, retrying it would only add to the wait
+        if isinstance(error, (requests.ConnectionError, aiohttp.ClientConnectionError)):
+            return True
+        return self._status_code(error) in RETRYABLE_STATUSES
+
+    @staticmethod
+    def _status_code(error: Exception) -> int | None:
+        """The HTTP status of a failed call, None if it didn't get a response."""
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status
+        response = getattr(error, 'response', None)
+        if isinstance(error, HfHubHTTPError) and response is not None:
+            return response.status_code
+        return None
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # Full jitter: a random delay up to BACKOFF * 2^attempt, so retries from many workers don't line up
+        return random.uniform(0, self.config['BACKOFF'] * 2 ** attempt)
+
+    def _backoff(self, attempt: int) -> None:
+        time.sleep(self._backoff_delay(attempt))
+
+
+class AsyncManagedInferenceClient(ManagedInferenceClient):
+    """The same as ManagedInferenceClient for async views, wrapping a huggingface_hub AsyncInferenceClient.
+
+    Calls are awaited, and waiting for a slot or a retry doesn't block the event loop. Streamed calls
+    (stream=True) return an async iterator, e.g. `async for chunk in await client.chat_completion(..., stream=True)`.
+    """
+
+    client_class = AsyncInferenceClient
+    state_class = AsyncModelState
+
+    def __init__(self, **client_kwargs):
+        super().__init__(**client_kwargs)
+        self.client_kwargs = client_kwargs
+
+    def __getattr__(self, name: str):
+        method = getattr(self.client, name)
+
+        async def call(*args, model: str | None = None, **kwargs):
+            if kwargs.get('stream'):
+                return self._stream(model, name, args, kwargs)
+            return await self._call(model, method, args, kwargs)
+
+        return call
+
+    async def _call(self, model, method, args, kwargs) -> Any:
+        state = self.get_model_state(model)
+        for attempt in range(self.config['RETRIES'] + 1):
+            semaphore = await self._acquire(model, state)
+            start = time.monotonic()
+            try:
+                result = await method(*args, model=model, **kwargs)
+            except Exception as e:
+                self._record_failure(model, state, start, e)
+                if not self._should_retry(e, attempt):
+                    raise
+                logger.warning(f"Retrying {model} after error: {e}")
+            else:
+                self._record_success(state, start)
+                return result
+            finally:
+                semaphore.release()
+            await asyncio.sleep(self._backoff_delay(attempt))
+
+    async def _stream(self, model, name, args, kwargs) -> AsyncIterator:
+        state = self.get_model_state(model)
+        for attempt in range(self.config['RETRIES'] + 1):
+            semaphore = await self._acquire(model, state)
+            # One client per stream, closed when the stream ends: huggingface_hub stops reading a streamed response
+            # at its end marker without closing its connection, and keeps a reference to it until the client is closed
+            client = self.client_class(timeout=self.config['TIMEOUT'], **self.client_kwargs)
+            start = time.monotonic()
+            started = False
+            try:
+                async for chunk in await getattr(client, name)(*args, model=model, **kwargs):
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                # The consumer stopped reading, that's not a failure of the model
+                self._record_success(state, start)
+                raise
+            except Exception as e:
+                self._record_failure(model, state, start, e)
+                if started or not self._should_retry(e, attempt):
+                    raise
+                logger.warning(f"Retrying {model} after error: {e}")
+            else:
+                self._record_success(state, start)
+                return
+            finally:
+                semaphore.release()
+                await client.close()
+            await asyncio.sleep(self._backoff_delay(attempt))
+
+    async def _acquire(self, model, state: AsyncModelState) -> asyncio.Semaphore:
+        if not state.breaker.allow():
+            raise CircuitOpenError(f"Calls to {model} are suspended after repeated failures")
+        semaphore = state.get_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.config['QUEUE_TIMEOUT'])
+        except asyncio.TimeoutError:
+            raise ModelBusyError(f"Too many concurrent calls to {model}")
+        return semaphore
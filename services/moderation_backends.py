@@ -0,0 +1,260 @@
+# services/moderation_backends.py
+import asyncio
+import json
+import logging
+import queue
+import re
+import threading
+from concurrent.futures import Future
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+
+class ModerationBackend:
+    """Base class of the text moderation backends.
+
+    A backend classifies texts into labels with a confidence score, e.g. [{"label": "toxic", "score": 0.97}, ...].
+    Backends implement classify_batch, classifying several texts in one call where the model allows it. The async
+    versions (aclassify, aclassify_batch) run the sync ones in a thread, unless the backend has a native async path.
+    """
+
+    # Name of the model, part of the moderation cache key
+    model = None
+
+    def classify_batch(self, texts: list) -> list:
+        """
+        Classify several texts.
+
+        Returns:
+            list: One list of {"label", "score"} dicts per text, in the same order
+        """
+        raise NotImplementedError
+
+    def classify(self, text: str) -> list:
+        """Classify one text, see classify_batch."""
+        return self.classify_batch([text])[0]
+
+    async def aclassify_batch(self, texts: list) -> list:
+        return await sync_to_async(self.classify_batch, thread_sensitive=False)(texts)
+
+    async def aclassify(self, text: str) -> list:
+        return (await self.aclassify_batch([text]))[0]
+
+
+class HuggingFaceBackend(ModerationBackend):
+    """Classifies texts with the Hugging Face Inference API (all the texts of a batch in one request)."""
+
+    def __init__(self, model: str, client=None, async_client=None):
+        self.model = model
+        self._client = client
+        self._async_client = async_client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from services.ai_model_service import client
+            self._client = client
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            from services.ai_model_service import async_client
+            self._async_client = async_client
+        return self._async_client
+
+    def classify_batch(self, texts: list) -> list:
+        return self.parse_response(self.client.post(json={"inputs": texts}, model=self.model, task="text-classification"))
+
+    async def aclassify_batch(self, texts: list) -> list:
+        return self.parse_response(
+            await self.async_client.post(json={"inputs": texts}, model=self.model, task="text-classification")
+        )
+
+    @staticmethod
+    def parse_response(content: bytes) -> list:
+        response = json.loads(content)
+        # One text gives [[...]] or [...] depending on the model, a batch gives one list per text
+        if response and isinstance(response[0], dict):
+            response = [response]
+        return [
+            [{"label": classification["label"], "score": classification["score"]} for classification in classifications]
+            for classifications in response
+        ]
+
+
+class TransformersBackend(ModerationBackend):
+    """Classifies texts on the CPU with a local transformers model (a model name or a path on disk).
+
+    Requires the optional transformers and torch packages, the model is loaded on first use.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self._pipeline = None
+        self._lock = threading.Lock()
+
+    def get_pipeline(self):
+        with self._lock:
+            if self._pipeline is None:
+                try:
+                    from transformers import pipeline
+                except ImportError as e:
+                    raise ImproperlyConfigured("The transformers moderation backend requires the transformers package") from e
+                self._pipeline = pipeline("text-classification", model=self.model, top_k=None, device=-1)
+            return self._pipeline
+
+    def classify_batch(self, texts: list) -> list:
+        results = self.get_pipeline()(texts, truncation=True)
+        return [
+            [{"label": classification["label"], "score": float(classification["score"])} for classification in classifications]
+            for classifications in results
+        ]
+
+
+class LexiconPrefilter(ModerationBackend):
+    """Skips the model for text that is obviously clean, and sends everything else to the wrapped backend.
+
+    Text is obviously clean when it is plain ASCII, none of its words is in the lexicon and no lexicon
+    entry of 4 letters or more appears in its letters once spacing/punctuation is removed (e.g. "b.a.d.w.o.r.d").
+    Clean text is classified as [] (no label).
+    """
+
+    def __init__(self, backend: ModerationBackend, lexicon_path: str):
+        self.backend = backend
+        self.model = backend.model
+        with open(lexicon_path, encoding='utf-8') as lexicon_file:
+            self.lexicon = {line.strip().lower() for line in lexicon_file if line.strip() and not line.startswith('#')}
+        self.long_entries = [entry for entry in self.lexicon if len(entry) >= 4 and entry.isalpha()]
+
+    def is_clean(self, text: str) -> bool:
+        if not text.isascii():
+            return False
+        lowered = text.lower()
+        if any(word in self.lexicon for word in re.findall(r"[a-z0-9']+", lowered)):
+            return False
+        letters = re.sub(r"[^a-z]", "", lowered)
+        return not any(entry in letters for entry in self.long_entries)
+
+    def classify_batch(self, texts: list) -> list:
+        results = [[] for _ in texts]
+        flagged = [i for i, text in enumerate(texts) if not self.is_clean(text)]
+        if flagged:
+            for i, classifications in zip(flagged, self.backend.classify_batch([texts[i] for i in flagged])):
+                results[i] = classifications
+        return results
+
+    def classify(self, text: str) -> list:
+        return [] if self.is_clean(text) else self.backend.classify(text)
+
+    async def aclassify_batch(self, texts: list) -> list:
+        results = [[] for _ in texts]
+        flagged = [i for i, text in enumerate(texts) if not self.is_clean(text)]
+        if flagged:
+            for i, classifications in zip(flagged, await self.backend.aclassify_batch([texts[i] for i in flagged])):
+                results[i] = classifications
+        return results
+
+    async def aclassify(self, text: str) -> list:
+        return [] if self.is_clean(text) else await self.backend.aclassify(text)
+
+
+class MicroBatcher(ModerationBackend):
+    """Groups the texts classified concurrently (from several request threads) into batches for the wrapped backend.
+
+    A batch is sent when it has max_batch_size texts, or max_wait_ms after its first text arrived. Texts whose caller
+    stopped waiting (the future was cancelled, e.g. by aclassify's timeout) are dropped from the batch.
+    """
+
+    def __init__(self, backend: ModerationBackend, max_batch_size: int = 16, max_wait_ms: int = 10, timeout: float = 30):
+        self.backend = backend
+        self.model = backend.model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self._queue: queue.Queue = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def classify(self, text: str) -> list:
+        return self._enqueue(text).result(timeout=self.timeout)
+
+    async def aclassify(self, text: str) -> list:
+        return await asyncio.wait_for(asyncio.wrap_future(self._enqueue(text)), timeout=self.timeout)
+
+    def classify_batch(self, texts: list) -> list:
+        return self.backend.classify_batch(texts)
+
+    async def aclassify_batch(self, texts: list) -> list:
+        return await self.backend.aclassify_batch(texts)
+
+    def _enqueue(self, text: str) -> Future:
+        future = Future()
+        self._queue.put((text, future))
+        with self._lock:
+            # Also restarts a worker thread that died
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='moderation-batcher', daemon=True)
+                self._worker.start()
+        return future
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.max_batch_size:
+                    batch.append(self._queue.get(timeout=self.max_wait))
+            except queue.Empty:
+                pass
+
+            # Skip the texts nobody waits for anymore (a cancelled future can't be given a result)
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.backend.classify_batch([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    self._deliver(future.set_exception, e)
+                continue
+            for (_, future), classifications in zip(batch, results):
+                self._deliver(future.set_result, classifications)
+
+    @staticmethod
+    def _deliver(set_outcome, outcome) -> None:
+        """Set a future's result or exception, without letting a failure stop the worker thread."""
+        try:
+            set_outcome(outcome)
+        except Exception as e:
+            logger.error(f"Error delivering a moderation result: {e}")
+
+
+BACKENDS = {
+    'huggingface': HuggingFaceBackend,
+    'transformers': TransformersBackend,
+}
+
+_backend: ModerationBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def get_moderation_backend() -> ModerationBackend:
+    """Get the process-wide text moderation backend, built on first use from the MODERATION_BACKEND setting."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            config = settings.MODERATION_BACKEND
+            if config['BACKEND'] not in BACKENDS:
+                raise ImproperlyConfigured(f"Invalid moderation backend: {config['BACKEND']}")
+
+            backend = BACKENDS[config['BACKEND']](config['MODEL'])
+            if config.get('BATCH_SIZE', 1) > 1:
+                backend = MicroBatcher(backend, config['BATCH_SIZE'], config.get('BATCH_WAIT_MS', 10))
+            if config.get('LEXICON_PATH'):
+                backend = LexiconPrefilter(backend, config['LEXICON_PATH'])
+            _backend = backend
+        return _backend
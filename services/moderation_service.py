@@ -0,0 +1,114 @@
+# services/moderation_service.py
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from uuid import UUID
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from pulse.models import Answers, Comments, HiveMembers
+from services.ai_model_service import detect_restricted_content
+from services.notification_service import NotificationService
+from services.outbox_service import OutboxService
+
+logger = logging.getLogger(__name__)
+
+
+class ModerationService:
+    """Service class to moderate new answers and comments.
+
+    With MODERATION_MODE = 'sync' the views check the content before saving it. With 'async' the content is
+    saved as pending_moderation and the request returns right away, the content is checked by a pool of
+    MODERATION_WORKERS threads once the transaction commits. Rejected content is hidden and its author notified.
+    Content left pending (e.g. the process stopped, or the moderation backend failed) is picked up again by
+    the moderate_pending command.
+    """
+
+    _executor: ThreadPoolExecutor | None = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def is_async(cls) -> bool:
+        return settings.MODERATION_MODE == 'async'
+
+    @classmethod
+    def submit(cls, instance: Answers | Comments) -> None:
+        """Moderate a pending answer/comment in the background, once the current transaction commits."""
+        model, pk = type(instance), instance.pk
+        transaction.on_commit(lambda: cls._get_executor().submit(cls._moderate_in_worker, model, pk))
+
+    @classmethod
+    def save_pending(cls, serializer) -> Answers | Comments:
+        """Save new content from a validated serializer as pending moderation, and moderate it in the background."""
+        instance = serializer.save(moderation_status='pending_moderation')
+        cls.submit(instance)
+        return instance
+
+    @classmethod
+    @transaction.atomic
+    def save_approved(cls, serializer) -> Answers | Comments:
+        """Save new content that passed moderation from a validated serializer, with its side effects in the same transaction."""
+        instance = serializer.save()
+        cls.publish(instance)
+        return instance
+
+    @classmethod
+    def moderate(cls, model, pk: UUID | str) -> str | None:
+        """
+        Check a pending answer/comment and approve or reject it.
+
+        Returns:
+            str | None: The new moderation status, or None if the content was not pending anymore
+
+        Raises:
+            Exception: If the content could not be checked (it stays pending)
+        """
+        instance = model.objects.filter(pk=pk, moderation_status='pending_moderation').select_related('expert').first()
+        if instance is None:
+            return None
+
+        status = 'rejected' if detect_restricted_content(instance.response) else 'approved'
+
+        with transaction.atomic():
+            # Only the first worker to get here moderates it (the command may run at the same time)
+            if not model.objects.filter(pk=pk, moderation_status='pending_moderation').update(moderation_status=status):
+                return None
+            instance.moderation_status = status
+
+            if status == 'rejected':
+                NotificationService.handle_content_rejected(instance)
+            else:
+                cls.publish(instance)
+
+        return status
+
+    @classmethod
+    def publish(cls, instance: Answers | Comments) -> None:
+        """Apply the side effects of new content once it passed moderation."""
+        if isinstance(instance, Answers):
+            # Notify the asker from the outbox worker, not in the request (recorded in the caller's transaction)
+            OutboxService.record('answer_created', {'answer_id': str(instance.pk)})
+
+            # Increment contributions if the user is a member of the question's hive
+            question = instance.question
+            if question.related_hive_id and instance.expert_id:
+                HiveMembers.objects.filter(hive_id=question.related_hive_id, user_id=instance.expert_id).update(
+                    contributions=F('contributions') + 1
+                )
+
+    @classmethod
+    def _moderate_in_worker(cls, model, pk: UUID | str) -> None:
+        close_old_connections()
+        try:
+            cls.moderate(model, pk)
+        except Exception as e:
+            logger.error(f"Error moderating {model._meta.db_table} {pk}, it stays pending: {e}")
+        finally:
+            close_old_connections()
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=settings.MODERATION_WORKERS, thread_name_prefix='moderation')
+            return cls._executor
@@ -0,0 +1,115 @@
+# services/notification_push.py
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Server push of notification events (see the notification stream view). Events are published once the
+# transaction that created them commits, and fanned out to the open streams of the recipient by a backend:
+# 'local' only reaches the streams served by the same process, a backend spanning processes (e.g. Redis pub/sub)
+# can be added to BACKENDS with the same subscribe/unsubscribe/has_subscribers/publish methods.
+
+
+class Subscription:
+    """One open stream of a user: a queue of (event, data) fed from any thread, read from the stream's event loop."""
+
+    # Put in the queue to end the stream (the client's EventSource reconnects)
+    CLOSE = None
+
+    def __init__(self, user_id: str, max_queue: int):
+        self.user_id = user_id
+        self.max_queue = max_queue
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.closed = False
+
+    def deliver(self, message) -> None:
+        """Queue a message, called on the subscription's event loop."""
+        if self.closed:
+            return
+        if self.queue.qsize() >= self.max_queue:
+            # The client doesn't keep up: end the stream instead of buffering without bound
+            self.closed = True
+            message = self.CLOSE
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout: float):
+        """Wait for the next message, None when the stream should end. Raises asyncio.TimeoutError after timeout seconds."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class LocalFanout:
+    """In-process backend: a registry of the subscriptions of each user, served by this process."""
+
+    def __init__(self, max_queue: int = 100, **options):
+        self.max_queue = max_queue
+        self._subscriptions: defaultdict = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id) -> Subscription:
+        """Open a subscription to a user's events, must be called from the event loop that will read it."""
+        subscription = Subscription(str(user_id), self.max_queue)
+        with self._lock:
+            self._subscriptions[subscription.user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def has_subscribers(self, user_id) -> bool:
+        """Whether a user has open streams (publishers skip building events nobody receives)."""
+        return bool(self._subscriptions.get(str(user_id)))
+
+    def publish(self, user_id, event: str, data) -> int:
+        """
+        Send an event to every open stream of a user, from any thread.
+
+        Returns:
+            int: Number of streams the event was sent to
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(str(user_id), ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, (event, data))
+            except RuntimeError:
+                # The stream's event loop is closed, its stream is gone
+                self.unsubscribe(subscription)
+        return len(subscriptions)
+
+
+BACKENDS = {
+    'local': LocalFanout,
+}
+
+_fanout = None
+_fanout_lock = threading.Lock()
+
+
+def get_fanout():
+    """Get the process-wide fan-out backend, created on first use from NOTIFICATION_PUSH."""
+    global _fanout
+    with _fanout_lock:
+        if _fanout is None:
+            config = getattr(settings, 'NOTIFICATION_PUSH', {})
+            backend = config.get('BACKEND', 'local')
+            if backend not in BACKENDS:
+                raise ValueError(f"Invalid notification push backend: {backend}")
+            _fanout = BACKENDS[backend](max_queue=config.get('MAX_QUEUE', 100))
+        return _fanout
+
+
+def publish(user_id, event: str, data) -> None:
+    """Publish an event to a user's streams, logging (not raising) errors so a failed push never fails a request."""
+    try:
+        get_fanout().publish(user_id, event, data)
+    except Exception as e:
+        logger.error(f"Error publishing {event} to user {user_id}: {e}")
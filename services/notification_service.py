@@ -1,8 +1,23 @@
 # services/notification_service.py
-from typing import Optional
-from django.db import transaction
-from pulse.models import Notifications, Questions, Answers, Comments, Hives
-from uuid import UUID
+from typing import Iterable, Optional
+from django.db import connection, transaction
+from django.db.models import F
+from pulse.models import Notifications, NotificationCounter, Questions, Answers, Comments, Hives
+from pulse.serializers import NotificationSummarySerializer, NOTIFICATION_SUMMARY_FIELDS
+from services import notification_push
+from services.result_cache import MISS, get_result_cache
+from uuid import UUID, uuid4
+
+
+def unread_count_cache():
+    """
+    The cache of unread notification counts, keyed by user ID (see NOTIFICATION_COUNT_CACHE).
+
+    Each count is cached with the generation it was read at, and a change sets a new generation (under
+    "<user ID>:generation") instead of dropping the count: a count read from the database before a change, and
+    cached after it, doesn't match the new generation and is ignored.
+    """
+    return get_result_cache('notification_count', 'NOTIFICATION_COUNT_CACHE')
 
 
 class NotificationService:
@@ -16,8 +31,12 @@ class NotificationService:
         'mention': 'You were mentioned in a {content_type}',
         'hive_accepted': 'Your hive application was accepted',
         'hive_rejected': 'Your hive application was rejected',
+        'content_rejected': 'Your {content_type} was hidden by content moderation',
     }
 
+    # Rows per INSERT of create_notifications_bulk
+    BULK_BATCH_SIZE = 1000
+
     @classmethod
     @transaction.atomic
     def create_notification(
@@ -54,10 +73,7 @@ class NotificationService:
             raise ValueError(f"Invalid notification type: {notification_type}")
 
         if message is None:
-            message = cls.NOTIFICATION_TYPES[notification_type]
-            if '{content_type}' in message:
-                content_type = 'question' if question else 'answer' if answer else 'comment'
-                message = message.format(content_type=content_type)
+            message = cls.default_message(notification_type, question, answer)
 
         notification = Notifications.objects.create(
             recipient=recipient_id,
@@ -71,9 +87,95 @@ class NotificationService:
             hive_title=hive_title,
             read=False
         )
+        cls.adjust_unread_count(notification.recipient_id, 1)
+
+        # Push it to the recipient's open streams once it is visible to their next requests
+        transaction.on_commit(lambda: cls.push_notifications([notification]), robust=True)
         
         return notification
 
+    @classmethod
+    @transaction.atomic
+    def create_notifications_bulk(
+        cls,
+        recipient_ids: Iterable,
+        notification_type: str,
+        question: Optional['Questions'] = None,
+        answer: Optional['Answers'] = None,
+        comment: Optional['Comments'] = None,
+        hive: Optional['Hives'] = None,
+        hive_title: Optional[str] = None,
+        actor_id: Optional[str] = None,
+        message: Optional[str] = None,
+    ) -> list:
+        """
+        Create the same notification for many recipients (e.g. hive-wide announcements, mentions), with batched
+        INSERTs and a single upsert of their unread counts instead of a create_notification call per recipient.
+
+        Args:
+            recipient_ids: IDs (or Users) of the users receiving the notification, duplicates and None are skipped
+            The others: same as create_notification
+
+        Returns:
+            list: The created notifications
+        """
+        if notification_type not in dict(Notifications.NOTIFICATION_TYPES):
+            raise ValueError(f"Invalid notification type: {notification_type}")
+
+        if message is None:
+            message = cls.default_message(notification_type, question, answer)
+
+        # Sorted, so concurrent bulk creations lock the recipients' counter rows in the same order (no deadlock)
+        recipient_ids = sorted({
+            str(getattr(recipient_id, 'pk', recipient_id)).lower() for recipient_id in recipient_ids if recipient_id
+        })
+        notifications = Notifications.objects.bulk_create([
+            Notifications(
+                recipient_id=recipient_id,
+                actor_id=getattr(actor_id, 'pk', actor_id),
+                notification_type=notification_type,
+                message=message,
+                question=question,
+                answer=answer,
+                comment=comment,
+                hive=hive,
+                hive_title=hive_title,
+                read=False
+            )
+            for recipient_id in recipient_ids
+        ], batch_size=cls.BULK_BATCH_SIZE)
+        if not notifications:
+            return notifications
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO "NotificationCounter" AS c (user_id, unread_count)
+                SELECT user_id, 1 FROM unnest(%s::uuid[]) AS user_id
+                ORDER BY user_id
+                ON CONFLICT (user_id) DO UPDATE
+                SET unread_count = c.unread_count + 1
+                """,
+                [recipient_ids]
+            )
+
+        def after_commit():
+            for recipient_id in recipient_ids:
+                cls.unread_count_changed(recipient_id)
+            cls.push_notifications(notifications)
+
+        transaction.on_commit(after_commit, robust=True)
+        return notifications
+
+    @classmethod
+    def default_message(cls, notification_type: str, question=None, answer=None) -> str:
+        """The message of a notification type, for notifications created without a custom message."""
+        message = cls.NOTIFICATION_TYPES[notification_type]
+        if '{content_type}' in message:
+            content_type = 'question' if question else 'answer' if answer else 'comment'
+            message = message.format(content_type=content_type)
+        return message
+
     @classmethod
     def handle_new_answer(cls, answer: 'Answers') -> None:
         """Handle notifications for a new answer."""
@@ -108,6 +210,16 @@ class NotificationService:
         )
         
 
+    @classmethod
+    def handle_content_rejected(cls, content: 'Answers | Comments') -> None:
+        """Handle notifications for an answer or comment being hidden by content moderation."""
+        cls.create_notification(
+            recipient_id=content.expert,
+            notification_type='content_rejected',
+            answer=content if isinstance(content, Answers) else None,
+            comment=content if isinstance(content, Comments) else None,
+        )
+
     @classmethod
     def mark_as_read(cls, user_id: UUID, notification_id: UUID) -> bool:
         """Handles marking a notification as read for a given user.
@@ -119,22 +231,19 @@ class NotificationService:
         Returns:
             bool: True if operation successful, False otherwise
         """
-        try:
-            # Get the notification and verify the recipient matches the user
-            notification = Notifications.objects.get(
+        with transaction.atomic():
+            # Only a notification that is currently unread changes the unread count
+            updated = Notifications.objects.filter(
                 notification_id=notification_id,
-                recipient_id=user_id
-            )
-            
-            # Mark as read and save
-            notification.read = True
-            notification.save()
-            
-            return True
-            
-        except Notifications.DoesNotExist:
-            # Either notification doesn't exist or user isn't authorized
-            return False
+                recipient_id=user_id,
+                read=False,
+            ).update(read=True)
+            if updated:
+                cls.adjust_unread_count(user_id, -updated)
+                return True
+
+        # Already read, or either notification doesn't exist or user isn't authorized
+        return Notifications.objects.filter(notification_id=notification_id, recipient_id=user_id).exists()
 
 
     @classmethod
@@ -148,22 +257,19 @@ class NotificationService:
         Returns:
             bool: True if operation successful, False otherwise
         """
-        try:
-            # Get the notification and verify the recipient matches the user
-            notification = Notifications.objects.get(
+        with transaction.atomic():
+            # Only a notification that is currently read changes the unread count
+            updated = Notifications.objects.filter(
                 notification_id=notification_id,
-                recipient_id=user_id
-            )
-            
-            # Mark as read and save
-            notification.read = False
-            notification.save()
-            
-            return True
-            
-        except Notifications.DoesNotExist:
-            # Either notification doesn't exist or user isn't authorized
-            return False
+                recipient_id=user_id,
+                read=True,
+            ).update(read=False)
+            if updated:
+                cls.adjust_unread_count(user_id, updated)
+                return True
+
+        # Already unread, or either notification doesn't exist or user isn't authorized
+        return Notifications.objects.filter(notification_id=notification_id, recipient_id=user_id).exists()
 
 
     @classmethod
@@ -177,18 +283,201 @@ class NotificationService:
         Returns:
             bool: True if operation successful, False otherwise
         """
-        try:
-            # Get the notification and verify the recipient matches the user
-            notification = Notifications.objects.get(
-                notification_id=notification_id,
-                recipient_id=user_id
+        # Delete the notification if the recipient matches the user, adjusting the unread count (see delete_many).
+        # Nothing deleted means either the notification doesn't exist or the user isn't authorized
+        return cls.delete_many(user_id, [notification_id]) > 0
+
+    @classmethod
+    def mark_many_as_read(cls, user_id: UUID, notification_ids: Iterable | None = None) -> int:
+        """Mark a user's notifications as read (all of them if notification_ids is None) with a single UPDATE.
+
+        Returns:
+            int: Number of notifications that were unread
+        """
+        return cls._set_read(user_id, notification_ids, True)
+
+    @classmethod
+    def mark_many_as_unread(cls, user_id: UUID, notification_ids: Iterable) -> int:
+        """Mark a user's notifications as unread with a single UPDATE.
+
+        Returns:
+            int: Number of notifications that were read
+        """
+        return cls._set_read(user_id, notification_ids, False)
+
+    @classmethod
+    @transaction.atomic
+    def _set_read(cls, user_id: UUID, notification_ids: Iterable | None, read: bool) -> int:
+        # Notifications of other users are ignored, and only the ones that change adjust the unread count
+        notifications = Notifications.objects.filter(recipient_id=user_id, read=not read)
+        if notification_ids is not None:
+            notifications = notifications.filter(notification_id__in=list(notification_ids))
+        updated = notifications.update(read=read)
+        if updated:
+            cls.adjust_unread_count(user_id, -updated if read else updated)
+        return updated
+
+    @classmethod
+    @transaction.atomic
+    def delete_many(cls, user_id: UUID, notification_ids: Iterable | None = None) -> int:
+        """Delete a user's notifications (all of them if notification_ids is None) with a single DELETE.
+
+        Returns:
+            int: Number of notifications deleted
+        """
+        # Raw DELETE ... RETURNING: the unread ones are counted from the rows actually deleted, and the count is
+        # adjusted once
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                DELETE FROM "Notifications"
+                WHERE recipient_id = %(user_id)s
+                  AND (%(ids)s::uuid[] IS NULL OR notification_id = ANY(%(ids)s::uuid[]))
+                RETURNING read
+                """,
+                {
+                    "user_id": str(user_id),
+                    "ids": None if notification_ids is None else [str(id) for id in notification_ids],
+                }
+            )
+            deleted = [read for (read,) in cursor.fetchall()]
+
+        unread = deleted.count(False)
+        if unread:
+            cls.adjust_unread_count(user_id, -unread)
+        return len(deleted)
+
+    @classmethod
+    def uncount_notifications_of(cls, field: str, object_id) -> None:
+        """
+        Subtract the unread notifications about an object from their recipients' unread counts, before the object
+        is deleted (its notifications are deleted with it by cascade, without signals, see pulse/signals.py).
+        They are marked read in the same statement, so a notification about several deleted objects (e.g. an answer
+        and its question) is only subtracted once. One UPDATE of the counters, grouped by recipient.
+        """
+        column = Notifications._meta.get_field(field).column
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH uncounted AS (
+                    UPDATE "Notifications" SET read = true
+                    WHERE {column} = %s AND NOT read
+                    RETURNING recipient_id
+                )
+                UPDATE "NotificationCounter" AS c
+                SET unread_count = c.unread_count - u.count
+                FROM (SELECT recipient_id, COUNT(*) AS count FROM uncounted GROUP BY recipient_id) AS u
+                WHERE c.user_id = u.recipient_id
+                RETURNING c.user_id
+                """,
+                [str(object_id)]
             )
-            
-            # Delete notification
-            notification.delete()
-            
-            return True
-            
-        except Notifications.DoesNotExist:
-            # Either notification doesn't exist or user isn't authorized
-            return False
\ No newline at end of file
+            user_ids = [str(row[0]) for row in cursor.fetchall()]
+
+        def invalidate():
+            for user_id in user_ids:
+                cls.unread_count_changed(user_id)
+
+        if user_ids:
+            transaction.on_commit(invalidate, robust=True)
+
+    @classmethod
+    def get_unread_count(cls, user_id: UUID | str) -> int:
+        """Get the number of unread notifications of a user, from the cache or the user's NotificationCounter row."""
+        cache = unread_count_cache()
+        key = str(user_id)
+        # Read the generation before the count, a change committed from now on sets another one
+        generation = cache.get(f"{key}:generation")
+        generation = None if generation is MISS else generation
+        cached = cache.get(key)
+        if cached is not MISS and cached[0] == generation:
+            return max(cached[1], 0)
+
+        count = NotificationCounter.objects.filter(user_id=user_id).values_list('unread_count', flat=True).first() or 0
+        cache.set(key, (generation, count))
+        return max(count, 0)
+
+    @classmethod
+    def adjust_unread_count(cls, user_id: UUID | str, delta: int) -> None:
+        """
+        Add delta to a user's unread count, in the current transaction (after the notifications were changed, so
+        reconcile_unread_counts never misses a change). The cached count is dropped once the transaction commits.
+        """
+        if delta > 0:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO "NotificationCounter" AS c (user_id, unread_count)
+                    VALUES (%s, %s)
+                    ON CONFLICT (user_id) DO UPDATE
+                    SET unread_count = c.unread_count + EXCLUDED.unread_count
+                    """,
+                    [str(user_id), delta]
+                )
+        elif delta < 0:
+            # No row to decrement means the user is being deleted (or the count was never created), nothing to do
+            NotificationCounter.objects.filter(user_id=user_id).update(unread_count=F('unread_count') + delta)
+        transaction.on_commit(lambda: cls.unread_count_changed(user_id), robust=True)
+
+    @classmethod
+    def unread_count_changed(cls, user_id: UUID | str) -> None:
+        """Invalidate a user's cached unread count, and push the new count to their open streams (after commit)."""
+        unread_count_cache().set(f"{user_id}:generation", uuid4().hex)
+        if notification_push.get_fanout().has_subscribers(user_id):
+            notification_push.publish(user_id, 'unread_count', {'count': cls.get_unread_count(user_id)})
+
+    @classmethod
+    def push_notifications(cls, notifications: list) -> None:
+        """Push new notifications, as summaries (see NotificationSummarySerializer), to their recipients' open streams."""
+        fanout = notification_push.get_fanout()
+        pushed = [notification.pk for notification in notifications if fanout.has_subscribers(notification.recipient_id)]
+        if not pushed:
+            return
+        # One query for all of them (the ones deleted since are skipped)
+        summaries = Notifications.objects.select_related('question', 'hive', 'actor').only(
+            *NOTIFICATION_SUMMARY_FIELDS, 'recipient'
+        ).filter(pk__in=pushed)
+        for summary in summaries:
+            notification_push.publish(summary.recipient_id, 'notification', NotificationSummarySerializer(summary).data)
+
+    @classmethod
+    def reconcile_unread_counts(cls, user_ids: Iterable | None = None) -> int:
+        """
+        Recompute unread counts from the notifications and fix the counters that drifted, for the given users
+        (None for every user).
+
+        Returns:
+            int: Number of counters that were corrected
+        """
+        user_ids = None if user_ids is None else [str(user_id) for user_id in user_ids]
+        with transaction.atomic():
+            # Block count changes while recomputing (they commit after this, on top of the recomputed counts)
+            with connection.cursor() as cursor:
+                cursor.execute('LOCK TABLE "NotificationCounter" IN EXCLUSIVE MODE')
+                cursor.execute(
+                    """
+                    INSERT INTO "NotificationCounter" AS c (user_id, unread_count)
+                    SELECT u.user_id, COUNT(n.notification_id)
+                    FROM (
+                        SELECT recipient_id AS user_id FROM "Notifications" WHERE NOT read
+                        UNION
+                        SELECT user_id FROM "NotificationCounter"
+                    ) AS u
+                    LEFT JOIN "Notifications" AS n ON n.recipient_id = u.user_id AND NOT n.read
+                    WHERE %(user_ids)s::uuid[] IS NULL OR u.user_id = ANY(%(user_ids)s::uuid[])
+                    GROUP BY u.user_id
+                    ON CONFLICT (user_id) DO UPDATE
+                    SET unread_count = EXCLUDED.unread_count
+                    WHERE c.unread_count <> EXCLUDED.unread_count
+                    RETURNING c.user_id
+                    """,
+                    {"user_ids": user_ids}
+                )
+                corrected = [str(row[0]) for row in cursor.fetchall()]
+
+            def invalidate():
+                for user_id in corrected:
+                    cls.unread_count_changed(user_id)
+
+            transaction.on_commit(invalidate, robust=True)
+        return len(corrected)
@@ -0,0 +1,157 @@
+# services/outbox_service.py
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from pulse.models import Answers, DomainEvent
+from services.notification_service import NotificationService
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxService:
+    """Service class to apply the side effects of domain events outside of the request that caused them.
+
+    record() writes the event to the DomainEvents outbox in the caller's transaction, so it exists if and only if
+    the change committed. Workers claim pending events in batches (SELECT ... FOR UPDATE SKIP LOCKED, so several
+    workers never handle the same event) and delete them in the same transaction as their side effects. An event
+    whose handler fails is retried with an exponential backoff, up to OUTBOX['MAX_ATTEMPTS'] times.
+
+    With OUTBOX['IN_PROCESS'] a background thread of the web process drains the outbox once a transaction that
+    recorded events commits, and every OUTBOX['POLL_INTERVAL'] seconds (for retries, and events left by a process
+    that stopped).
+    """
+
+    # Handler method of each event type, called with the event's payload
+    HANDLERS = {
+        'answer_created': '_handle_answer_created',
+    }
+
+    _executor: ThreadPoolExecutor | None = None
+    _lock = threading.Lock()
+    _drain_scheduled = False
+    _poller: threading.Thread | None = None
+
+    @classmethod
+    def record(cls, event_type: str, payload: dict) -> DomainEvent:
+        """Record an event in the current transaction, its handler runs in a worker once it commits."""
+        if event_type not in cls.HANDLERS:
+            raise ValueError(f"Invalid domain event type: {event_type}")
+
+        event = DomainEvent.objects.create(event_type=event_type, payload=payload)
+        if cls._config('IN_PROCESS', True):
+            transaction.on_commit(cls._schedule_drain)
+        return event
+
+    @classmethod
+    def process_batch(cls, batch_size: int | None = None) -> dict:
+        """
+        Claim up to batch_size pending events and handle them, in one transaction.
+
+        Returns:
+            dict: Number of events claimed, processed (and deleted) and failed
+        """
+        batch_size = batch_size or cls._config('BATCH_SIZE', 100)
+        processed, failed = [], 0
+
+        with transaction.atomic():
+            events = list(
+                DomainEvent.objects.select_for_update(skip_locked=True)
+                .filter(status='pending', available_at__lte=timezone.now())
+                .order_by('available_at')[:batch_size]
+            )
+            for event in events:
+                try:
+                    # Savepoint per event: a failed handler only rolls back its own side effects
+                    with transaction.atomic():
+                        getattr(cls, cls.HANDLERS[event.event_type])(event.payload)
+                    processed.append(event.pk)
+                except Exception as e:
+                    cls._record_failure(event, e)
+                    failed += 1
+
+            DomainEvent.objects.filter(pk__in=processed).delete()
+
+        return {'claimed': len(events), 'processed': len(processed), 'failed': failed}
+
+    @classmethod
+    def drain(cls) -> int:
+        """
+        Process batches until no pending event is due.
+
+        Returns:
+            int: Number of events processed
+        """
+        batch_size = cls._config('BATCH_SIZE', 100)
+        total = 0
+        while True:
+            result = cls.process_batch(batch_size)
+            total += result['processed']
+            if result['claimed'] < batch_size:
+                return total
+
+    @classmethod
+    def _handle_answer_created(cls, payload: dict) -> None:
+        """Notify the asker of a new (approved) answer."""
+        answer = Answers.objects.select_related('question').filter(pk=payload['answer_id']).first()
+        if answer is None or answer.question is None:
+            return  # deleted since
+        NotificationService.handle_new_answer(answer)
+
+    @classmethod
+    def _record_failure(cls, event: DomainEvent, error: Exception) -> None:
+        event.attempts += 1
+        event.last_error = str(error)[:1000]
+        if event.attempts >= cls._config('MAX_ATTEMPTS', 5):
+            event.status = 'failed'
+            logger.error(f"Giving up on {event.event_type} event {event.pk} after {event.attempts} attempts: {error}")
+        else:
+            delay = cls._config('RETRY_DELAY', 10) * 2 ** (event.attempts - 1)
+            event.available_at = timezone.now() + timedelta(seconds=delay)
+            logger.warning(f"Error handling {event.event_type} event {event.pk}, retrying in {delay}s: {error}")
+        event.save(update_fields=['attempts', 'last_error', 'status', 'available_at'])
+
+    @classmethod
+    def _schedule_drain(cls) -> None:
+        """Drain the outbox in the background thread (a drain already waiting to start covers this event too)."""
+        with cls._lock:
+            if cls._drain_scheduled:
+                return
+            cls._drain_scheduled = True
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='outbox')
+            if cls._poller is None:
+                cls._start_poller()
+            executor = cls._executor
+        executor.submit(cls._drain_in_worker)
+
+    @classmethod
+    def _drain_in_worker(cls) -> None:
+        with cls._lock:
+            cls._drain_scheduled = False  # events committed from now on schedule another drain
+        close_old_connections()
+        try:
+            cls.drain()
+        except Exception as e:
+            logger.error(f"Error draining the outbox, the events stay pending: {e}")
+        finally:
+            close_old_connections()
+
+    @classmethod
+    def _start_poller(cls) -> None:
+        """Start the background thread that schedules a drain on an interval, so retries are picked up."""
+        def run():
+            while True:
+                time.sleep(cls._config('POLL_INTERVAL', 30))
+                cls._schedule_drain()
+
+        cls._poller = threading.Thread(target=run, name='outbox-poller', daemon=True)
+        cls._poller.start()
+
+    @staticmethod
+    def _config(key: str, default):
+        return getattr(settings, 'OUTBOX', {}).get(key, default)
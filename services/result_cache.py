@@ -0,0 +1,199 @@
+# services/result_cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+from django.conf import settings
+from django.core.cache import caches
+from services.stats_service import StatsService
+
+# Returned by the backends when a key is not cached (a cached result can itself be None/False)
+MISS = object()
+
+
+def content_key(*parts) -> str:
+    """Build a cache key from the SHA-256 of the given parts (str or bytes)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        part = part if isinstance(part, bytes) else str(part).encode()
+        # Length-prefix each part so ('ab', 'c') and ('a', 'bc') don't collide
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class LocalBackend:
+    """In-process backend: an LRU dict of (expiry, value), bounded to max_entries."""
+
+    def __init__(self, name: str, ttl: int, max_entries: int, **options):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return MISS
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)  # evict the least recently used entry
+
+    async def aget(self, key: str) -> Any:
+        return self.get(key)  # in memory, doesn't block
+
+    async def aset(self, key: str, value: Any) -> None:
+        self.set(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SharedBackend:
+    """Backend shared between processes, stored in one of the Django CACHES (e.g. Redis or Memcached)."""
+
+    def __init__(self, name: str, ttl: int, max_entries: int, cache_alias: str = 'default', **options):
+        self.ttl = ttl
+        self.cache = caches[cache_alias]
+        self.prefix = f"result-cache:{name}:"
+
+    def get(self, key: str) -> Any:
+        return self.cache.get(self.prefix + key, MISS)
+
+    def set(self, key: str, value: Any) -> None:
+        self.cache.set(self.prefix + key, value, timeout=self.ttl)
+
+    async def aget(self, key: str) -> Any:
+        return await self.cache.aget(self.prefix + key, MISS)
+
+    async def aset(self, key: str, value: Any) -> None:
+        await self.cache.aset(self.prefix + key, value, timeout=self.ttl)
+
+    def clear(self) -> None:
+        pass  # entries expire after their TTL, the rest of the cache is left alone
+
+    def __len__(self) -> int:
+        return 0  # unknown
+
+
+BACKENDS = {
+    'local': LocalBackend,
+    'shared': SharedBackend,
+}
+
+
+class ResultCache:
+    """A TTL cache for the results of expensive calls (e.g. remote inference), with hit/miss counters.
+
+    Only results are cached: if the call raises, nothing is stored and the next call tries again.
+    """
+
+    def __init__(self, name: str, backend: str = 'local', ttl: int = 3600, max_entries: int = 10000, **options):
+        if backend not in BACKENDS:
+            raise ValueError(f"Invalid result cache backend: {backend}")
+        self.name = name
+        self.backend = BACKENDS[backend](name, ttl=ttl, max_entries=max_entries, **options)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """Return the cached result for key, or MISS."""
+        return self._count(self.backend.get(key))
+
+    def set(self, key: str, value: Any) -> None:
+        self.backend.set(key, value)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Return the cached result for key, or call compute() and cache what it returns."""
+        value = self.get(key)
+        if value is MISS:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    async def aget(self, key: str) -> Any:
+        """Async version of get."""
+        return self._count(await self.backend.aget(key))
+
+    async def aset(self, key: str, value: Any) -> None:
+        await self.backend.aset(key, value)
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Async version of get_or_compute, compute() returns an awaitable."""
+        value = await self.aget(key)
+        if value is MISS:
+            value = await compute()
+            await self.aset(key, value)
+        return value
+
+    def clear(self) -> None:
+        self.backend.clear()
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def _count(self, value: Any) -> Any:
+        with self._lock:
+            if value is MISS:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def stats(self) -> dict:
+        """Get the hit/miss counters of this process."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.backend),
+            }
+
+
+_caches: dict = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(name: str, setting: str) -> ResultCache:
+    """
+    Get the process-wide ResultCache called name, created on first use from a settings dict with the
+    keys BACKEND ('local' or 'shared'), TTL (seconds), MAX_ENTRIES (local backend) and CACHE_ALIAS
+    (shared backend).
+    """
+    with _caches_lock:
+        if name not in _caches:
+            config = getattr(settings, setting, {})
+            _caches[name] = ResultCache(
+                name,
+                backend=config.get('BACKEND', 'local'),
+                ttl=config.get('TTL', 3600),
+                max_entries=config.get('MAX_ENTRIES', 10000),
+                cache_alias=config.get('CACHE_ALIAS', 'default'),
+            )
+            StatsService.start()
+        return _caches[name]
+
+
+def get_result_cache_stats() -> list:
+    """Get the stats of every result cache created in this process."""
+    with _caches_lock:
+        return [cache.stats() for cache in _caches.values()]
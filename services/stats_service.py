@@ -0,0 +1,58 @@
+# services/stats_service.py
+import json
+import logging
+import threading
+import time
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StatsService:
+    """Service class to report the in-process counters of the services (result cache hit rates, circuit states and
+    latencies of the inference models).
+
+    The counters are per process: each process logs its own every STATS_LOG_INTERVAL seconds, from a background
+    thread started by the first result cache or inference model used (so importing this module costs nothing).
+    """
+
+    _reporter: threading.Thread | None = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def collect(cls) -> dict:
+        """Get the counters of this process."""
+        # Imported here: the services report to this module, it doesn't build them
+        from services import ai_model_service
+        from services.result_cache import get_result_cache_stats
+
+        return {
+            "result_caches": get_result_cache_stats(),
+            "inference": {
+                "sync": ai_model_service.client.stats(),
+                "async": ai_model_service.async_client.stats(),
+            },
+        }
+
+    @classmethod
+    def log(cls) -> None:
+        """Log the counters of this process."""
+        logger.info(f"Service stats: {json.dumps(cls.collect())}")
+
+    @classmethod
+    def start(cls) -> None:
+        """Start the background thread that logs the counters on an interval (once per process)."""
+        with cls._lock:
+            if cls._reporter is not None:
+                return
+
+            def run():
+                while True:
+                    time.sleep(settings.STATS_LOG_INTERVAL)
+                    try:
+                        cls.log()
+                    except Exception as e:
+                        logger.error(f"Error logging service stats: {e}")
+
+            cls._reporter = threading.Thread(target=run, name='stats-reporter', daemon=True)
+            cls._reporter.start()
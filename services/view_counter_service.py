@@ -0,0 +1,110 @@
+# services/view_counter_service.py
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from uuid import UUID
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounterService:
+    """Service class to buffer question view counts and write them to the database in batches.
+
+    Views are counted in memory (per process) and flushed every VIEW_COUNT_FLUSH_INTERVAL seconds
+    with one UPDATE ... FROM (VALUES ...) statement, instead of one row-locking UPDATE per page view.
+    """
+
+    # Number of questions updated per statement when flushing
+    FLUSH_BATCH_SIZE = 500
+
+    _pending: Counter = Counter()   # views not yet flushed
+    _flushing: Counter = Counter()  # views currently being written by a flush
+    _lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _flusher: threading.Thread | None = None
+
+    @classmethod
+    def record_view(cls, question_id: UUID | str) -> None:
+        """Count one view of a question (written to the database on the next flush)."""
+        with cls._lock:
+            cls._pending[str(question_id)] += 1
+            if cls._flusher is None:
+                cls._start_flusher()
+
+    @classmethod
+    def get_pending(cls, question_id: UUID | str) -> int:
+        """Get the number of views of a question that are not yet reflected in the database."""
+        key = str(question_id)
+        with cls._lock:
+            return cls._pending[key] + cls._flushing[key]
+
+    @classmethod
+    def flush(cls) -> int:
+        """
+        Write all buffered views to the database.
+
+        Returns:
+            int: Number of questions whose view count was updated
+        """
+        with cls._flush_lock:
+            with cls._lock:
+                if not cls._pending:
+                    return 0
+                cls._flushing, cls._pending = cls._pending, Counter()
+
+            deltas = list(cls._flushing.items())
+            try:
+                # All batches or none: the views are put back on failure, a committed batch would be counted twice
+                with transaction.atomic():
+                    for start in range(0, len(deltas), cls.FLUSH_BATCH_SIZE):
+                        cls._write_batch(deltas[start:start + cls.FLUSH_BATCH_SIZE])
+            except Exception as e:
+                logger.error(f"Error flushing question view counts: {e}")
+                # Put the views back so they are retried on the next flush
+                with cls._lock:
+                    cls._pending.update(cls._flushing)
+                    cls._flushing = Counter()
+                raise
+
+            with cls._lock:
+                cls._flushing = Counter()
+            return len(deltas)
+
+    @classmethod
+    def _write_batch(cls, deltas: list) -> None:
+        """Add the view deltas to their questions in a single statement."""
+        values = ", ".join(["(%s::uuid, %s::bigint)"] * len(deltas))
+        params = [value for delta in deltas for value in delta]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE "Questions" AS q
+                SET view_count = q.view_count + v.delta
+                FROM (VALUES {values}) AS v(question_id, delta)
+                WHERE q.question_id = v.question_id
+                """,
+                params
+            )
+
+    @classmethod
+    def _start_flusher(cls) -> None:
+        """Start the background thread that flushes the buffered views on an interval."""
+        def run():
+            while True:
+                time.sleep(settings.VIEW_COUNT_FLUSH_INTERVAL)
+                close_old_connections()
+                try:
+                    cls.flush()
+                except Exception:
+                    pass  # already logged, the views are retried on the next flush
+
+        cls._flusher = threading.Thread(target=run, name='view-count-flusher', daemon=True)
+        cls._flusher.start()
+
+
+# Don't lose buffered views when the worker shuts down
+atexit.register(lambda: ViewCounterService.flush() if ViewCounterService._pending else None)
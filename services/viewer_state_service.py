@@ -0,0 +1,70 @@
+# services/viewer_state_service.py
+from typing import Any, Callable, Iterable
+from uuid import UUID
+from pulse.models import Votes
+
+
+class ViewerStateService:
+    """Service class to merge per-viewer state (e.g. the viewer's votes) into serialized lists.
+
+    The state for the whole list is loaded in one query and merged in memory, so list
+    endpoints don't need to run a query per row.
+    """
+
+    @classmethod
+    def overlay(
+        cls,
+        rows: list,
+        key: str,
+        load_state: Callable[[list], dict],
+        merge: Callable[[dict, Any], None],
+    ) -> list:
+        """
+        Merge viewer state into a list of serialized rows.
+
+        Args:
+            rows: Serialized rows (dicts) to update in place
+            key: Name of the field that identifies each row (e.g. 'answer_id')
+            load_state: Called once with the ids of all rows, returns a dict of {str(id): state}
+            merge: Called for every row with the row and its state (None if the viewer has no state for it)
+
+        Returns:
+            list: The same rows, with the viewer state merged in
+        """
+        ids = [row[key] for row in rows]
+        states = load_state(ids) if ids else {}
+
+        for row in rows:
+            merge(row, states.get(str(row[key])))
+
+        return rows
+
+    @classmethod
+    def get_votes(cls, user_id: UUID | str, answer_ids: Iterable) -> dict:
+        """Get the vote type of a user for each of the given answers, keyed by str(answer_id)."""
+        votes = Votes.objects.filter(user_id=user_id, answer_id__in=answer_ids).values_list('answer_id', 'vote_type')
+        return {str(answer_id): vote_type for answer_id, vote_type in votes}
+
+    @classmethod
+    def overlay_votes(cls, serialized_answers: list, user_id: UUID | str) -> list:
+        """
+        Set curr_user_upvoted/curr_user_downvoted on every serialized answer, using one query.
+
+        Args:
+            serialized_answers: Answers serialized by AnswerSerializer
+            user_id: ID of the user viewing the answers
+
+        Returns:
+            list: The serialized answers with the vote flags set
+        """
+        def merge(answer: dict, vote_type: str | None) -> None:
+            # Set the upvote/downvote flags based on the user's vote
+            answer['curr_user_upvoted'] = vote_type == 'upvote'
+            answer['curr_user_downvoted'] = vote_type == 'downvote'
+
+        return cls.overlay(
+            serialized_answers,
+            'answer_id',
+            lambda answer_ids: cls.get_votes(user_id, answer_ids),
+            merge,
+        )
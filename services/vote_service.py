@@ -0,0 +1,143 @@
+# services/vote_service.py
+import logging
+from uuid import UUID
+from django.db import IntegrityError, connection, transaction
+from pulse.models import Answers, Users, Votes
+from services.badge_service import BadgeService
+
+logger = logging.getLogger(__name__)
+
+
+class VoteService:
+    """Service class to apply votes on answers.
+
+    A vote is applied in one transaction with four statements: lock the answer, read the user's current
+    vote, write the vote row, then update the answer's score, the expert's hive reputation and their
+    reputation in the question's tags (increments in SQL, so concurrent votes never lose updates).
+    The badges of the question's tags are then re-evaluated for the expert.
+    """
+
+    VOTE_VALUES = {
+        'upvote': 1,
+        'downvote': -1,
+    }
+
+    @classmethod
+    def cast_vote(cls, user_id: UUID | str, answer_id: UUID | str, vote_type: str) -> dict:
+        """
+        Apply a user's upvote/downvote on an answer.
+
+        Voting the same way twice removes the vote, voting the other way switches it.
+
+        Args:
+            user_id: ID of the user voting
+            answer_id: ID of the answer being voted on
+            vote_type: 'upvote' or 'downvote'
+
+        Returns:
+            dict: The result message and the answer's new score
+
+        Raises:
+            Answers.DoesNotExist: If the answer doesn't exist
+            Users.DoesNotExist: If the user doesn't exist
+        """
+        if vote_type not in cls.VOTE_VALUES:
+            raise ValueError(f"Invalid vote type: {vote_type}")
+
+        label = vote_type.capitalize()
+        value = cls.VOTE_VALUES[vote_type]
+
+        try:
+            with transaction.atomic():
+                existing_vote = cls._lock_answer(user_id, answer_id)
+                votes = Votes.objects.filter(user_id=user_id, answer_id=answer_id)
+
+                if existing_vote == vote_type:
+                    # Same vote again: remove it
+                    votes.delete()
+                    delta = -value
+                    message = f"{label} removed"
+                elif existing_vote:
+                    # Opposite vote: switch it
+                    votes.update(vote_type=vote_type)
+                    delta = 2 * value
+                    message = f"Vote switched to {vote_type}"
+                else:
+                    # Record a new vote
+                    Votes.objects.create(user_id=user_id, answer_id=answer_id, vote_type=vote_type)
+                    delta = value
+                    message = f"{label} successful"
+
+                new_score, expert_id, tag_ids = cls._apply_score_delta(answer_id, delta)
+        except IntegrityError as e:
+            # The user foreign key of the new vote is checked on commit
+            raise Users.DoesNotExist(f"User {user_id} does not exist") from e
+
+        if expert_id and tag_ids:
+            try:
+                BadgeService.evaluate(expert_id, tag_ids=tag_ids)
+            except Exception as e:
+                # The vote is already saved, the badges catch up on the expert's next evaluation
+                logger.error(f"Error updating the badges of user {expert_id}: {e}")
+
+        return {"message": message, "new_score": new_score}
+
+    @classmethod
+    def _lock_answer(cls, user_id: UUID | str, answer_id: UUID | str) -> str | None:
+        """
+        Lock the answer row (so votes on the same answer are applied one at a time), then read the
+        user's current vote on it.
+
+        The vote is read in a separate statement after the lock is acquired: a statement that waited
+        for the lock still sees the other rows (e.g. a joined vote) as they were before it waited.
+
+        Returns:
+            str | None: The user's current vote type, or None if they haven't voted
+        """
+        if not Answers.objects.select_for_update().filter(answer_id=answer_id).exists():
+            raise Answers.DoesNotExist(f"Answer {answer_id} does not exist")
+
+        return Votes.objects.filter(user_id=user_id, answer_id=answer_id).values_list('vote_type', flat=True).first()
+
+    @classmethod
+    def _apply_score_delta(cls, answer_id: UUID | str, delta: int) -> tuple:
+        """
+        Add delta to the answer's score, to its expert's reputation in the question's hive (only if the
+        expert is a member of that hive) and to the expert's reputation in each of the question's tags,
+        in one statement.
+
+        Returns:
+            tuple: The answer's new score, its expert's ID and the IDs of the question's tags
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                WITH answer AS (
+                    UPDATE "Answers"
+                    SET score = score + %(delta)s
+                    WHERE answer_id = %(answer_id)s
+                    RETURNING score, expert_id, question_id
+                ), question_tags AS (
+                    SELECT qt.tags_id
+                    FROM "Questions_tags" AS qt, answer
+                    WHERE qt.questions_id = answer.question_id
+                ), hive_member AS (
+                    UPDATE "HiveMembers" AS hm
+                    SET hive_reputation = hm.hive_reputation + %(delta)s
+                    FROM answer, "Questions" AS q
+                    WHERE q.question_id = answer.question_id
+                      AND hm.hive_id = q.related_hive_id
+                      AND hm.user_id = answer.expert_id
+                ), tag_reputation AS (
+                    -- The row exists since the answer was created, it is only missing if the rollup is out of sync
+                    INSERT INTO "UserTagReputation" AS r (user_id, tag_id, score_sum, answer_count)
+                    SELECT answer.expert_id, question_tags.tags_id, %(delta)s, 1
+                    FROM answer, question_tags
+                    WHERE answer.expert_id IS NOT NULL
+                    ON CONFLICT (user_id, tag_id) DO UPDATE SET score_sum = r.score_sum + EXCLUDED.score_sum
+                )
+                SELECT score, expert_id, ARRAY(SELECT tags_id FROM question_tags) FROM answer
+                """,
+                {"delta": delta, "answer_id": str(answer_id)}
+            )
+            return cursor.fetchone()